@@ -0,0 +1,21 @@
+-- Migration 0019_latest_quote.sql
+-- Created on 2026-10-17T09:12:41.503218
+
+CREATE TABLE IF NOT EXISTS latest_quote (
+	symbol_id UUID PRIMARY KEY,
+	price NUMERIC(18, 8) NOT NULL,
+	previous_close NUMERIC(18, 8),
+	currency TEXT NOT NULL DEFAULT 'USD',
+	updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+	FOREIGN KEY (symbol_id) REFERENCES symbols (id) ON DELETE CASCADE
+);
+
+INSERT INTO latest_quote (symbol_id, price, previous_close, currency, updated_at)
+SELECT DISTINCT ON (symbol_id) symbol_id, price, previous_close, currency, created_at
+FROM quote_history
+ORDER BY symbol_id, created_at DESC
+ON CONFLICT (symbol_id) DO NOTHING;
+
+-- Rollback migration
+
+DROP TABLE IF EXISTS latest_quote;
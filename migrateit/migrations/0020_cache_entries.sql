@@ -0,0 +1,17 @@
+-- Migration 0020_cache_entries.sql
+-- Created on 2026-10-17T10:05:37.118042
+
+CREATE UNLOGGED TABLE IF NOT EXISTS cache_entries (
+	namespace TEXT NOT NULL,
+	key TEXT NOT NULL,
+	value BYTEA NOT NULL,
+	expires_at TIMESTAMP NOT NULL,
+	PRIMARY KEY (namespace, key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_cache_entries_expires_at ON cache_entries (namespace, expires_at);
+
+-- Rollback migration
+
+DROP INDEX IF EXISTS idx_cache_entries_expires_at;
+DROP TABLE IF EXISTS cache_entries;
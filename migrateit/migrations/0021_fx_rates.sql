@@ -0,0 +1,15 @@
+-- Migration 0021_fx_rates.sql
+-- Created on 2026-10-17T11:20:08.632917
+
+CREATE TABLE IF NOT EXISTS fx_rates (
+	base TEXT NOT NULL,
+	currency TEXT NOT NULL,
+	date DATE NOT NULL,
+	rate NUMERIC(18, 8) NOT NULL,
+	created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+	PRIMARY KEY (base, date, currency)
+);
+
+-- Rollback migration
+
+DROP TABLE IF EXISTS fx_rates;
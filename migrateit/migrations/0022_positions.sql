@@ -0,0 +1,40 @@
+-- Migration 0022_positions.sql
+-- Created on 2026-10-17T11:58:23.410976
+
+CREATE TABLE IF NOT EXISTS positions (
+	user_id UUID NOT NULL,
+	account_id UUID,
+	symbol_id UUID NOT NULL,
+	quantity NUMERIC(18, 8) NOT NULL DEFAULT 0,
+	cost NUMERIC(18, 8) NOT NULL DEFAULT 0,
+	first_buy_id UUID,
+	updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+	FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+	FOREIGN KEY (account_id) REFERENCES accounts (id) ON DELETE CASCADE,
+	FOREIGN KEY (symbol_id) REFERENCES symbols (id) ON DELETE CASCADE
+);
+
+-- transactions without an account share the nil uuid key
+CREATE UNIQUE INDEX IF NOT EXISTS idx_positions_key
+ON positions (user_id, COALESCE(account_id, '00000000-0000-0000-0000-000000000000'::uuid), symbol_id);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_position
+ON transactions (user_id, symbol_id, account_id, date);
+
+INSERT INTO positions (user_id, account_id, symbol_id, quantity, cost, first_buy_id)
+SELECT
+	user_id,
+	account_id,
+	symbol_id,
+	SUM(CASE transaction_type WHEN 'SELL' THEN -quantity WHEN 'DIVIDEND-CASH' THEN 0 ELSE quantity END),
+	COALESCE(SUM(quantity * price + commission) FILTER (WHERE transaction_type = 'BUY'), 0),
+	(ARRAY_AGG(id ORDER BY date, created_at) FILTER (WHERE transaction_type = 'BUY'))[1]
+FROM transactions
+GROUP BY user_id, account_id, symbol_id
+ON CONFLICT DO NOTHING;
+
+-- Rollback migration
+
+DROP INDEX IF EXISTS idx_transactions_position;
+DROP INDEX IF EXISTS idx_positions_key;
+DROP TABLE IF EXISTS positions;
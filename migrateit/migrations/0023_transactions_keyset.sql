@@ -0,0 +1,10 @@
+-- Migration 0023_transactions_keyset.sql
+-- Created on 2026-10-17T12:41:52.275301
+
+-- matches the (date, id) keyset ordering of the paginated transactions listing, undated transactions sort first
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+ON transactions (user_id, (COALESCE(date, 'infinity'::timestamp)) DESC, id DESC);
+
+-- Rollback migration
+
+DROP INDEX IF EXISTS idx_transactions_user_date;
@@ -0,0 +1,118 @@
+-- Migration 0024_sync_versions.sql
+-- Created on 2026-10-17T15:02:37.618044
+
+-- per-user change counter, writes of the same database transaction share a version and the row lock orders the
+-- commits of a user so a client never skips a version committed late
+CREATE TABLE IF NOT EXISTS user_versions (
+	user_id UUID PRIMARY KEY,
+	version BIGINT NOT NULL DEFAULT 0,
+	FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS tombstones (
+	user_id UUID NOT NULL,
+	entity TEXT NOT NULL,
+	entity_id UUID NOT NULL,
+	version BIGINT NOT NULL,
+	PRIMARY KEY (user_id, entity, entity_id),
+	FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_tombstones_version ON tombstones (user_id, version);
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE watchlist ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE accounts ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;
+
+-- existing rows are part of the first sync
+UPDATE transactions SET version = 1;
+UPDATE watchlist SET version = 1;
+UPDATE accounts SET version = 1;
+INSERT INTO user_versions (user_id, version) SELECT id, 1 FROM users ON CONFLICT (user_id) DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_version ON transactions (user_id, version);
+CREATE INDEX IF NOT EXISTS idx_watchlist_version ON watchlist (user_id, version);
+CREATE INDEX IF NOT EXISTS idx_accounts_version ON accounts (user_id, version);
+
+CREATE OR REPLACE FUNCTION next_user_version(uid UUID) RETURNS BIGINT AS $$
+DECLARE
+	setting TEXT := 'sync.v' || replace(uid::text, '-', '');
+	v BIGINT := NULLIF(current_setting(setting, true), '')::BIGINT;
+BEGIN
+	IF v IS NULL THEN
+		INSERT INTO user_versions (user_id, version) VALUES (uid, 1)
+		ON CONFLICT (user_id) DO UPDATE SET version = user_versions.version + 1
+		RETURNING version INTO v;
+		PERFORM set_config(setting, v::text, true);
+	END IF;
+	RETURN v;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sync_touch() RETURNS TRIGGER AS $$
+BEGIN
+	NEW.version := next_user_version(NEW.user_id);
+	RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- TG_ARGV: entity name and the column clients key the entity by
+CREATE OR REPLACE FUNCTION sync_tombstone() RETURNS TRIGGER AS $$
+BEGIN
+	-- rows cascading from a deleted user don't need tombstones
+	IF EXISTS (SELECT 1 FROM users WHERE id = OLD.user_id) THEN
+		INSERT INTO tombstones (user_id, entity, entity_id, version)
+		VALUES (OLD.user_id, TG_ARGV[0], (to_jsonb(OLD) ->> TG_ARGV[1])::uuid, next_user_version(OLD.user_id))
+		ON CONFLICT (user_id, entity, entity_id) DO UPDATE SET version = EXCLUDED.version;
+	END IF;
+	RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+-- balances are synced as part of their account
+CREATE OR REPLACE FUNCTION sync_touch_account() RETURNS TRIGGER AS $$
+BEGIN
+	UPDATE accounts SET version = 0 WHERE id = COALESCE(NEW.account_id, OLD.account_id);
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER transactions_sync_touch BEFORE INSERT OR UPDATE ON transactions
+FOR EACH ROW EXECUTE FUNCTION sync_touch();
+CREATE TRIGGER transactions_sync_tombstone AFTER DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION sync_tombstone('transactions', 'id');
+
+CREATE TRIGGER watchlist_sync_touch BEFORE INSERT OR UPDATE ON watchlist
+FOR EACH ROW EXECUTE FUNCTION sync_touch();
+CREATE TRIGGER watchlist_sync_tombstone AFTER DELETE ON watchlist
+FOR EACH ROW EXECUTE FUNCTION sync_tombstone('watchlist', 'symbol_id');
+
+CREATE TRIGGER accounts_sync_touch BEFORE INSERT OR UPDATE ON accounts
+FOR EACH ROW EXECUTE FUNCTION sync_touch();
+CREATE TRIGGER accounts_sync_tombstone AFTER DELETE ON accounts
+FOR EACH ROW EXECUTE FUNCTION sync_tombstone('accounts', 'id');
+
+CREATE TRIGGER account_balances_sync_touch AFTER INSERT OR UPDATE OR DELETE ON account_balances
+FOR EACH ROW EXECUTE FUNCTION sync_touch_account();
+
+-- Rollback migration
+
+DROP TRIGGER IF EXISTS account_balances_sync_touch ON account_balances;
+DROP TRIGGER IF EXISTS accounts_sync_tombstone ON accounts;
+DROP TRIGGER IF EXISTS accounts_sync_touch ON accounts;
+DROP TRIGGER IF EXISTS watchlist_sync_tombstone ON watchlist;
+DROP TRIGGER IF EXISTS watchlist_sync_touch ON watchlist;
+DROP TRIGGER IF EXISTS transactions_sync_tombstone ON transactions;
+DROP TRIGGER IF EXISTS transactions_sync_touch ON transactions;
+DROP FUNCTION IF EXISTS sync_touch_account();
+DROP FUNCTION IF EXISTS sync_tombstone();
+DROP FUNCTION IF EXISTS sync_touch();
+DROP FUNCTION IF EXISTS next_user_version(UUID);
+DROP INDEX IF EXISTS idx_accounts_version;
+DROP INDEX IF EXISTS idx_watchlist_version;
+DROP INDEX IF EXISTS idx_transactions_version;
+ALTER TABLE accounts DROP COLUMN IF EXISTS version;
+ALTER TABLE watchlist DROP COLUMN IF EXISTS version;
+ALTER TABLE transactions DROP COLUMN IF EXISTS version;
+DROP TABLE IF EXISTS tombstones;
+DROP TABLE IF EXISTS user_versions;
@@ -0,0 +1,18 @@
+-- Migration 0025_users_version.sql
+-- Created on 2026-10-17T16:24:09.381752
+
+-- settings and plan changes bump the user's version so cached settings are revalidated
+CREATE OR REPLACE FUNCTION sync_touch_user() RETURNS TRIGGER AS $$
+BEGIN
+	PERFORM next_user_version(NEW.id);
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER users_sync_touch AFTER UPDATE ON users
+FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*) EXECUTE FUNCTION sync_touch_user();
+
+-- Rollback migration
+
+DROP TRIGGER IF EXISTS users_sync_touch ON users;
+DROP FUNCTION IF EXISTS sync_touch_user();
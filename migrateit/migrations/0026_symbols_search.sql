@@ -0,0 +1,27 @@
+-- Migration 0026_symbols_search.sql
+-- Created on 2026-10-17T17:20:41.503118
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- substring search, only system symbols are searched
+CREATE INDEX IF NOT EXISTS idx_symbols_ticker_trgm ON symbols USING GIN (upper(ticker) gin_trgm_ops)
+WHERE created_by IS NULL;
+CREATE INDEX IF NOT EXISTS idx_symbols_name_trgm ON symbols USING GIN (name gin_trgm_ops)
+WHERE created_by IS NULL;
+
+-- exact and prefix search, used by typeahead and queries too short for trigrams
+CREATE INDEX IF NOT EXISTS idx_symbols_ticker_prefix ON symbols (upper(ticker) text_pattern_ops)
+WHERE created_by IS NULL;
+CREATE INDEX IF NOT EXISTS idx_symbols_name_prefix ON symbols (lower(name) text_pattern_ops)
+WHERE created_by IS NULL;
+CREATE INDEX IF NOT EXISTS idx_symbols_isin_prefix ON symbols (upper(isin) text_pattern_ops)
+WHERE created_by IS NULL;
+
+-- Rollback migration
+
+DROP INDEX IF EXISTS idx_symbols_isin_prefix;
+DROP INDEX IF EXISTS idx_symbols_name_prefix;
+DROP INDEX IF EXISTS idx_symbols_ticker_prefix;
+DROP INDEX IF EXISTS idx_symbols_name_trgm;
+DROP INDEX IF EXISTS idx_symbols_ticker_trgm;
+DROP EXTENSION IF EXISTS pg_trgm;
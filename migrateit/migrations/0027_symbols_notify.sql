@@ -0,0 +1,23 @@
+-- Migration 0027_symbols_notify.sql
+-- Created on 2026-10-17T18:05:12.904377
+
+-- workers keep an in-memory symbol catalog, notifications are only delivered on commit and carry the keys to drop
+CREATE OR REPLACE FUNCTION notify_symbol_change() RETURNS TRIGGER AS $$
+BEGIN
+	IF TG_OP IN ('UPDATE', 'DELETE') THEN
+		PERFORM pg_notify('symbol_changes', json_build_object('id', OLD.id, 'ticker', OLD.ticker, 'isin', OLD.isin)::text);
+	END IF;
+	IF TG_OP IN ('INSERT', 'UPDATE') THEN
+		PERFORM pg_notify('symbol_changes', json_build_object('id', NEW.id, 'ticker', NEW.ticker, 'isin', NEW.isin)::text);
+	END IF;
+	RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER symbols_notify_change AFTER INSERT OR UPDATE OR DELETE ON symbols
+FOR EACH ROW EXECUTE FUNCTION notify_symbol_change();
+
+-- Rollback migration
+
+DROP TRIGGER IF EXISTS symbols_notify_change ON symbols;
+DROP FUNCTION IF EXISTS notify_symbol_change();
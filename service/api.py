@@ -1,18 +1,48 @@
+import json
 import os
+from contextlib import asynccontextmanager
 
 import httpx
 import stripe
+from cache import cache_stats, get_cache_backend
+from circuit_breaker import circuit_stats
 from clients.google import GoogleClient
-from db import get_db
-from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from clients.quotes import quote_engine
+from db import close_pool, get_db, run_in_db
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from http_client import http_clients
 from log import logger
-from models.symbol import Symbol, search_symbol
+from models._limits import require_admin
+from models.search import hybrid_search
+from models.symbol import SEARCH_LIMIT, Symbol, search_symbol
 from models.user import unsubscribe, update_stripe_customer, update_stripe_plan
-from routers import accounts, auth, quotes, symbols, transactions, users, watchlist
+from routers import accounts, auth, export, portfolio, quotes, symbols, sync, transactions, users, watchlist
 from routers import stripe as stripe_route
+from tasks.quotes import QUOTE_REFRESH_ENABLED, quote_refresher
+from tasks.symbols import SYMBOL_CATALOG_ENABLED, symbol_catalog_listener
+from workers import close_workers
 
-app = FastAPI()
+client = GoogleClient()
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if QUOTE_REFRESH_ENABLED:
+        quote_refresher.start()
+    if SYMBOL_CATALOG_ENABLED:
+        symbol_catalog_listener.start()
+    yield
+    await symbol_catalog_listener.stop()
+    await quote_refresher.stop()
+    await http_clients.aclose()
+    close_workers()
+    get_cache_backend().close()
+    close_pool()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(stripe_route.router, prefix="/checkout", tags=["checkout"])
@@ -22,6 +52,9 @@ app.include_router(accounts.router, prefix="/accounts", tags=["accounts"])
 app.include_router(watchlist.router, prefix="/watchlist", tags=["watchlist"])
 app.include_router(symbols.router, prefix="/symbols", tags=["symbols"])
 app.include_router(quotes.router, prefix="/quotes", tags=["quotes"])
+app.include_router(portfolio.router, prefix="/portfolio", tags=["portfolio"])
+app.include_router(export.router, prefix="/export", tags=["export"])
+app.include_router(sync.router, prefix="/sync", tags=["sync"])
 
 EXCHANGERATE_API_KEY = os.getenv("EXCHANGERATE_API_KEY")
 
@@ -35,23 +68,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-client = GoogleClient()
-
 
 @app.get("/search")
 async def search_stock(
+    request: Request,
     q: str | None,
     load_more: bool = False,
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=100),
+    typeahead: bool = Query(False, description="Only match prefixes, for search-as-you-type"),
+    hybrid: bool = Query(False, description="Search the catalog and the APIs at once, streams NDJSON batches"),
     db=Depends(get_db),
 ):
     """
     Searches for a stock symbol using multipla APIs.
+    Hybrid searches write the remote results into the catalog, so they require a session.
     """
     if not q:
         return {"count": 0, "results": []}
 
+    if hybrid:
+        await auth.get_session(request, db)
+        batches = hybrid_search(db, q, client.search_stock, limit)
+        lines = (json.dumps(batch).encode() + b"\n" async for batch in batches)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
     result_set: list[Symbol] = []
     errors = []
 
@@ -61,7 +104,7 @@ async def search_stock(
         except (HTTPException, httpx.TimeoutException) as e:
             errors.append(e)
     else:
-        result_set = search_symbol(db, q)
+        result_set = await run_in_db(search_symbol, db, q, limit, typeahead)
 
     if not result_set and errors:
         raise HTTPException(status_code=400, detail=[e.detail for e in errors])
@@ -93,7 +136,7 @@ async def stripe_webhook(request: Request, db=Depends(get_db)):
         except (KeyError, IndexError, TypeError) as e:
             logger.error(f"Missing key in event data: {e}")
             raise HTTPException(status_code=400, detail="Invalid event data")
-        update_stripe_customer(db, user_id, customer_id)
+        await run_in_db(update_stripe_customer, db, user_id, customer_id)
     elif event["type"] == "customer.subscription.created":
         try:
             data = event["data"]["object"]
@@ -102,7 +145,7 @@ async def stripe_webhook(request: Request, db=Depends(get_db)):
         except (KeyError, IndexError, TypeError) as e:
             logger.error(f"Missing key in event data: {e}")
             raise HTTPException(status_code=400, detail="Invalid event data")
-        update_stripe_plan(db, customer_id, price_id)
+        await run_in_db(update_stripe_plan, db, customer_id, price_id)
     elif event["type"] == "customer.subscription.deleted":
         try:
             data = event["data"]["object"]
@@ -110,11 +153,21 @@ async def stripe_webhook(request: Request, db=Depends(get_db)):
         except (KeyError, IndexError, TypeError) as e:
             logger.error(f"Missing key in event data: {e}")
             raise HTTPException(status_code=400, detail="Invalid event data")
-        unsubscribe(db, customer_id)
+        await run_in_db(unsubscribe, db, customer_id)
 
     return {"status": "success"}
 
 
+@app.get("/metrics")
+async def metrics(_=Depends(require_admin)):
+    return {
+        "http": http_clients.metrics(),
+        "cache": cache_stats(),
+        "quote_providers": quote_engine.health(),
+        "circuits": circuit_stats(),
+    }
+
+
 @app.head("/healthz")
 async def health_check():
     return Response(status_code=200)
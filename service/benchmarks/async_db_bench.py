@@ -0,0 +1,87 @@
+"""
+Concurrent request throughput with blocking vs executor-backed database calls.
+
+Each simulated request runs one query that blocks for `--latency` seconds, either directly inside the coroutine (what
+the routers used to do) or through `db.run_in_db`. With `--dsn` the query is a real `pg_sleep` against Postgres,
+otherwise the driver call is simulated with `time.sleep`.
+
+    PYTHONPATH=. python benchmarks/async_db_bench.py --requests 50 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import time
+
+import db
+from db import fetchall, run_in_db
+
+
+class _FakeCursor:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+    def execute(self, *_):
+        time.sleep(self.latency)
+
+    def fetchall(self):
+        return [(1,)]
+
+
+class _FakeConnection:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def cursor(self, **_):
+        return _FakeCursor(self.latency)
+
+
+async def _blocking_request(conn, sql: str, params: tuple):
+    return fetchall(conn, sql, params)
+
+
+async def _offloaded_request(conn, sql: str, params: tuple):
+    return await run_in_db(fetchall, conn, sql, params)
+
+
+async def _run(handler, connections: list, sql: str, params: tuple) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(conn, sql, params) for conn in connections))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds each query blocks")
+    parser.add_argument("--dsn", default=None, help="run against a real Postgres instead of a simulated driver")
+    args = parser.parse_args()
+
+    if args.dsn:
+        pool = db.ConnectionPool(args.dsn, min_size=1, max_size=db.DB_POOL_MAX_SIZE)
+        connections = [pool.getconn() for _ in range(db.DB_POOL_MAX_SIZE)]
+        connections = [connections[i % len(connections)] for i in range(args.requests)]
+        sql, params = "SELECT pg_sleep(%s)", (args.latency,)
+    else:
+        pool = None
+        connections = [_FakeConnection(args.latency) for _ in range(args.requests)]
+        sql, params = "SELECT 1", ()
+
+    for name, handler in (("blocking", _blocking_request), ("run_in_db", _offloaded_request)):
+        elapsed = asyncio.run(_run(handler, connections, sql, params))
+        print(f"{name:>10}: {args.requests} requests in {elapsed:.3f}s -> {args.requests / elapsed:.1f} req/s")
+
+    if pool:
+        for conn in set(connections):
+            pool.putconn(conn)
+        pool.close()
+    db.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Exporting every transaction of a user, fetching all rows and building the file in memory vs streaming each format
+from a server-side cursor. Throughput is measured first, then the peak memory of a second run under tracemalloc.
+
+Rows are generated lazily by a fake connection, so only what each path keeps alive is measured.
+
+    PYTHONPATH=. python benchmarks/export_bench.py --rows 100000
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from db import fetchall
+from models.export import ExportDataset, export_columns, stream_export
+from streaming import csv_lines, ndjson_lines, zip_files
+
+COLUMNS = export_columns(ExportDataset.TRANSACTIONS)
+
+
+def _row(i: int) -> tuple:
+    at = datetime(2015, 1, 1) + timedelta(hours=i)
+    return (
+        str(uuid.UUID(int=i)),
+        at,
+        ("BUY", "SELL", "DIVIDEND")[i % 3],
+        f"T{i % 500}",
+        f"US{i % 500:010d}",
+        f"Symbol {i % 500}",
+        "Broker",
+        Decimal(f"{i % 97 + 1}.25"),
+        Decimal(f"{i % 1013 + 10}.50"),
+        Decimal("1.00"),
+        "USD",
+        at,
+    )
+
+
+class FakeCursor:
+    def __init__(self, n_rows: int):
+        self.n_rows = n_rows
+        self.position = 0
+        self.itersize = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    def execute(self, *_):
+        pass
+
+    def fetchmany(self, size: int) -> list[tuple]:
+        end = min(self.position + size, self.n_rows)
+        rows = [_row(i) for i in range(self.position, end)]
+        self.position = end
+        return rows
+
+    def fetchall(self) -> list[tuple]:
+        return self.fetchmany(self.n_rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, n_rows: int):
+        self.n_rows = n_rows
+
+    def cursor(self, name: str | None = None, cursor_factory=None) -> FakeCursor:
+        return FakeCursor(self.n_rows)
+
+
+async def _in_memory(db: FakeConnection) -> int:
+    rows = fetchall(db, "")  # type: ignore[arg-type]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    writer.writerows([v.isoformat() if isinstance(v, datetime) else v for v in row] for row in rows)
+    return len(buffer.getvalue().encode())
+
+
+async def _drain(chunks) -> int:
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+    return size
+
+
+async def _csv(db: FakeConnection) -> int:
+    return await _drain(csv_lines(COLUMNS, stream_export(db, "bench", ExportDataset.TRANSACTIONS)))  # type: ignore
+
+
+async def _ndjson(db: FakeConnection) -> int:
+    return await _drain(ndjson_lines(COLUMNS, stream_export(db, "bench", ExportDataset.TRANSACTIONS)))  # type: ignore
+
+
+async def _zip(db: FakeConnection) -> int:
+    batches = stream_export(db, "bench", ExportDataset.TRANSACTIONS)  # type: ignore[arg-type]
+    return await _drain(zip_files([("transactions.csv", csv_lines(COLUMNS, batches))]))
+
+
+async def _bench(name: str, func, n_rows: int) -> int:
+    start = time.perf_counter()
+    size = await func(FakeConnection(n_rows))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    await func(FakeConnection(n_rows))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rate = n_rows / elapsed
+    print(f"{name:>9}: {elapsed:6.2f} s ({rate:9.0f} rows/s), {peak / 2**20:7.1f} MiB peak, {size / 2**20:6.1f} MiB")
+    return size
+
+
+async def main(n_rows: int):
+    in_memory = await _bench("in memory", _in_memory, n_rows)
+    streamed = await _bench("csv", _csv, n_rows)
+    assert in_memory == streamed
+    await _bench("ndjson", _ndjson, n_rows)
+    await _bench("zip", _zip, n_rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
@@ -0,0 +1,77 @@
+"""
+Currency conversion cost of a large result set, awaiting `convert_to_currency` per value (what the readers used to do)
+vs resolving a `RateTable` once and converting whole columns.
+
+Exchange rates are served from an in-memory snapshot, so only the conversion path itself is measured.
+
+    PYTHONPATH=. python benchmarks/fx_conversion_bench.py --rows 10000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import date
+
+from models import rates
+from models.rates import RateSnapshot, RateTable, convert_to_currency
+from models.session import Session
+
+CURRENCIES = ["EUR", "USD", "GBP", "CHF", "JPY", "SEK"]
+
+
+async def _per_row(session: Session, rows: list[dict]) -> list[tuple]:
+    results = []
+    for row in rows:
+        price, _ = await convert_to_currency(session, row["price"], row["currency"])
+        previous_close, _ = await convert_to_currency(session, row["previous_close"], row["currency"])
+        results.append((price, previous_close))
+    return results
+
+
+async def _batched(session: Session, rows: list[dict]) -> list[tuple]:
+    currencies = [row["currency"] for row in rows]
+    table = await RateTable.load(session, currencies)
+    prices = table.convert_column([row["price"] for row in rows], currencies)
+    previous_closes = table.convert_column([row["previous_close"] for row in rows], currencies)
+    return list(zip(prices, previous_closes, strict=True))
+
+
+async def _bench(name: str, func, session: Session, rows: list[dict], rounds: int) -> list[tuple]:
+    result = await func(session, rows)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await func(session, rows)
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"{name:>8}: {elapsed * 1e3:8.2f} ms/request ({elapsed / len(rows) * 1e6:.2f} us/row)")
+    return result
+
+
+async def main(n_rows: int, rounds: int):
+    rates._snapshot = RateSnapshot(
+        base="USD",
+        date=date.today(),
+        rates={c: random.uniform(0.5, 150) for c in CURRENCIES},
+    )
+
+    session = Session(session_id="bench", user="bench", currency="EUR", tokens={}, expires=0)
+    rows = [
+        {
+            "price": random.uniform(1, 500),
+            "previous_close": random.uniform(1, 500),
+            "currency": random.choice(CURRENCIES),
+        }
+        for _ in range(n_rows)
+    ]
+
+    per_row = await _bench("per row", _per_row, session, rows, rounds)
+    batched = await _bench("batched", _batched, session, rows, rounds)
+    assert per_row == batched
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.rounds))
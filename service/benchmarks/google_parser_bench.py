@@ -0,0 +1,72 @@
+"""
+Parse cost of the Google Finance extractor over the saved pages in `tests/fixtures/google`.
+
+When parsel is installed the previous implementation, which re-parsed every result fragment and evaluated absolute
+XPaths against it, is measured as well for comparison.
+
+    PYTHONPATH=. python benchmarks/google_parser_bench.py --rounds 500
+"""
+
+import argparse
+import importlib.util
+import time
+from pathlib import Path
+
+from clients.google_parser import parse_quote_page, parse_search_page
+
+FIXTURES = Path(__file__).parent.parent / "tests" / "fixtures" / "google"
+
+
+def _legacy_search(content: str) -> list:
+    from parsel import Selector
+
+    selector = Selector(content)
+    results = selector.xpath('//*[@id="yDmH0d"]/c-wiz[2]/div/div[4]/div/div/div[3]/ul/li/a').getall()
+    return [
+        (
+            r.xpath("//*/@href").get(""),
+            r.xpath("//*/div/div/div[1]/div[2]/div/text()").get(""),
+            r.xpath("//*/div/div/div[2]/span/div/div/text()").get(""),
+            r.xpath("//*/div/div/div[3]/span/div/div/text()").get(""),
+            r.xpath("//*/div/div/div[3]/span/div/div/span/svg/path/@d").get(""),
+        )
+        for r in (Selector(r) for r in results)
+    ]
+
+
+def _legacy_quote(content: str) -> tuple:
+    from parsel import Selector
+
+    selector = Selector(content)
+    data = Selector(selector.xpath("/html/body/c-wiz[2]/div/div[4]/div/main/div[2]").get(""))
+    price = data.xpath("//*/div[1]/div[1]/c-wiz/div/div[1]/div/div[1]/div/div[1]/div/span/div/div/text()").get("")
+    previous_close = selector.xpath("/html/body/c-wiz[2]/div/div[4]/div/main/div[2]/div[2]/div/div[1]/text()").get("")
+    return price, previous_close
+
+
+def _bench(name: str, func, pages: list[str], rounds: int) -> None:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for page in pages:
+            func(page)
+    elapsed = time.perf_counter() - start
+    print(f"{name:>14}: {elapsed / (rounds * len(pages)) * 1e6:8.1f} us/page")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+
+    search_pages = [p.read_text() for p in sorted(FIXTURES.glob("search_*.html"))]
+    quote_pages = [p.read_text() for p in sorted(FIXTURES.glob("quote_*.html"))]
+
+    _bench("search", parse_search_page, search_pages, args.rounds)
+    _bench("quote", parse_quote_page, quote_pages, args.rounds)
+    if importlib.util.find_spec("parsel"):
+        _bench("legacy search", _legacy_search, search_pages, args.rounds)
+        _bench("legacy quote", _legacy_quote, quote_pages, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Symbol search on a synthetic catalog: the former unbounded `ILIKE '%q%'` scan vs `search_symbol`, first without
+indexes, then with the trigram and prefix indexes of the `0026_symbols_search` migration.
+
+The catalog is a temporary `symbols` table shadowing the real one for this session, nothing is written to the
+database. Needs a Postgres where `pg_trgm` can be created.
+
+    PYTHONPATH=. python benchmarks/search_bench.py --dsn postgresql://localhost/richjet --symbols 100000
+"""
+
+import argparse
+import statistics
+import time
+import uuid
+from pathlib import Path
+
+import psycopg2
+from models.symbol import search_symbol
+from psycopg2.extras import execute_values
+
+MIGRATION = Path(__file__).parents[2] / "migrateit" / "migrations" / "0026_symbols_search.sql"
+
+QUERIES = ("AB", "ABC", "CDEF", "north", "Global Energy", "US0000004242", "banco", "zzzz")
+WORDS = ("North", "Global", "Energy", "Banco", "Pacific", "Micro", "United", "Atlas", "Solar", "Harbor", "Alpine")
+SUFFIXES = ("Inc.", "Corp.", "Holdings", "AG", "SA", "PLC", "ETF")
+COUNTRIES = ("US", "DE", "FR", "GB", "ES", "NL", "IE")
+
+LEGACY_SQL = """
+    SELECT id, ticker, display_name, name, source, isin, currency, picture, created_by
+    FROM symbols
+    WHERE created_by IS NULL AND (
+        ticker ILIKE %s OR
+        name ILIKE %s OR
+        isin ILIKE %s
+    )
+"""
+
+
+def _ticker(i: int) -> str:
+    letters = ""
+    while True:
+        i, r = divmod(i, 26)
+        letters = chr(ord("A") + r) + letters
+        if not i:
+            return letters
+
+
+def _row(i: int) -> tuple:
+    name = f"{WORDS[i % len(WORDS)]} {WORDS[i // 11 % len(WORDS)]} {SUFFIXES[i % len(SUFFIXES)]}"
+    return (
+        str(uuid.UUID(int=i)),
+        _ticker(i),
+        name,
+        name,
+        "bench",
+        f"{COUNTRIES[i % len(COUNTRIES)]}{i:09d}{i % 10}",
+        "USD",
+    )
+
+
+def _create_catalog(db, n_symbols: int):
+    with db.cursor() as cursor:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")  # similarity() is used for ranking
+        cursor.execute(
+            """
+            CREATE TEMP TABLE symbols (
+                id UUID PRIMARY KEY,
+                ticker TEXT NOT NULL,
+                display_name TEXT,
+                name TEXT NOT NULL,
+                source TEXT NOT NULL,
+                isin TEXT,
+                currency TEXT NOT NULL,
+                picture TEXT,
+                created_by UUID
+            )
+            """
+        )
+        execute_values(
+            cursor,
+            "INSERT INTO symbols (id, ticker, display_name, name, source, isin, currency) VALUES %s",
+            (_row(i) for i in range(n_symbols)),
+            page_size=5000,
+        )
+        cursor.execute("ANALYZE symbols")
+
+
+def _create_indexes(db):
+    migration = MIGRATION.read_text().split("-- Rollback migration")[0]
+    with db.cursor() as cursor:
+        cursor.execute(migration)
+        cursor.execute("ANALYZE symbols")
+
+
+def _legacy(db, query: str) -> int:
+    with db.cursor() as cursor:
+        cursor.execute(LEGACY_SQL, (f"%{query}%",) * 3)
+        return len(cursor.fetchall())
+
+
+def _search(db, query: str) -> int:
+    return len(search_symbol(db, query))
+
+
+def _typeahead(db, query: str) -> int:
+    return len(search_symbol(db, query, typeahead=True))
+
+
+def _bench(name: str, func, db, repeat: int):
+    print(f"{name}:")
+    for query in QUERIES:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            found = func(db, query)
+            timings.append(time.perf_counter() - start)
+        print(f"  {query!r:>16}: {statistics.median(timings) * 1000:8.2f} ms median, {found:6} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dsn", required=True)
+    parser.add_argument("--symbols", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    db = psycopg2.connect(args.dsn)
+    try:
+        _create_catalog(db, args.symbols)
+        print(f"{args.symbols} symbols, no indexes")
+        _bench("legacy ILIKE", _legacy, db, args.repeat)
+        _bench("search_symbol", _search, db, args.repeat)
+
+        _create_indexes(db)
+        print(f"\n{args.symbols} symbols, trigram and prefix indexes")
+        _bench("legacy ILIKE", _legacy, db, args.repeat)
+        _bench("search_symbol", _search, db, args.repeat)
+        _bench("search_symbol typeahead", _typeahead, db, args.repeat)
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
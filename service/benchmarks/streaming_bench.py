@@ -0,0 +1,142 @@
+"""
+Peak memory of listing every transaction of a user, fetching all rows and rendering one JSON body (what the
+endpoint used to do) vs streaming them from a server-side cursor and writing the JSON array batch by batch.
+
+Rows are generated lazily by a fake connection, so only what each path keeps alive is measured.
+
+    PYTHONPATH=. python benchmarks/streaming_bench.py --rows 100000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from models import rates
+from models.rates import RateSnapshot
+from models.session import Session
+from models.transactions import _transactions_from_rows, get_transactions_by_user, stream_transactions_by_user
+from streaming import streaming_json
+
+CURRENCIES = ["EUR", "USD", "GBP"]
+TYPES = ["BUY", "SELL", "DIVIDEND"]
+
+
+def _row(i: int) -> dict:
+    rng = random.Random(i)  # both paths must render the same rows
+    currency = rng.choice(CURRENCIES)
+    return {
+        "id": str(uuid.UUID(int=i)),
+        "user_id": "bench",
+        "account_id": "00000000-0000-0000-0000-000000000001",
+        "quantity": rng.uniform(1, 100),
+        "price": rng.uniform(1, 500),
+        "commission": 1.0,
+        "currency": currency,
+        "transaction_type": rng.choice(TYPES),
+        "date": datetime(2020, 1, 1) + timedelta(hours=i),
+        "created_at": datetime(2020, 1, 1) + timedelta(hours=i),
+        "symbol_id": f"{i % 500:08d}-0000-0000-0000-000000000000",
+        "name": f"Symbol {i % 500}",
+        "ticker": f"T{i % 500}",
+        "display_name": f"Symbol {i % 500}",
+        "source": "google",
+        "isin": None,
+        "picture": None,
+        "created_by": None,
+        "manual_price": None,
+        "is_favorite": True,
+        "account_name": "Broker",
+        "account_type": "BROKER",
+        "balance": None,
+        "account_currency": "EUR",
+        "symbol_price": rng.uniform(1, 500),
+        "previous_close": rng.uniform(1, 500),
+        "symbol_currency": currency,
+    }
+
+
+class FakeCursor:
+    def __init__(self, n_rows: int):
+        self.n_rows = n_rows
+        self.position = 0
+        self.itersize = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    def execute(self, *_):
+        pass
+
+    def fetchmany(self, size: int) -> list[dict]:
+        end = min(self.position + size, self.n_rows)
+        rows = [_row(i) for i in range(self.position, end)]
+        self.position = end
+        return rows
+
+    def fetchall(self) -> list[dict]:
+        return self.fetchmany(self.n_rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, n_rows: int):
+        self.n_rows = n_rows
+
+    def cursor(self, name: str | None = None, cursor_factory=None) -> FakeCursor:
+        return FakeCursor(self.n_rows)
+
+
+async def _list(db: FakeConnection, session: Session) -> int:
+    transactions = await get_transactions_by_user(db, session)  # type: ignore[arg-type]
+    return len(JSONResponse(jsonable_encoder([t.to_dict() for t in transactions])).body)
+
+
+async def _streaming(db: FakeConnection, session: Session) -> int:
+    response = streaming_json(
+        [t.to_dict() for t in batch]
+        async for batch in stream_transactions_by_user(db, session)  # type: ignore[arg-type]
+    )
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+
+async def _bench(name: str, func, db: FakeConnection, session: Session) -> int:
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = await func(db, session)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>9}: {peak / 2**20:8.1f} MiB peak, {elapsed:6.2f} s, {size / 2**20:.1f} MiB of JSON")
+    return size
+
+
+async def main(n_rows: int):
+    rates._snapshot = RateSnapshot(base="USD", date=date.today(), rates={"EUR": 0.9, "GBP": 0.8})
+    session = Session(session_id="bench", user="bench", currency="EUR", tokens={}, expires=0)
+    db = FakeConnection(n_rows)
+
+    await _transactions_from_rows(session, [_row(0)])  # warm up imports and the rate snapshot
+    listed = await _bench("list", _list, db, session)
+    streamed = await _bench("streaming", _streaming, db, session)
+    assert listed == streamed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
@@ -0,0 +1,409 @@
+import asyncio
+import contextlib
+import dataclasses
+import functools
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, Awaitable, Callable, Generator
+from dataclasses import dataclass
+from typing import Any, ParamSpec, TypeVar
+
+from db import ConnectionPool, get_db_url, run_in_db
+from log import logger
+from psycopg2.extensions import connection as Connection
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory | sqlite | postgres
+CACHE_PATH = os.getenv("CACHE_PATH", "richjet-cache.sqlite3")  # only used by the sqlite backend
+CACHE_DB_POOL_SIZE = int(os.getenv("CACHE_DB_POOL_SIZE", "2"))  # connections of the postgres backend's own pool
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+_MISSING = object()
+
+_SERIALIZABLE: dict[str, type] = {}  # dataclasses the shared backends can store, by name
+
+
+def cacheable(cls: type[T]) -> type[T]:
+    """
+    Registers a dataclass so its instances can be stored by the shared backends.
+    Values are stored as JSON, never pickled: whoever can write the cache must not be able to run code in a worker.
+    """
+    _SERIALIZABLE[cls.__name__] = cls
+    return cls
+
+
+def _encode(value: Any) -> Any:
+    name = type(value).__name__
+    if dataclasses.is_dataclass(value) and _SERIALIZABLE.get(name) is type(value):
+        return {"__type__": name, **{f.name: getattr(value, f.name) for f in dataclasses.fields(value)}}
+    raise TypeError(f"{name} can't be cached, register it with @cacheable")
+
+
+def _decode(obj: dict) -> Any:
+    if "__type__" not in obj:
+        return obj
+    return _SERIALIZABLE[obj.pop("__type__")](**obj)
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, default=_encode).encode()
+
+
+def _loads(data: bytes | memoryview) -> Any:
+    return json.loads(bytes(data), object_hook=_decode)
+
+
+class CacheBackend(ABC):
+    """
+    Storage for the `cached` decorator. Entries are grouped by namespace, each one with its own TTL and size bound.
+    """
+
+    @abstractmethod
+    async def get(self, namespace: str, key: str) -> Any:
+        """
+        Returns the cached value or `_MISSING` if there is no live entry for the key.
+        """
+
+    @abstractmethod
+    async def set(self, namespace: str, key: str, value: Any, ttl: float, maxsize: int) -> None: ...
+
+    @abstractmethod
+    async def delete(self, namespace: str, key: str) -> None: ...
+
+    @abstractmethod
+    async def clear(self, namespace: str) -> None: ...
+
+    def close(self) -> None:
+        """
+        Releases the resources held by the backend, called on shutdown.
+        """
+
+
+class MemoryCache(CacheBackend):
+    """
+    Per-process LRU cache.
+    """
+
+    def __init__(self):
+        self._entries: dict[str, OrderedDict[str, tuple[float, Any]]] = {}
+
+    async def get(self, namespace: str, key: str) -> Any:
+        entries = self._entries.get(namespace)
+        if entries is None or key not in entries:
+            return _MISSING
+        expires_at, value = entries[key]
+        if expires_at <= time.time():
+            del entries[key]
+            return _MISSING
+        entries.move_to_end(key)
+        return value
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: float, maxsize: int) -> None:
+        entries = self._entries.setdefault(namespace, OrderedDict())
+        entries[key] = (time.time() + ttl, value)
+        entries.move_to_end(key)
+        while len(entries) > maxsize:
+            entries.popitem(last=False)
+
+    async def delete(self, namespace: str, key: str) -> None:
+        self._entries.get(namespace, {}).pop(key, None)
+
+    async def clear(self, namespace: str) -> None:
+        self._entries.pop(namespace, None)
+
+
+class SqliteCache(CacheBackend):
+    """
+    On-disk cache shared by every worker on the same host and kept across restarts.
+    """
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+
+    @contextlib.contextmanager
+    def _connect(self) -> Generator[sqlite3.Connection]:
+        with contextlib.closing(sqlite3.connect(self.path, timeout=5)) as conn, conn:
+            yield conn
+
+    def _get(self, namespace: str, key: str) -> Any:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time()),
+            ).fetchone()
+        return _loads(row[0]) if row else _MISSING
+
+    def _set(self, namespace: str, key: str, value: Any, ttl: float, maxsize: int) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, _dumps(value), now + ttl),
+            )
+            conn.execute(
+                """
+                DELETE FROM cache_entries
+                WHERE namespace = ? AND (expires_at <= ? OR key IN (
+                    SELECT key FROM cache_entries WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                ))
+                """,
+                (namespace, now, namespace, maxsize),
+            )
+
+    def _delete(self, namespace: str, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def _clear(self, namespace: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+
+    async def get(self, namespace: str, key: str) -> Any:
+        return await asyncio.to_thread(self._get, namespace, key)
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: float, maxsize: int) -> None:
+        await asyncio.to_thread(self._set, namespace, key, value, ttl, maxsize)
+
+    async def delete(self, namespace: str, key: str) -> None:
+        await asyncio.to_thread(self._delete, namespace, key)
+
+    async def clear(self, namespace: str) -> None:
+        await asyncio.to_thread(self._clear, namespace)
+
+
+class PostgresCache(CacheBackend):
+    """
+    Cache stored in the `cache_entries` table, shared by every worker and instance using the same database.
+
+    It has a small pool of its own: cached calls run while the request already holds a connection of the main pool,
+    checking out a second one there could exhaust it under load and fail requests with a 503.
+    """
+
+    def __init__(self, pool_size: int = CACHE_DB_POOL_SIZE):
+        self.pool_size = pool_size
+        self._pool: ConnectionPool | None = None
+
+    def _get_pool(self) -> ConnectionPool:
+        if self._pool is None:
+            self._pool = ConnectionPool(get_db_url(), min_size=1, max_size=self.pool_size)
+        return self._pool
+
+    @contextlib.asynccontextmanager
+    async def _connection(self) -> AsyncGenerator[Connection]:
+        pool = self._get_pool()
+        conn = await asyncio.to_thread(pool.getconn)
+        try:
+            yield conn
+        finally:
+            await asyncio.to_thread(pool.putconn, conn)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    @staticmethod
+    def _get(db: Connection, namespace: str, key: str) -> Any:
+        with db.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT value FROM cache_entries
+                WHERE namespace = %s AND key = %s AND expires_at > CURRENT_TIMESTAMP
+                """,
+                (namespace, key),
+            )
+            row = cursor.fetchone()
+        db.rollback()
+        return _loads(row[0]) if row else _MISSING
+
+    @staticmethod
+    def _set(db: Connection, namespace: str, key: str, value: Any, ttl: float, maxsize: int) -> None:
+        with db.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO cache_entries (namespace, key, value, expires_at)
+                VALUES (%s, %s, %s, CURRENT_TIMESTAMP + make_interval(secs => %s))
+                ON CONFLICT (namespace, key) DO UPDATE
+                SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at
+                """,
+                (namespace, key, _dumps(value), ttl),
+            )
+            cursor.execute(
+                """
+                DELETE FROM cache_entries
+                WHERE namespace = %s AND (expires_at <= CURRENT_TIMESTAMP OR key IN (
+                    SELECT key FROM cache_entries WHERE namespace = %s ORDER BY expires_at DESC OFFSET %s
+                ))
+                """,
+                (namespace, namespace, maxsize),
+            )
+        db.commit()
+
+    @staticmethod
+    def _delete(db: Connection, namespace: str, key: str) -> None:
+        with db.cursor() as cursor:
+            cursor.execute("DELETE FROM cache_entries WHERE namespace = %s AND key = %s", (namespace, key))
+        db.commit()
+
+    @staticmethod
+    def _clear(db: Connection, namespace: str) -> None:
+        with db.cursor() as cursor:
+            cursor.execute("DELETE FROM cache_entries WHERE namespace = %s", (namespace,))
+        db.commit()
+
+    async def get(self, namespace: str, key: str) -> Any:
+        async with self._connection() as db:
+            return await run_in_db(self._get, db, namespace, key)
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: float, maxsize: int) -> None:
+        async with self._connection() as db:
+            await run_in_db(self._set, db, namespace, key, value, ttl, maxsize)
+
+    async def delete(self, namespace: str, key: str) -> None:
+        async with self._connection() as db:
+            await run_in_db(self._delete, db, namespace, key)
+
+    async def clear(self, namespace: str) -> None:
+        async with self._connection() as db:
+            await run_in_db(self._clear, db, namespace)
+
+
+_BACKENDS: dict[str, Callable[[], CacheBackend]] = {
+    "memory": MemoryCache,
+    "sqlite": SqliteCache,
+    "postgres": PostgresCache,
+}
+_backend: CacheBackend | None = None
+
+
+def get_cache_backend() -> CacheBackend:
+    global _backend
+    if _backend is None:
+        if CACHE_BACKEND not in _BACKENDS:
+            raise ValueError(f"unsupported cache backend: {CACHE_BACKEND}")
+        _backend = _BACKENDS[CACHE_BACKEND]()
+    return _backend
+
+
+def set_cache_backend(backend: CacheBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    errors: int = 0
+
+    def to_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+_stats: dict[str, CacheStats] = {}
+
+
+def cache_stats() -> dict[str, dict]:
+    return {namespace: stats.to_dict() for namespace, stats in _stats.items()}
+
+
+def _default_key(*args, **kwargs) -> str:
+    return repr((args, sorted(kwargs.items())))
+
+
+def cached(
+    namespace: str,
+    ttl: float,
+    maxsize: int = 128,
+    key: Callable[..., Any] | None = None,
+) -> Callable[[Callable[P, Awaitable[T]]], Callable[P, Awaitable[T]]]:
+    """
+    Caches the result of a coroutine function in the configured backend.
+
+    Concurrent calls for the same key share a single execution, exceptions are never cached and backend failures
+    degrade to calling the function. Pass `key` to build the cache key from the call arguments, e.g. to skip `self`.
+    `cache_invalidate` takes the same arguments as the function and drops the entry for them.
+    Results must be JSON values or `@cacheable` dataclasses for the shared backends.
+    """
+    stats = _stats.setdefault(namespace, CacheStats())
+
+    def decorator(func: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T]]:
+        inflight: dict[str, asyncio.Future[T]] = {}
+        generations: dict[str, int] = {}  # bumped on invalidation so results computed before it aren't stored
+
+        def _key(*args, **kwargs) -> str:
+            return str(key(*args, **kwargs)) if key else _default_key(*args, **kwargs)
+
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            cache_key = _key(*args, **kwargs)
+            backend = get_cache_backend()
+
+            try:
+                value = await backend.get(namespace, cache_key)
+            except Exception as e:
+                stats.errors += 1
+                logger.warning(f"cache {namespace}: get failed: {e}")
+                value = _MISSING
+            if value is not _MISSING:
+                stats.hits += 1
+                return value
+            stats.misses += 1
+
+            if cache_key not in inflight:
+                # the shared call runs as its own task: cancelling one caller never cancels it for the others
+                task = asyncio.ensure_future(_call(backend, cache_key, generations.get(cache_key, 0), args, kwargs))
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())  # nobody may be waiting on it
+                task.add_done_callback(lambda t, k=cache_key: inflight.pop(k) if inflight.get(k) is t else None)
+                inflight[cache_key] = task
+            return await asyncio.shield(inflight[cache_key])
+
+        async def _call(backend: CacheBackend, cache_key: str, generation: int, args: tuple, kwargs: dict) -> T:
+            result = await func(*args, **kwargs)
+            if generations.get(cache_key, 0) != generation:
+                return result
+            try:
+                await backend.set(namespace, cache_key, result, ttl, maxsize)
+            except Exception as e:
+                stats.errors += 1
+                logger.warning(f"cache {namespace}: set failed: {e}")
+            return result
+
+        async def cache_clear() -> None:
+            await get_cache_backend().clear(namespace)
+
+        async def cache_invalidate(*args, **kwargs) -> None:
+            cache_key = _key(*args, **kwargs)
+            generations[cache_key] = generations.get(cache_key, 0) + 1
+            inflight.pop(cache_key, None)
+            await get_cache_backend().delete(namespace, cache_key)
+
+        wrapper.cache_clear = cache_clear  # type: ignore[attr-defined]
+        wrapper.cache_invalidate = cache_invalidate  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorator
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+from collections.abc import Awaitable, Callable
+from typing import ParamSpec, TypeVar
+
+import httpx
+from fastapi import HTTPException
+from log import logger
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # consecutive failures before opening
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))  # seconds open before a probe is let through
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Fails fast once a remote keeps failing instead of waiting for every call to time out.
+
+    The circuit opens after `failure_threshold` consecutive failures and rejects calls with a 503 until `reset_timeout`
+    has elapsed, then a single probe is let through and its outcome closes or re-opens the circuit. Only transport
+    errors, timeouts and 429/5xx responses count as failures, a 404 still proves the remote is up.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+        _breakers[name] = self
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    async def call(self, func: Callable[P, Awaitable[T]], *args: P.args, **kwargs: P.kwargs) -> T:
+        self._acquire()
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            self._probing = False
+            raise
+        except Exception as e:
+            if self._is_failure(e):
+                self._record_failure()
+            else:
+                self._record_success()
+            raise
+        self._record_success()
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            "state": OPEN if self.is_open else self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+    def _acquire(self) -> None:
+        if self.state == OPEN:
+            if self.is_open:
+                self._reject()
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:  # only one probe at a time
+                self._reject()
+            self._probing = True
+
+    def _reject(self) -> None:
+        self.rejected += 1
+        raise HTTPException(status_code=503, detail=f"{self.name}: temporarily unavailable")
+
+    def _record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info(f"circuit {self.name}: closed")
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def _record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(f"circuit {self.name}: open after {self.failures} failures")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    @staticmethod
+    def _is_failure(e: Exception) -> bool:
+        if isinstance(e, HTTPException):
+            return e.status_code == 429 or e.status_code >= 500
+        return isinstance(e, httpx.TransportError)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def circuit_stats() -> dict[str, dict]:
+    return {name: breaker.to_dict() for name, breaker in _breakers.items()}
@@ -0,0 +1,90 @@
+import re
+
+from circuit_breaker import CircuitBreaker
+from fastapi import HTTPException
+from http_client import http_clients
+from models.quote import StockQuote
+
+from clients._errors import ERROR_FAILED_TO_FETCH_STOCK_QUOTE
+from clients.ft_parser import parse_quote_page
+
+_CURRENCY = re.compile(r"\(([A-Za-z]{3})\)")
+_FUND = re.compile(r"^[A-Z]{2}[A-Z0-9]{9}[0-9]:[A-Z]{3}$")  # ISIN:currency
+
+
+class FTClient:
+    """
+    Scrapes quotes from the FT markets tearsheets, a second source for the tickers of the supported exchanges.
+    """
+
+    NAME = "ft"
+    BASE_URL = "https://markets.ft.com/data"
+    HEADERS = {
+        "User-Agent": "python-requests/2.31.0",
+        "Accept": "*/*",
+        "Connection": "keep-alive",
+    }
+    # Google Finance exchange codes to the FT ones
+    EXCHANGES = {
+        "NASDAQ": "NSQ",
+        "NYSE": "NYQ",
+        "NYSEARCA": "PCQ",
+        "LON": "LSE",
+        "ETR": "GER",
+        "EPA": "PAR",
+        "AMS": "AEX",
+        "BME": "MCE",
+        "BIT": "MIL",
+        "TSE": "TOR",
+        "HKG": "HKG",
+        "ASX": "ASX",
+        "TYO": "TYO",
+    }
+    breaker = CircuitBreaker(NAME)  # shared by every instance, they all hit the same host
+
+    @classmethod
+    def tearsheet_url(cls, symbol: str) -> str | None:
+        """
+        Builds the tearsheet URL of a `TICKER:EXCHANGE` symbol or an `ISIN:CURRENCY` fund, None when FT can't serve it.
+        """
+        symbol = symbol.upper()
+        if _FUND.match(symbol):
+            return f"{cls.BASE_URL}/funds/tearsheet/summary?s={symbol}"
+        ticker, _, exchange = symbol.partition(":")
+        if not ticker or exchange not in cls.EXCHANGES:
+            return None
+        return f"{cls.BASE_URL}/equities/tearsheet/summary?s={ticker}:{cls.EXCHANGES[exchange]}"
+
+    async def fetch_quote(self, symbol: str, retries: int | None = None) -> StockQuote:
+        """
+        Scrapes the current quote for the given symbol.
+        `retries` overrides the HTTP client's retry count, e.g. 0 for hedged requests.
+        """
+        url = self.tearsheet_url(symbol)
+        if not url:
+            raise HTTPException(status_code=404, detail=f"{self.NAME}: {symbol} is not listed on a supported exchange")
+        content = await self.breaker.call(self._get, url, ERROR_FAILED_TO_FETCH_STOCK_QUOTE, retries=retries)
+
+        data = parse_quote_page(content)
+        currency = _CURRENCY.search(data.price_label)
+        price, previous_close = _to_float(data.price), _to_float(data.previous_close)
+        currency = currency.group(1).upper() if currency else "USD"
+        if currency == "GBX":  # London listings are quoted in pence
+            currency = "GBP"
+            price = price / 100 if price else price
+            previous_close = previous_close / 100 if previous_close else previous_close
+
+        return StockQuote(ticker=symbol, current=price or 0.0, currency=currency, previous_close=previous_close)
+
+    async def _get(self, url: str, error: str, retries: int | None = None) -> str:
+        resp = await http_clients.get(url, retries=retries, headers=self.HEADERS, timeout=5, follow_redirects=True)
+        if resp.status_code != 200:
+            raise HTTPException(status_code=resp.status_code, detail=f"{self.NAME}: {error}")
+        return resp.content.decode("utf-8")
+
+
+def _to_float(value: str) -> float | None:
+    try:
+        return float(value.replace(",", ""))
+    except ValueError:
+        return None
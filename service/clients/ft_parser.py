@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+
+from lxml import etree, html
+
+_QUOTE_BAR_PRICE = etree.XPath('//ul[contains(@class, "mod-tearsheet-overview__quote__bar")]/li[1]')
+_QUOTE_LABEL = etree.XPath('string(.//span[contains(@class, "mod-ui-data-list__label")])')
+_QUOTE_VALUE = etree.XPath('string(.//span[contains(@class, "mod-ui-data-list__value")])')
+_QUOTE_PREVIOUS_CLOSE = etree.XPath(
+    'string(//div[contains(@class, "mod-tearsheet-key-stats")]//th[normalize-space()="Previous close"]'
+    "/following-sibling::td[1])"
+)
+
+
+@dataclass
+class QuoteResult:
+    price_label: str  # e.g. "Price (USD)", the currency is only in the label
+    price: str
+    previous_close: str
+
+
+def parse_quote_page(content: str | bytes) -> QuoteResult:
+    """
+    Extracts the raw price fields of an FT markets tearsheet, missing fields are returned as empty strings.
+    """
+    root = html.fromstring(content)
+    bar = _QUOTE_BAR_PRICE(root)
+    if not bar:
+        return QuoteResult(price_label="", price="", previous_close="")
+    return QuoteResult(
+        price_label=_QUOTE_LABEL(bar[0]).strip(),
+        price=_QUOTE_VALUE(bar[0]).strip(),
+        previous_close=_QUOTE_PREVIOUS_CLOSE(root).strip(),
+    )
@@ -1,13 +1,14 @@
 import re
 
-import httpx
-from async_lru import alru_cache
+from cache import cached
+from circuit_breaker import CircuitBreaker
 from fastapi import HTTPException
+from http_client import http_clients
 from models.quote import StockQuote
 from models.symbol import Symbol
-from parsel import Selector
 
 from clients._errors import ERROR_FAILED_TO_FETCH_STOCK_DATA, ERROR_FAILED_TO_FETCH_STOCK_QUOTE
+from clients.google_parser import parse_quote_page, parse_search_page
 from pyutils.strings import split_money, symbol_to_currency, whitespaces_clean
 from pyutils.validators import is_valid_isin
 
@@ -15,46 +16,31 @@ from pyutils.validators import is_valid_isin
 class GoogleClient:
     NAME = "google"
     BASE_URL = "https://www.google.com/finance/quote"
-
-    @alru_cache(maxsize=128, ttl=43200)  # cache results for 12 hours
+    HEADERS = {
+        "User-Agent": "python-requests/2.31.0",
+        "Accept": "*/*",
+        "Connection": "keep-alive",
+    }
+    breaker = CircuitBreaker(NAME)  # shared by every instance, they all hit the same host
+
+    @cached("google.search", ttl=43200, key=lambda _, q: q)  # cache results for 12 hours
     async def search_stock(self, q: str) -> list[Symbol]:
-        async with httpx.AsyncClient(timeout=5) as client:
-            resp = await client.get(
-                f"{self.BASE_URL}/{q}",
-                headers={
-                    "User-Agent": "python-requests/2.31.0",
-                    "Accept": "*/*",
-                    "Connection": "keep-alive",
-                },
-                timeout=5,
-                follow_redirects=True,
-            )
-
-        if resp.status_code != 200:
-            raise HTTPException(
-                status_code=resp.status_code,
-                detail=f"{self.NAME}: {ERROR_FAILED_TO_FETCH_STOCK_DATA}",
-            )
-
-        selector = Selector(resp.content.decode("utf-8"))
-        results = selector.xpath('//*[@id="yDmH0d"]/c-wiz[2]/div/div[4]/div/div/div[3]/ul/li/a').getall()
-        results = [Selector(r) for r in results]
+        content = await self.breaker.call(self._get, f"{self.BASE_URL}/{q}", ERROR_FAILED_TO_FETCH_STOCK_DATA)
 
         symbols = []
-        for r in results:
-            ticker = whitespaces_clean(r.xpath("//*/@href").get("").split("/")[-1])
-            display_name = whitespaces_clean(r.xpath("//*/div/div/div[1]/div[2]/div/text()").get(""))
-            currency, price = split_money(r.xpath("//*/div/div/div[2]/span/div/div/text()").get(""))
+        for r in parse_search_page(content):
+            ticker = whitespaces_clean(r.ticker)
+            display_name = whitespaces_clean(r.name)
+            currency, price = split_money(r.price)
             currency = symbol_to_currency(currency) if currency else "USD"
 
             open_price = None
-            change = whitespaces_clean(r.xpath("//*/div/div/div[3]/span/div/div/text()").get(""))
+            change = whitespaces_clean(r.change)
             match = re.search(r"[\d,\.]+", change)
             change = float(match.group(0).replace(",", ".")) if match else None
             if change and price:
                 change = price * (abs(change) / 100)
-                symbol = r.xpath("//*/div/div/div[3]/span/div/div/span/svg/path/@d").get("")
-                open_price = price - change if self.is_percentage_increase(symbol) else price + change
+                open_price = price - change if self.is_percentage_increase(r.change_arrow) else price + change
 
             symbols.append(
                 Symbol(
@@ -62,7 +48,7 @@ class GoogleClient:
                     display_name=display_name,
                     name=display_name,
                     source=self.NAME,
-                    isin=q if is_valid_isin(q) else None,
+                    isin=q if is_valid_isin(q) and not symbols else None,  # ISINs are unique, the first listing gets it
                     currency=currency or "USD",
                     picture=f"https://assets.parqet.com/logos/symbol/{ticker}",
                     price=price,
@@ -72,34 +58,21 @@ class GoogleClient:
 
         return symbols
 
-    @alru_cache(maxsize=128, ttl=43200)  # cache results for 12 hours
+    @cached("google.quote", ttl=43200, key=lambda _, symbol: symbol)  # cache results for 12 hours
     async def get_quote(self, symbol: str) -> StockQuote:
-        async with httpx.AsyncClient(timeout=5) as client:
-            resp = await client.get(
-                f"{self.BASE_URL}/{symbol}",
-                headers={
-                    "User-Agent": "python-requests/2.31.0",
-                    "Accept": "*/*",
-                    "Connection": "keep-alive",
-                },
-                timeout=5,
-                follow_redirects=True,
-            )
+        return await self.fetch_quote(symbol)
 
-        if resp.status_code != 200:
-            raise HTTPException(
-                status_code=resp.status_code,
-                detail=f"{self.NAME}: {ERROR_FAILED_TO_FETCH_STOCK_QUOTE}",
-            )
-
-        selector = Selector(resp.content.decode("utf-8"))
-        data = Selector(selector.xpath("/html/body/c-wiz[2]/div/div[4]/div/main/div[2]").get(""))
+    async def fetch_quote(self, symbol: str, retries: int | None = None) -> StockQuote:
+        """
+        Scrapes the current quote for the given symbol bypassing the cache.
+        `retries` overrides the HTTP client's retry count, e.g. 0 for hedged requests.
+        """
+        url = f"{self.BASE_URL}/{symbol}"
+        content = await self.breaker.call(self._get, url, ERROR_FAILED_TO_FETCH_STOCK_QUOTE, retries=retries)
 
-        currency = data.xpath("//*/div[1]/div[1]/c-wiz/div/div[1]/div/div[1]/div/div[1]/div/span/div/div/text()")
-        currency, price = split_money(currency.get(""))
-
-        data = selector.xpath("/html/body/c-wiz[2]/div/div[4]/div/main/div[2]/div[2]/div/div[1]/text()").get("")
-        _, open_price = split_money(data)
+        data = parse_quote_page(content)
+        currency, price = split_money(data.price)
+        _, open_price = split_money(data.previous_close)
 
         return StockQuote(
             ticker=symbol,
@@ -108,6 +81,12 @@ class GoogleClient:
             previous_close=open_price,
         )
 
+    async def _get(self, url: str, error: str, retries: int | None = None) -> str:
+        resp = await http_clients.get(url, retries=retries, headers=self.HEADERS, timeout=5, follow_redirects=True)
+        if resp.status_code != 200:
+            raise HTTPException(status_code=resp.status_code, detail=f"{self.NAME}: {error}")
+        return resp.content.decode("utf-8")
+
     @staticmethod
     def is_percentage_increase(symbol: str) -> bool:
         return symbol == "M4 12l1.41 1.41L11 7.83V20h2V7.83l5.58 5.59L20 12l-8-8-8 8z"
@@ -0,0 +1,67 @@
+from dataclasses import dataclass
+
+from lxml import etree, html
+
+# each page is parsed once and every expression is compiled at import time, result fields are evaluated relative to
+# their own result node instead of re-parsing serialized fragments
+_SEARCH_RESULTS = etree.XPath('//*[@id="yDmH0d"]/c-wiz[2]/div/div[4]/div/div/div[3]/ul/li/a')
+_SEARCH_HREF = etree.XPath("string(@href)")
+_SEARCH_NAME = etree.XPath("string(.//div/div/div[1]/div[2]/div/text())")
+_SEARCH_PRICE = etree.XPath("string(.//div/div/div[2]/span/div/div/text())")
+_SEARCH_CHANGE = etree.XPath("string(.//div/div/div[3]/span/div/div/text())")
+_SEARCH_CHANGE_ARROW = etree.XPath("string(.//div/div/div[3]/span/div/div/span/svg/path/@d)")
+
+_QUOTE_DATA = etree.XPath("/html/body/c-wiz[2]/div/div[4]/div/main/div[2]")
+_QUOTE_PRICE = etree.XPath("string(.//div[1]/c-wiz/div/div[1]/div/div[1]/div/div[1]/div/span/div/div/text())")
+_QUOTE_PREVIOUS_CLOSE = etree.XPath("string(./div[2]/div/div[1]/text())")
+
+
+@dataclass
+class SearchResult:
+    href: str
+    name: str
+    price: str
+    change: str
+    change_arrow: str
+
+    @property
+    def ticker(self) -> str:
+        return self.href.split("/")[-1]
+
+
+@dataclass
+class QuoteResult:
+    price: str
+    previous_close: str
+
+
+def _parse(content: str | bytes) -> etree._Element:
+    return html.fromstring(content)
+
+
+def parse_search_page(content: str | bytes) -> list[SearchResult]:
+    """
+    Extracts the raw fields of every result in a Google Finance search page.
+    """
+    root = _parse(content)
+    return [
+        SearchResult(
+            href=_SEARCH_HREF(node),
+            name=_SEARCH_NAME(node),
+            price=_SEARCH_PRICE(node),
+            change=_SEARCH_CHANGE(node),
+            change_arrow=_SEARCH_CHANGE_ARROW(node),
+        )
+        for node in _SEARCH_RESULTS(root)
+    ]
+
+
+def parse_quote_page(content: str | bytes) -> QuoteResult:
+    """
+    Extracts the raw price fields of a Google Finance quote page, missing fields are returned as empty strings.
+    """
+    root = _parse(content)
+    data = _QUOTE_DATA(root)
+    if not data:
+        return QuoteResult(price="", previous_close="")
+    return QuoteResult(price=_QUOTE_PRICE(data[0]), previous_close=_QUOTE_PREVIOUS_CLOSE(data[0]))
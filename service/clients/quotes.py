@@ -0,0 +1,181 @@
+import asyncio
+import os
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Protocol
+
+from cache import cached
+from fastapi import HTTPException
+from log import logger
+from models.quote import StockQuote
+
+from clients._errors import ERROR_FAILED_TO_FETCH_STOCK_QUOTE
+from clients.ft import FTClient
+from clients.google import GoogleClient
+
+QUOTE_PROVIDERS = [p.strip() for p in os.getenv("QUOTE_PROVIDERS", "google,ft").split(",") if p.strip()]
+QUOTE_HEDGE_DEFAULT_DELAY = float(os.getenv("QUOTE_HEDGE_DEFAULT_DELAY", "1.5"))  # used until enough samples exist
+QUOTE_HEDGE_MIN_DELAY = float(os.getenv("QUOTE_HEDGE_MIN_DELAY", "0.3"))
+QUOTE_HEDGE_MAX_DELAY = float(os.getenv("QUOTE_HEDGE_MAX_DELAY", "3"))
+
+_HEALTH_DECAY = 0.2  # weight of the latest outcome in the health score
+_MIN_LATENCY_SAMPLES = 10
+
+
+class QuoteProvider(Protocol):
+    NAME: str
+
+    async def fetch_quote(self, symbol: str, retries: int | None = None) -> StockQuote: ...
+
+
+@dataclass
+class ProviderHealth:
+    score: float = 1.0
+    successes: int = 0
+    failures: int = 0
+    latencies: deque[float] = field(default_factory=lambda: deque(maxlen=100))
+
+    def record_success(self, latency: float) -> None:
+        self.successes += 1
+        self.latencies.append(latency)
+        self.score = self.score * (1 - _HEALTH_DECAY) + _HEALTH_DECAY
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.score = self.score * (1 - _HEALTH_DECAY)
+
+    def p95(self) -> float | None:
+        if len(self.latencies) < _MIN_LATENCY_SAMPLES:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    def to_dict(self) -> dict:
+        return {
+            "score": self.score,
+            "successes": self.successes,
+            "failures": self.failures,
+            "p95": self.p95(),
+        }
+
+
+class QuoteEngine:
+    """
+    Fetches quotes from the registered providers, healthiest first.
+
+    When the first provider hasn't answered within its p95 latency a hedged request is sent to the next one and the
+    first valid quote wins. Hedged requests skip HTTP retries, the slow request is still running. A single provider is
+    never hedged against itself. Failed providers fall through to the next one immediately.
+    """
+
+    NAME = "quotes"
+
+    def __init__(
+        self,
+        providers: list[QuoteProvider] | None = None,
+        default_delay: float = QUOTE_HEDGE_DEFAULT_DELAY,
+        min_delay: float = QUOTE_HEDGE_MIN_DELAY,
+        max_delay: float = QUOTE_HEDGE_MAX_DELAY,
+    ):
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._providers: list[QuoteProvider] = []
+        self._health: dict[str, ProviderHealth] = {}
+        for provider in providers or []:
+            self.register(provider)
+
+    def register(self, provider: QuoteProvider) -> None:
+        if provider.NAME in self._health:
+            raise ValueError(f"{self.NAME}: provider {provider.NAME} is already registered")
+        self._providers.append(provider)
+        self._health[provider.NAME] = ProviderHealth()
+
+    def health(self) -> dict[str, dict]:
+        return {name: h.to_dict() for name, h in self._health.items()}
+
+    def hedge_delay(self, provider: QuoteProvider) -> float:
+        p95 = self._health[provider.NAME].p95()
+        if p95 is None:
+            return self.default_delay
+        return min(max(p95, self.min_delay), self.max_delay)
+
+    def ranked(self) -> list[QuoteProvider]:
+        return sorted(self._providers, key=lambda p: self._health[p.NAME].score, reverse=True)
+
+    @cached("quotes", ttl=43200, key=lambda _, symbol: symbol)  # cache results for 12 hours
+    async def get_quote(self, symbol: str) -> StockQuote:
+        return await self.fetch_quote(symbol)
+
+    async def fetch_quote(self, symbol: str) -> StockQuote:
+        """
+        Fetches a fresh quote bypassing the cache.
+        """
+        if not self._providers:
+            raise HTTPException(status_code=503, detail="no quote providers registered")
+
+        candidates = self.ranked()
+        candidates.reverse()  # pop from the healthiest
+
+        pending: dict[asyncio.Task, QuoteProvider] = {}
+        primary = candidates.pop()
+        pending[asyncio.create_task(self._fetch(primary, symbol))] = primary
+        hedge_at = time.monotonic() + self.hedge_delay(primary)
+
+        try:
+            while pending:
+                timeout = max(hedge_at - time.monotonic(), 0) if candidates else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:  # the primary is slow, hedge
+                    provider = candidates.pop()
+                    logger.info(f"{self.NAME}: hedging {symbol} to {provider.NAME}")
+                    pending[asyncio.create_task(self._fetch(provider, symbol, retries=0))] = provider
+                    hedge_at = time.monotonic() + self.hedge_delay(provider)
+                    continue
+
+                for task in done:
+                    pending.pop(task)
+                    quote = task.result()
+                    if quote is not None:
+                        return quote
+
+                if not pending and candidates:  # every request so far failed, fall back right away
+                    provider = candidates.pop()
+                    pending[asyncio.create_task(self._fetch(provider, symbol))] = provider
+                    hedge_at = time.monotonic() + self.hedge_delay(provider)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise HTTPException(status_code=502, detail=f"{self.NAME}: {ERROR_FAILED_TO_FETCH_STOCK_QUOTE}")
+
+    async def _fetch(self, provider: QuoteProvider, symbol: str, retries: int | None = None) -> StockQuote | None:
+        health = self._health[provider.NAME]
+        start = time.monotonic()
+        try:
+            quote = await provider.fetch_quote(symbol, retries=retries)
+        except asyncio.CancelledError:
+            raise
+        except HTTPException as e:
+            logger.error(e.detail)
+            quote = None
+        except Exception as e:
+            logger.error(f"{provider.NAME}: {type(e).__name__} {e}")
+            quote = None
+
+        if quote is None or not quote.current or quote.current <= 0:
+            health.record_failure()
+            return None
+        health.record_success(time.monotonic() - start)
+        return quote
+
+
+_PROVIDERS: dict[str, Callable[[], QuoteProvider]] = {
+    GoogleClient.NAME: GoogleClient,
+    FTClient.NAME: FTClient,
+}
+
+quote_engine = QuoteEngine([_PROVIDERS[name]() for name in dict.fromkeys(QUOTE_PROVIDERS)])
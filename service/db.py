@@ -1,9 +1,31 @@
+import asyncio
+import contextlib
+import functools
 import os
+import threading
+import time
+import uuid
+from collections.abc import AsyncGenerator, Callable, Generator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, TypeVar
 
 import psycopg2
+from fastapi import HTTPException
+from log import logger
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.extensions import connection as Connection
+from psycopg2.pool import PoolError, ThreadedConnectionPool
 
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))  # seconds to wait for a free connection
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # seconds before a connection is recycled
+DB_CURSOR_ITERSIZE = int(os.getenv("DB_CURSOR_ITERSIZE", "2000"))  # rows per round trip of server-side cursors
 
-def get_db():
+T = TypeVar("T")
+
+
+def get_db_url() -> str:
     db_url = os.getenv("DB_URL")
     if not db_url:
         host = os.getenv("DB_HOST", "localhost")
@@ -14,9 +36,213 @@ def get_db():
         db_url = f"postgresql://{user}{f':{password}' if password else ''}@{host}:{port}/{db_name}"
     if not db_url:
         raise ValueError("DB_URL environment variable is not set")
+    return db_url
+
+
+class _TimedConnectionPool(ThreadedConnectionPool):
+    """
+    Records when each connection is opened, pre-opened ones included, so lifetimes count from then.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.created_at: dict[int, float] = {}
+        super().__init__(*args, **kwargs)
+
+    def _connect(self, key=None) -> Connection:
+        conn = super()._connect(key)
+        self.created_at[id(conn)] = time.monotonic()
+        return conn
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of Postgres connections.
+
+    Wraps psycopg2's ThreadedConnectionPool adding a bounded wait for a free connection, a health check on checkout
+    and a maximum lifetime after which connections are recycled.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        min_size: int = DB_POOL_MIN_SIZE,
+        max_size: int = DB_POOL_MAX_SIZE,
+        timeout: float = DB_POOL_TIMEOUT,
+        max_lifetime: float = DB_POOL_MAX_LIFETIME,
+    ):
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        try:
+            self._pool = _TimedConnectionPool(min_size, max_size, db_url)
+        except psycopg2.OperationalError as e:
+            logger.error(f"failed to open database connections: {e}")
+            raise HTTPException(status_code=503, detail="database is unavailable, try again later") from None
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def getconn(self) -> Connection:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HTTPException(status_code=503, detail="database is busy, try again later")
+
+        try:
+            conn = self._pool.getconn()
+            while not self._is_healthy(conn):
+                self._discard(conn)
+                conn = self._pool.getconn()
+        except psycopg2.OperationalError as e:
+            self._slots.release()
+            logger.error(f"failed to connect to the database: {e}")
+            raise HTTPException(status_code=503, detail="database is unavailable, try again later") from None
+        except Exception:
+            self._slots.release()
+            raise
+        return conn
+
+    def putconn(self, conn: Connection) -> None:
+        try:
+            if conn.closed or self._is_expired(conn):
+                self._discard(conn)
+                return
+
+            if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                conn.rollback()  # never hand out a connection with leftovers from a previous request
+            self._pool.putconn(conn)
+        except psycopg2.Error:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        self._pool.closeall()
+        self._pool.created_at.clear()
+
+    def _is_healthy(self, conn: Connection) -> bool:
+        if conn.closed or self._is_expired(conn):
+            return False
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+        except psycopg2.Error as e:
+            logger.warning(f"discarding unhealthy database connection: {e}")
+            return False
+        return True
+
+    def _is_expired(self, conn: Connection) -> bool:
+        created_at = self._pool.created_at.get(id(conn))
+        return created_at is None or time.monotonic() - created_at > self.max_lifetime
+
+    def _discard(self, conn: Connection) -> None:
+        self._pool.created_at.pop(id(conn), None)
+        try:
+            self._pool.putconn(conn, close=True)
+        except PoolError:
+            conn.close()
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(get_db_url())
+    return _pool
 
-    conn = psycopg2.connect(db_url)
+
+def close_pool() -> None:
+    global _pool, _executor
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+@contextlib.contextmanager
+def db_connection() -> Generator[Connection]:
+    """
+    Checks a connection out of the pool for code running outside of a request, e.g. background tasks.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+@contextlib.asynccontextmanager
+async def async_db_connection() -> AsyncGenerator[Connection]:
+    """
+    Same as `db_connection` but waits for a free connection without blocking the event loop.
+    """
+    pool = get_pool()
+    conn = await asyncio.to_thread(pool.getconn)
     try:
         yield conn
     finally:
-        conn.close()
+        await asyncio.to_thread(pool.putconn, conn)
+
+
+def get_db():
+    with db_connection() as conn:
+        yield conn
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                # one worker per pooled connection, a query can't run without holding one anyway
+                _executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX_SIZE, thread_name_prefix="db")
+    return _executor
+
+
+async def run_in_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Runs a blocking database call in the database executor so the event loop keeps serving other requests.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def fetchone(db: Connection, sql: str, params: tuple | None = None, cursor_factory: Any = None) -> Any:
+    with db.cursor(cursor_factory=cursor_factory) as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()
+
+
+def fetchall(db: Connection, sql: str, params: tuple | None = None, cursor_factory: Any = None) -> list[Any]:
+    with db.cursor(cursor_factory=cursor_factory) as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+async def stream(
+    db: Connection,
+    sql: str,
+    params: tuple | None = None,
+    cursor_factory: Any = None,
+    itersize: int = DB_CURSOR_ITERSIZE,
+) -> AsyncGenerator[list[Any]]:
+    """
+    Runs a query through a named server-side cursor yielding its rows in batches of `itersize`, so large result sets
+    are never held in memory at once. Every round trip runs in the database executor.
+    """
+    cursor = db.cursor(name=f"stream_{uuid.uuid4().hex}", cursor_factory=cursor_factory)
+    cursor.itersize = itersize
+    try:
+        await run_in_db(cursor.execute, sql, params)
+        while rows := await run_in_db(cursor.fetchmany, itersize):
+            yield rows
+    finally:
+        with contextlib.suppress(psycopg2.Error):  # the transaction may already be aborted
+            await run_in_db(cursor.close)
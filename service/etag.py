@@ -0,0 +1,34 @@
+import hashlib
+
+from fastapi import Request, Response
+
+# responses are per user and must be revalidated on every use, a match is answered with an empty 304
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: object) -> str:
+    """
+    Builds a strong ETag out of everything a response depends on.
+    """
+    digest = hashlib.sha1(":".join(str(p) for p in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Whether the client's If-None-Match holds `etag`, compared weakly as RFC 9110 asks for GET.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))
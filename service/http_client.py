@@ -0,0 +1,139 @@
+import asyncio
+import importlib.util
+import os
+import random
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import httpx
+from log import logger
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))  # only applied to idempotent requests
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.2"))  # base seconds for the jittered backoff
+HTTP_MAX_REQUEST_TIME = float(os.getenv("HTTP_MAX_REQUEST_TIME", "8"))  # seconds for a request and all its retries
+
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+# a timeout or a 429 means the host is slow or throttling, retrying would only make it worse
+_RETRY_STATUS_CODES = {502, 503, 504}
+
+
+@dataclass
+class HostMetrics:
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+    def record(self, latency: float, error: bool) -> None:
+        self.requests += 1
+        self.errors += int(error)
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_latency": self.total_latency / self.requests if self.requests else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+class HttpClients:
+    """
+    Registry of long-lived httpx clients, one per host, so outbound calls reuse keep-alive connections and TLS sessions.
+
+    Idempotent requests are retried with a jittered exponential backoff on connection errors and 502/503/504, never
+    on timeouts or 429. A request and all its retries never take longer than `max_request_time`.
+    """
+
+    def __init__(
+        self,
+        timeout: float = HTTP_TIMEOUT,
+        max_connections_per_host: int = HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_retries: int = HTTP_MAX_RETRIES,
+        retry_backoff: float = HTTP_RETRY_BACKOFF,
+        max_request_time: float = HTTP_MAX_REQUEST_TIME,
+    ):
+        self.timeout = timeout
+        self.max_connections_per_host = max_connections_per_host
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_request_time = max_request_time
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._metrics: dict[str, HostMetrics] = {}
+
+    def client(self, host: str) -> httpx.AsyncClient:
+        if host not in self._clients:
+            self._clients[host] = httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=_HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections_per_host,
+                    max_keepalive_connections=self.max_connections_per_host,
+                ),
+            )
+        return self._clients[host]
+
+    async def request(self, method: str, url: str, retries: int | None = None, **kwargs) -> httpx.Response:
+        """
+        Sends a request through the host's client, `retries` overrides the default for idempotent methods, e.g. 0
+        for callers that already hedge or fall back on their own.
+        """
+        host = urlsplit(url).netloc
+        client = self.client(host)
+        metrics = self._metrics.setdefault(host, HostMetrics())
+        if retries is None:
+            retries = self.max_retries if method.upper() in _IDEMPOTENT_METHODS else 0
+        timeout = kwargs.pop("timeout", self.timeout)
+        deadline = time.monotonic() + self.max_request_time
+
+        for attempt in range(retries + 1):
+            remaining = deadline - time.monotonic()
+            start = time.perf_counter()
+            error: httpx.TransportError | None = None
+            try:
+                response = await client.request(method, url, timeout=min(timeout, remaining), **kwargs)
+            except httpx.TransportError as e:
+                metrics.record(time.perf_counter() - start, error=True)
+                if isinstance(e, httpx.TimeoutException) or attempt == retries:
+                    raise
+                error = e
+            else:
+                failed = response.status_code >= 500 or response.status_code == 429
+                metrics.record(time.perf_counter() - start, error=failed)
+                if response.status_code not in _RETRY_STATUS_CODES or attempt == retries:
+                    return response
+
+            delay = random.uniform(0, self.retry_backoff * 2**attempt)
+            if time.monotonic() + delay >= deadline:  # no time left for another attempt
+                if error:
+                    raise error
+                return response
+            metrics.retries += 1
+            logger.warning(f"{host}: retrying {method} in {delay:.2f}s (attempt {attempt + 1}/{retries})")
+            await asyncio.sleep(delay)
+
+        raise AssertionError("unreachable")
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def metrics(self) -> dict[str, dict]:
+        return {host: m.to_dict() for host, m in self._metrics.items()}
+
+    async def aclose(self) -> None:
+        clients, self._clients = self._clients, {}
+        await asyncio.gather(*(c.aclose() for c in clients.values()))
+
+
+http_clients = HttpClients()
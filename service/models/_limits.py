@@ -74,28 +74,36 @@ class UserLimits:
         return self.user.plan == Plan.ADMIN
 
     def check(self, db: Connection, action: LimitAction) -> bool:
+        return self.remaining(db, action) > 0
+
+    def remaining(self, db: Connection, action: LimitAction) -> float:
+        """
+        How many more items the plan allows for an action.
+        """
         if self.is_admin():
-            return True
+            return float("inf")
 
         match action:
             case LimitAction.CREATE_ACCOUNT:
-                return self._check_limit(db, "accounts", self.max_accounts)
+                return self._remaining(db, "accounts", self.max_accounts)
             case LimitAction.ADD_SHARE:
-                return self._check_limit(db, "watchlist", self.max_shares)
+                return self._remaining(db, "watchlist", self.max_shares)
             case LimitAction.CREATE_TRANSACTION:
-                return self._check_limit(db, "transactions", self.max_transactions)
+                return self._remaining(db, "transactions", self.max_transactions)
             case _:
                 raise ValueError(f"Unsupported limit action: {action}")
 
-    def _check_limit(self, db: Connection, table: str, max_count: int) -> bool:
+    def _remaining(self, db: Connection, table: str, max_count: float) -> float:
         if max_count == 0:
-            return False
+            return 0
+        if max_count == float("inf"):
+            return max_count
 
         sql = f"SELECT COUNT(*) FROM {table} WHERE user_id = %s"
         with db.cursor() as cursor:
             cursor.execute(sql, (self.user.id,))
             result = cursor.fetchone()
-            return result is not None and result[0] < max_count
+            return max_count - result[0] if result is not None else 0
 
 
 def enforce_limit(action: LimitAction):
@@ -111,3 +119,9 @@ def enforce_limit(action: LimitAction):
             )
 
     return Depends(dependency)
+
+
+def require_admin(session=Depends(get_session)):
+    if not UserLimits(user=session.user).is_admin():
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return session
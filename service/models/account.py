@@ -1,12 +1,13 @@
 from dataclasses import dataclass, field
 from enum import Enum
 
+from db import fetchall, fetchone, run_in_db
 from fastapi import HTTPException
 from log.errors import required_msg
 from psycopg2.extensions import connection as Connection
 from psycopg2.extras import RealDictCursor, RealDictRow
 
-from models.rates import convert_to_currency
+from models.rates import RateTable
 from models.session import Session
 
 
@@ -56,6 +57,24 @@ class Account:
         }
 
 
+async def _convert_balance_history(session: Session, accounts: list[Account]) -> None:
+    """
+    Converts the balance history of every account to the session currency in one pass.
+    """
+    entries = [(entry, account.currency) for account in accounts for entry in account.balance_history]
+    if not entries:
+        return
+
+    currencies = [currency for _, currency in entries]
+    rates = await RateTable.load(session, currencies)
+    balances = rates.convert_column([entry["balance"] for entry, _ in entries], currencies)
+    for (entry, currency), balance in zip(entries, balances, strict=True):
+        if rates.has_rate(currency):
+            entry["balance"] = balance
+        else:
+            entry["fx_missing"] = True  # left in the account's currency
+
+
 async def get_account_by_id(db: Connection, session: Session, account_id: str) -> Account:
     """
     Retrieves an account from the database by user ID and account ID.
@@ -76,16 +95,13 @@ async def get_account_by_id(db: Connection, session: Session, account_id: str) -
         ORDER BY MIN(a.created_at);
     """
 
-    with db.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(sql, (account_id, session.user_id))
-        row = cursor.fetchone()
+    row = await run_in_db(fetchone, db, sql, (account_id, session.user_id), cursor_factory=RealDictCursor)
 
     if not row:
         raise HTTPException(status_code=404, detail="Account not found")
 
     account = Account.from_row(row)
-    for balance_entry in account.balance_history:
-        balance_entry["balance"], _ = await convert_to_currency(session, balance_entry["balance"], account.currency)
+    await _convert_balance_history(session, [account])
     return account
 
 
@@ -93,6 +109,17 @@ async def get_accounts_by_user(db: Connection, session: Session) -> list[Account
     """
     Retrieves accounts from the database by user ID.
     """
+    return await _get_accounts(db, session, since=0)
+
+
+async def get_accounts_since(db: Connection, session: Session, version: int) -> list[Account]:
+    """
+    Retrieves the accounts created or updated after a sync version, a balance change updates its account.
+    """
+    return await _get_accounts(db, session, since=version)
+
+
+async def _get_accounts(db: Connection, session: Session, since: int) -> list[Account]:
     sql = """
         SELECT a.id, user_id, name, account_type, a.balance, currency,
             COALESCE(
@@ -101,22 +128,18 @@ async def get_accounts_by_user(db: Connection, session: Session) -> list[Account
             ) AS balance_history
         FROM accounts a
         LEFT JOIN account_balances ab ON a.id = ab.account_id
-        WHERE a.user_id = %s::uuid
+        WHERE a.user_id = %s::uuid AND a.version > %s
         GROUP BY a.id
         ORDER BY name;
     """
 
-    with db.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(sql, (session.user_id,))
-        rows = cursor.fetchall()
+    rows = await run_in_db(fetchall, db, sql, (session.user_id, since), cursor_factory=RealDictCursor)
 
     if not rows:
         return []
 
     accounts = [Account.from_row(row) for row in rows]
-    for account in accounts:
-        for balance_entry in account.balance_history:
-            balance_entry["balance"], _ = await convert_to_currency(session, balance_entry["balance"], account.currency)
+    await _convert_balance_history(session, accounts)
     return accounts
 
 
@@ -133,25 +156,7 @@ async def create_account(db: Connection, session: Session, account: Account) ->
     if account.account_type == AccountType.BANK and (account.balance is None or account.balance < 0):
         raise HTTPException(status_code=400, detail="balance cannot be negative for bank accounts")
 
-    sql = """
-        INSERT INTO accounts (user_id, name, account_type, balance, currency)
-        VALUES (%s, %s, %s, %s, (SELECT currency FROM users WHERE id = %s::uuid))
-        RETURNING id
-    """
-
-    balance = account.balance if account.account_type == AccountType.BANK else None
-    with db.cursor() as cursor:
-        cursor.execute(sql, (session.user_id, account.name, account.account_type.value, balance, session.user_id))
-
-        row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=500, detail="failed to create account")
-
-        if account.account_type == AccountType.BANK and balance is not None:
-            _update_balance_history(db, row[0], balance)
-
-    account.id = row[0]
-    db.commit()
+    account.id = await run_in_db(_insert_account, db, session, account)
     return await get_account_by_id(db, session, account.id)
 
 
@@ -168,24 +173,7 @@ async def update_account(db: Connection, session: Session, account: Account, acc
     if not account.account_type == AccountType.BANK:
         raise HTTPException(status_code=400, detail=f"invalid account type: {account.account_type}")
 
-    sql = """
-        UPDATE accounts
-        SET balance = %s
-        WHERE id = %s::uuid AND user_id = %s::uuid
-        RETURNING id
-    """
-
-    with db.cursor() as cursor:
-        cursor.execute(sql, (account.balance, account_id, session.user_id))
-
-        row = cursor.fetchone()
-        if not row:
-            raise HTTPException(status_code=404, detail="Account not found or does not belong to the user")
-
-        if account.balance is not None:
-            _update_balance_history(db, row[0], account.balance)
-
-    db.commit()
+    await run_in_db(_update_account_balance, db, session, account_id, account.balance)
     return await get_account_by_id(db, session, account_id)
 
 
@@ -233,6 +221,63 @@ async def remove_account_balance_by_id(db: Connection, session: Session, account
     if not balance_id:
         raise HTTPException(status_code=400, detail=required_msg("balance_id"))
 
+    await run_in_db(_remove_account_balance, db, session, account_id, balance_id)
+    return await get_account_by_id(db, session, account_id)
+
+
+def _insert_account(db: Connection, session: Session, account: Account) -> str:
+    """
+    Inserts an account, and its initial balance for bank accounts, returning the new account ID.
+    """
+    sql = """
+        INSERT INTO accounts (user_id, name, account_type, balance, currency)
+        VALUES (%s, %s, %s, %s, (SELECT currency FROM users WHERE id = %s::uuid))
+        RETURNING id
+    """
+
+    balance = account.balance if account.account_type == AccountType.BANK else None
+    with db.cursor() as cursor:
+        cursor.execute(sql, (session.user_id, account.name, account.account_type.value, balance, session.user_id))
+
+        row = cursor.fetchone()
+        if not row:
+            raise HTTPException(status_code=500, detail="failed to create account")
+
+        if account.account_type == AccountType.BANK and balance is not None:
+            _update_balance_history(db, row[0], balance)
+
+    db.commit()
+    return row[0]
+
+
+def _update_account_balance(db: Connection, session: Session, account_id: str, balance: float | None) -> None:
+    """
+    Sets the current balance of an account and records it in the balance history.
+    """
+    sql = """
+        UPDATE accounts
+        SET balance = %s
+        WHERE id = %s::uuid AND user_id = %s::uuid
+        RETURNING id
+    """
+
+    with db.cursor() as cursor:
+        cursor.execute(sql, (balance, account_id, session.user_id))
+
+        row = cursor.fetchone()
+        if not row:
+            raise HTTPException(status_code=404, detail="Account not found or does not belong to the user")
+
+        if balance is not None:
+            _update_balance_history(db, row[0], balance)
+
+    db.commit()
+
+
+def _remove_account_balance(db: Connection, session: Session, account_id: str, balance_id: str) -> None:
+    """
+    Removes a balance entry, rolling the account balance back when the latest entry is removed.
+    """
     check_sql = """
         SELECT id, balance FROM account_balances
         WHERE account_id = %s::uuid
@@ -252,7 +297,7 @@ async def remove_account_balance_by_id(db: Connection, session: Session, account
         all_balances = [(row[0], row[1]) for row in cursor.fetchall()]
 
         if not all_balances:
-            return await get_account_by_id(db, session, account_id)
+            return
 
         # can't delete the first balance entry if there are others
         if len(all_balances) > 1 and all_balances[0][0] == balance_id:
@@ -273,7 +318,6 @@ async def remove_account_balance_by_id(db: Connection, session: Session, account
         if not deleted:
             raise HTTPException(status_code=404, detail="Balance entry not found or does not belong to the user")
         db.commit()
-    return await get_account_by_id(db, session, account_id)
 
 
 def _update_balance_history(db: Connection, account_id: str, balance: float) -> None:
@@ -0,0 +1,75 @@
+from collections.abc import AsyncGenerator
+from enum import Enum
+from typing import Any
+
+from db import stream
+from psycopg2.extensions import connection as Connection
+
+
+class ExportDataset(str, Enum):
+    TRANSACTIONS = "transactions"
+    BALANCES = "balances"
+    WATCHLIST = "watchlist"
+
+
+# values are exported as stored, in their own currency, manual prices being part of the watchlist
+_EXPORTS: dict[ExportDataset, tuple[tuple[str, ...], str]] = {
+    ExportDataset.TRANSACTIONS: (
+        (
+            "id",
+            "date",
+            "type",
+            "ticker",
+            "isin",
+            "name",
+            "account",
+            "quantity",
+            "price",
+            "commission",
+            "currency",
+            "created_at",
+        ),
+        """
+            SELECT t.id, t.date, t.transaction_type, s.ticker, s.isin, s.name, a.name,
+                t.quantity, t.price, t.commission, t.currency, t.created_at
+            FROM transactions t
+            JOIN symbols s ON t.symbol_id = s.id
+            LEFT JOIN accounts a ON t.account_id = a.id
+            WHERE t.user_id = %s::uuid
+            ORDER BY t.date, t.created_at
+        """,
+    ),
+    ExportDataset.BALANCES: (
+        ("account_id", "account", "account_type", "currency", "balance", "updated_at"),
+        """
+            SELECT a.id, a.name, a.account_type, a.currency, ab.balance, ab.updated_at
+            FROM account_balances ab
+            JOIN accounts a ON ab.account_id = a.id
+            WHERE a.user_id = %s::uuid
+            ORDER BY a.name, ab.updated_at
+        """,
+    ),
+    ExportDataset.WATCHLIST: (
+        ("ticker", "isin", "name", "display_name", "currency", "source", "manual_price", "added_at"),
+        """
+            SELECT s.ticker, s.isin, s.name, s.display_name, s.currency, s.source, w.manual_price, w.created_at
+            FROM watchlist w
+            JOIN symbols s ON w.symbol_id = s.id
+            WHERE w.user_id = %s::uuid
+            ORDER BY s.display_name
+        """,
+    ),
+}
+
+
+def export_columns(dataset: ExportDataset) -> tuple[str, ...]:
+    return _EXPORTS[dataset][0]
+
+
+async def stream_export(db: Connection, user_id: str, dataset: ExportDataset) -> AsyncGenerator[list[tuple[Any, ...]]]:
+    """
+    Yields the rows of a dataset in batches read from a server-side cursor, in the order of `export_columns`.
+    """
+    _, sql = _EXPORTS[dataset]
+    async for rows in stream(db, sql, (user_id,)):
+        yield rows
@@ -0,0 +1,345 @@
+import csv
+import io
+import math
+import os
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+
+from db import fetchall, run_in_db
+from fastapi import HTTPException
+from psycopg2.extensions import connection as Connection
+from psycopg2.extras import RealDictCursor
+from workers import run_in_process
+
+from models.account import get_accounts_by_user
+from models.positions import get_positions, refresh_positions
+from models.session import Session
+from models.transactions import TransactionType
+
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "10000"))  # rows accepted in a single CSV import
+
+
+class ImportLayout(str, Enum):
+    GENERIC = "generic"
+    DEGIRO = "degiro"
+    IBKR = "ibkr"
+
+
+@dataclass
+class ImportRow:
+    line: int
+    transaction_type: TransactionType
+    quantity: float
+    price: float
+    commission: float
+    currency: str
+    date: datetime
+    ticker: str | None = None
+    isin: str | None = None
+    symbol_id: str | None = None
+
+
+def _number(value: str, field: str) -> float:
+    """
+    Parses both `1,234.56` and `1.234,56` style numbers.
+    """
+    value = value.strip().replace(" ", "").replace("\u00a0", "")
+    if "," in value:
+        if "." in value and value.rindex(".") > value.rindex(","):
+            value = value.replace(",", "")
+        else:
+            value = value.replace(".", "").replace(",", ".")
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"invalid {field}: '{value}'")
+    if not math.isfinite(number):
+        raise ValueError(f"invalid {field}: '{value}'")
+    return number
+
+
+def _date(value: str, formats: tuple[str, ...]) -> datetime:
+    value = value.strip()
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"invalid date: '{value}'")
+
+
+def _currency(value: str) -> str:
+    currency = value.strip().upper()
+    if len(currency) != 3 or not currency.isalpha():
+        raise ValueError(f"invalid currency: '{value}'")
+    return currency
+
+
+def _optional(value: str) -> str | None:
+    return value.strip().upper() or None
+
+
+def _parse_generic(columns: dict[str, int], record: list[str], line: int) -> ImportRow:
+    """
+    date,type,ticker,isin,quantity,price,commission,currency with `ticker` or `isin` set in every row.
+    """
+    try:
+        transaction_type = TransactionType(record[columns["type"]].strip().upper().replace("_", "-"))
+    except ValueError:
+        raise ValueError(f"invalid type: '{record[columns['type']]}'")
+    commission = record[columns["commission"]] if "commission" in columns else ""
+    return ImportRow(
+        line=line,
+        transaction_type=transaction_type,
+        quantity=_number(record[columns["quantity"]], "quantity"),
+        price=_number(record[columns["price"]], "price"),
+        commission=_number(commission, "commission") if commission.strip() else 0.0,
+        currency=_currency(record[columns["currency"]]),
+        date=_date(record[columns["date"]], ("%Y-%m-%d", "%d/%m/%Y")),
+        ticker=_optional(record[columns["ticker"]]) if "ticker" in columns else None,
+        isin=_optional(record[columns["isin"]]) if "isin" in columns else None,
+    )
+
+
+def _parse_degiro(columns: dict[str, int], record: list[str], line: int) -> ImportRow:
+    """
+    DEGIRO's transactions export, sells have a negative quantity and the currency follows the unnamed column after the
+    price. Fees are charged in the account currency and converted back with the row's exchange rate.
+    """
+    quantity = _number(record[columns["quantity"]], "quantity")
+    fees = record[columns["transaction and/or third party fees"]].strip()
+    rate = record[columns["exchange rate"]].strip() if "exchange rate" in columns else ""
+    commission = abs(_number(fees, "fees")) if fees else 0.0
+    if commission and rate:
+        commission *= _number(rate, "exchange rate")
+    return ImportRow(
+        line=line,
+        transaction_type=TransactionType.BUY if quantity > 0 else TransactionType.SELL,
+        quantity=abs(quantity),
+        price=_number(record[columns["price"]], "price"),
+        commission=commission,
+        currency=_currency(record[columns["price"] + 1]),
+        date=_date(f"{record[columns['date']]} {record[columns['time']]}", ("%d-%m-%Y %H:%M",)),
+        isin=_optional(record[columns["isin"]]),
+    )
+
+
+def _parse_ibkr(columns: dict[str, int], record: list[str], line: int) -> ImportRow:
+    """
+    Interactive Brokers' flex query trades report.
+    """
+    quantity = _number(record[columns["quantity"]], "quantity")
+    side = record[columns["buy/sell"]].strip().upper() if "buy/sell" in columns else ""
+    return ImportRow(
+        line=line,
+        transaction_type=TransactionType.SELL if side == "SELL" or quantity < 0 else TransactionType.BUY,
+        quantity=abs(quantity),
+        price=_number(record[columns["tradeprice"]], "price"),
+        commission=abs(_number(record[columns["ibcommission"]] or "0", "commission")),
+        currency=_currency(record[columns["currencyprimary"]]),
+        date=_date(record[columns["tradedate"]], ("%Y%m%d", "%Y-%m-%d")),
+        ticker=_optional(record[columns["symbol"]]),
+        isin=_optional(record[columns["isin"]]) if "isin" in columns else None,
+    )
+
+
+_LAYOUTS: dict[ImportLayout, tuple[tuple[str, ...], Callable[[dict[str, int], list[str], int], ImportRow]]] = {
+    ImportLayout.GENERIC: (("date", "type", "quantity", "price", "currency"), _parse_generic),
+    ImportLayout.DEGIRO: (
+        ("date", "time", "isin", "quantity", "price", "transaction and/or third party fees"),
+        _parse_degiro,
+    ),
+    ImportLayout.IBKR: (
+        ("symbol", "currencyprimary", "tradedate", "quantity", "tradeprice", "ibcommission"),
+        _parse_ibkr,
+    ),
+}
+
+
+def _validate_row(row: ImportRow) -> None:
+    if not row.ticker and not row.isin:
+        raise ValueError("ticker or isin is required")
+    if row.quantity < 0 or row.price < 0 or row.commission < 0:
+        raise ValueError("quantity, price and commission can't be negative")
+    match row.transaction_type:
+        case TransactionType.BUY | TransactionType.SELL if row.quantity == 0:
+            raise ValueError("quantity must be greater than 0")
+        case TransactionType.DIVIDEND:
+            if row.quantity == 0:
+                raise ValueError("quantity must be greater than 0 for dividend transactions")
+            row.price = 0.0  # not applicable
+        case TransactionType.DIVIDEND_CASH:
+            if row.price == 0:
+                raise ValueError("price must be greater than 0 for dividend cash transactions")
+            row.quantity = 0.0  # not applicable
+
+
+def parse_csv(content: str, layout: ImportLayout = ImportLayout.GENERIC) -> tuple[list[ImportRow], list[dict]]:
+    """
+    Parses and validates every row of a CSV export, returning the valid rows and an error for each invalid one.
+    Lines are numbered as in the file, the header being line 1. Runs in a worker process, so it only touches plain data.
+    """
+    required, parse = _LAYOUTS[layout]
+    reader = csv.reader(io.StringIO(content.lstrip("\ufeff")))
+    header = next(reader, None)
+    if not header:
+        return [], [{"row": 1, "error": "empty file"}]
+
+    columns: dict[str, int] = {}
+    for i, name in enumerate(header):
+        columns.setdefault(name.strip().lower(), i)
+    missing = [c for c in required if c not in columns]
+    if missing:
+        return [], [{"row": 1, "error": f"missing columns for the {layout.value} layout: {', '.join(missing)}"}]
+
+    rows, errors = [], []
+    for record in reader:
+        line = reader.line_num
+        if not any(v.strip() for v in record):
+            continue
+        if len(rows) + len(errors) >= IMPORT_MAX_ROWS:
+            errors.append({"row": line, "error": f"maximum {IMPORT_MAX_ROWS} rows allowed per import"})
+            break
+        try:
+            row = parse(columns, record, line)
+            _validate_row(row)
+        except IndexError:
+            errors.append({"row": line, "error": "missing values"})
+            continue
+        except ValueError as e:
+            errors.append({"row": line, "error": str(e)})
+            continue
+        rows.append(row)
+    return rows, errors
+
+
+def _resolve_symbols(db: Connection, user_id: str, rows: list[ImportRow]) -> dict[str, tuple[str, bool]]:
+    """
+    Maps the ISINs and tickers of the rows to the symbols the user can see, symbols already in the watchlist win.
+    """
+    tickers = list({r.ticker for r in rows if r.ticker})
+    isins = list({r.isin for r in rows if r.isin})
+
+    sql = """
+        SELECT s.id, UPPER(s.ticker) AS ticker, UPPER(s.isin) AS isin, w.id IS NOT NULL AS watched
+        FROM symbols s
+        LEFT JOIN watchlist w ON w.symbol_id = s.id AND w.user_id = %s::uuid
+        WHERE (s.created_by IS NULL OR s.created_by = %s::uuid)
+            AND (UPPER(s.ticker) = ANY(%s) OR UPPER(s.isin) = ANY(%s))
+        ORDER BY watched DESC
+    """
+
+    symbols: dict[str, tuple[str, bool]] = {}
+    for row in fetchall(db, sql, (user_id, user_id, tickers, isins), cursor_factory=RealDictCursor):
+        for key in (row["isin"], row["ticker"]):
+            if key:
+                symbols.setdefault(key, (str(row["id"]), row["watched"]))
+    return symbols
+
+
+def _copy_transactions(db: Connection, user_id: str, account_id: str | None, rows: list[ImportRow], watch: set[str]):
+    """
+    Loads the rows through a temporary staging table with COPY and moves them into `transactions` with a single
+    INSERT, so a failed load never leaves half an import behind. Positions are refreshed in the same transaction.
+    """
+    columns = "user_id, symbol_id, account_id, quantity, price, commission, currency, transaction_type, date"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for r in rows:
+        writer.writerow(
+            (
+                user_id,
+                r.symbol_id,
+                account_id or "",  # an unquoted empty value is NULL for COPY
+                r.quantity,
+                r.price,
+                r.commission,
+                r.currency,
+                r.transaction_type.value,
+                r.date.isoformat(),
+            )
+        )
+    buffer.seek(0)
+
+    with db.cursor() as cursor:
+        cursor.execute("CREATE TEMP TABLE transactions_import (LIKE transactions INCLUDING DEFAULTS) ON COMMIT DROP")
+        cursor.copy_expert(f"COPY transactions_import ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(f"INSERT INTO transactions ({columns}) SELECT {columns} FROM transactions_import")
+        if watch:
+            sql = "INSERT INTO watchlist (user_id, symbol_id) SELECT %s::uuid, UNNEST(%s::uuid[])"
+            cursor.execute(sql, (user_id, list(watch)))
+    refresh_positions(db, user_id, {(account_id, r.symbol_id) for r in rows if r.symbol_id})
+    db.commit()
+
+
+async def import_transactions(
+    db: Connection,
+    session: Session,
+    content: str,
+    layout: ImportLayout = ImportLayout.GENERIC,
+    account_id: str | None = None,
+    max_transactions: float = float("inf"),
+    max_shares: float = float("inf"),
+) -> int:
+    """
+    Imports a CSV export validating the whole batch in memory against the current positions.
+    Nothing is imported if any row is invalid, a 400 lists every error by line instead.
+    """
+    if account_id:
+        accounts = await get_accounts_by_user(db, session)
+        if not any(a.id == account_id for a in accounts):
+            msg = f"Account '{account_id}' not found for user '{session.user_id}'"
+            raise HTTPException(status_code=400, detail=msg)
+
+    rows, errors = await run_in_process(parse_csv, content, layout)
+    if not rows and not errors:
+        raise HTTPException(status_code=400, detail=[{"row": 1, "error": "no transactions found"}])
+
+    symbols = await run_in_db(_resolve_symbols, db, session.user_id, rows) if rows else {}
+    positions = {p.symbol_id: p for p in await run_in_db(get_positions, db, session.user_id, account_id)}
+    quantities = {symbol_id: p.quantity for symbol_id, p in positions.items()}
+    bought = {symbol_id for symbol_id, p in positions.items() if p.has_buy}
+
+    valid: list[ImportRow] = []
+    watch: set[str] = set()
+    for row in sorted(rows, key=lambda r: (r.date, r.line)):  # positions are replayed in trade order
+        symbol = symbols.get(row.isin or "") or symbols.get(row.ticker or "")
+        if not symbol:
+            errors.append({"row": row.line, "error": f"symbol {row.isin or row.ticker} not found"})
+            continue
+        row.symbol_id, watched = symbol
+
+        held = quantities.get(row.symbol_id, 0.0)
+        if row.transaction_type == TransactionType.SELL and held < row.quantity:
+            msg = f"not enough shares to sell. Available: {held}, Trying to sell: {row.quantity}"
+            errors.append({"row": row.line, "error": msg})
+            continue
+        is_dividend = row.transaction_type in {TransactionType.DIVIDEND, TransactionType.DIVIDEND_CASH}
+        if is_dividend and row.symbol_id not in bought:
+            errors.append({"row": row.line, "error": f"no BUY transaction found for symbol {row.isin or row.ticker}"})
+            continue
+
+        if row.transaction_type == TransactionType.BUY:
+            bought.add(row.symbol_id)
+        if row.transaction_type == TransactionType.SELL:
+            quantities[row.symbol_id] = held - row.quantity
+        else:
+            quantities[row.symbol_id] = held + row.quantity
+        if not watched:
+            watch.add(row.symbol_id)
+        valid.append(row)
+
+    if len(valid) > max_transactions:
+        errors.append({"row": 1, "error": "Create transaction limit reached. Upgrade your plan."})
+    if len(watch) > max_shares:
+        errors.append({"row": 1, "error": "Add share limit reached. Upgrade your plan."})
+    if errors:
+        raise HTTPException(status_code=400, detail=sorted(errors, key=lambda e: e["row"]))
+
+    await run_in_db(_copy_transactions, db, session.user_id, account_id, valid, watch)
+    return len(valid)
@@ -0,0 +1,191 @@
+import os
+from array import array
+from dataclasses import dataclass, field
+
+from cache import cached
+from db import run_in_db
+from log import logger
+from psycopg2.extensions import connection as Connection
+
+from models.session import Session
+from models.symbol import Symbol
+from models.sync import get_user_version
+from models.transactions import Transaction, TransactionType, get_transactions_by_user
+
+PORTFOLIO_CACHE_TTL = float(os.getenv("PORTFOLIO_CACHE_TTL", "300"))  # seconds, writes bump the version it's keyed on
+
+
+class LotQueue:
+    """
+    FIFO queue of open lots kept in parallel arrays, consumed lots are skipped by moving the head forward.
+    """
+
+    def __init__(self):
+        self.quantities = array("d")
+        self.prices = array("d")
+        self.head = 0
+
+    def push(self, quantity: float, price: float) -> None:
+        self.quantities.append(quantity)
+        self.prices.append(price)
+
+    def consume(self, quantity: float) -> tuple[float, float]:
+        """
+        Takes `quantity` from the oldest lots returning its cost basis and the quantity that couldn't be matched.
+        """
+        cost_basis = 0.0
+        while quantity > 0 and self.head < len(self.quantities):
+            available = self.quantities[self.head]
+            if available <= quantity:
+                cost_basis += available * self.prices[self.head]
+                quantity -= available
+                self.head += 1
+            else:
+                cost_basis += quantity * self.prices[self.head]
+                self.quantities[self.head] = available - quantity
+                quantity = 0
+        return cost_basis, quantity
+
+
+@dataclass
+class PortfolioItem:
+    symbol: Symbol
+    currency: str
+    quantity: float = 0.0
+    current_price: float = 0.0
+    current_invested: float = 0.0
+    total_invested: float = 0.0
+    total_retrieved: float = 0.0
+    commission: float = 0.0
+    sells: int = 0
+
+    @property
+    def realized(self) -> float:
+        return self.total_retrieved - (self.total_invested - self.current_invested)
+
+    @property
+    def unrealized(self) -> float:
+        return self.current_price * self.quantity - self.current_invested
+
+    def to_dict(self) -> dict:
+        return {
+            "symbol": self.symbol.to_dict(),
+            "currency": self.currency,
+            "quantity": self.quantity,
+            "current_price": self.current_price,
+            "current_invested": self.current_invested,
+            "total_invested": self.total_invested,
+            "total_retrieved": self.total_retrieved,
+            "commission": self.commission,
+            "realized": self.realized,
+            "unrealized": self.unrealized,
+        }
+
+
+@dataclass
+class Portfolio:
+    items: list[PortfolioItem] = field(default_factory=list)
+    cash_dividends: float = 0.0
+
+    @property
+    def total_invested(self) -> float:
+        return sum(i.current_invested + i.commission for i in self.items if i.quantity > 0)
+
+    @property
+    def current_value(self) -> float:
+        return sum(i.current_price * i.quantity for i in self.items if i.quantity > 0)
+
+    @property
+    def closed_positions(self) -> float:
+        return sum(i.realized - i.commission for i in self.items if i.sells)
+
+    @property
+    def rentability(self) -> float:
+        invested = self.total_invested
+        if not invested:
+            return 0.0
+        return (self.current_value + self.closed_positions + self.cash_dividends - invested) / invested * 100
+
+    def to_dict(self) -> dict:
+        return {
+            "items": [i.to_dict() for i in self.items],
+            "total_invested": self.total_invested,
+            "current_value": self.current_value,
+            "closed_positions": self.closed_positions,
+            "cash_dividends": self.cash_dividends,
+            "rentability": self.rentability,
+        }
+
+
+def build_portfolio(transactions: list[Transaction]) -> Portfolio:
+    """
+    Matches sells against the oldest open lots of each symbol, `transactions` are expected newest first.
+    """
+    portfolio = Portfolio()
+    items: dict[str, PortfolioItem] = {}
+    lots: dict[str, LotQueue] = {}
+
+    for t in reversed(transactions):
+        assert t.symbol is not None
+        quantity, price, commission = float(t.quantity), float(t.price), float(t.commission)
+
+        if t.transaction_type == TransactionType.DIVIDEND_CASH:
+            portfolio.cash_dividends += price
+            continue
+
+        if t.symbol.id not in items:
+            if t.transaction_type != TransactionType.BUY:
+                logger.warning(f"first transaction for symbol {t.symbol.ticker} must be a BUY transaction")
+            items[t.symbol.id] = PortfolioItem(
+                symbol=t.symbol,
+                currency=t.currency,
+                current_price=float(t.symbol.price or 0.0),
+            )
+            lots[t.symbol.id] = LotQueue()
+        item, queue = items[t.symbol.id], lots[t.symbol.id]
+
+        if t.transaction_type == TransactionType.BUY:
+            item.quantity += quantity
+            item.current_invested += quantity * price
+            item.total_invested += quantity * price
+            item.commission += commission
+            queue.push(quantity, price)
+        elif t.transaction_type == TransactionType.SELL:
+            cost_basis, unmatched = queue.consume(quantity)
+            if unmatched > 0:
+                logger.warning(f"not enough shares for {t.symbol.ticker}, remaining: {unmatched}")
+            item.quantity -= quantity
+            item.current_invested -= cost_basis
+            item.total_retrieved += quantity * price
+            item.commission += commission
+            item.sells += 1
+        elif t.transaction_type == TransactionType.DIVIDEND:
+            item.quantity += quantity
+            queue.push(quantity, price)
+
+    portfolio.items = sorted(items.values(), key=lambda i: (i.quantity == 0, i.symbol.display_name or ""))
+    return portfolio
+
+
+async def get_portfolio(db: Connection, session: Session) -> dict:
+    """
+    Builds the portfolio of every account of a user plus the aggregate of all of them.
+    Cached per change version of the user, so a write from any worker makes the entries built before it unreachable.
+    """
+    version = await run_in_db(get_user_version, db, session.user_id)
+    return await _get_portfolio(db, session, version)
+
+
+@cached("portfolio", ttl=PORTFOLIO_CACHE_TTL, maxsize=1024, key=lambda _, s, v: f"{s.user_id}:{s.currency}:{v}")
+async def _get_portfolio(db: Connection, session: Session, version: int) -> dict:
+    transactions = await get_transactions_by_user(db, session)
+
+    by_account: dict[str, list[Transaction]] = {}
+    for t in transactions:
+        if t.account_id:
+            by_account.setdefault(t.account_id, []).append(t)
+
+    return {
+        "aggregate": build_portfolio(transactions).to_dict(),
+        "accounts": {account_id: build_portfolio(ts).to_dict() for account_id, ts in by_account.items()},
+    }
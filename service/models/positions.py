@@ -0,0 +1,135 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from db import fetchall, fetchone
+from psycopg2.extensions import connection as Connection
+from psycopg2.extras import RealDictCursor, RealDictRow, execute_values
+
+
+@dataclass
+class Position:
+    user_id: str
+    symbol_id: str
+    account_id: str | None = None
+    quantity: float = 0.0
+    cost: float = 0.0  # paid in BUY transactions, commissions included
+    first_buy_id: str | None = None
+
+    @property
+    def has_buy(self) -> bool:
+        return self.first_buy_id is not None
+
+    @classmethod
+    def from_row(cls, row: RealDictRow) -> "Position":
+        return cls(
+            user_id=str(row["user_id"]),
+            account_id=str(row["account_id"]) if row["account_id"] else None,
+            symbol_id=str(row["symbol_id"]),
+            quantity=float(row["quantity"]),
+            cost=float(row["cost"]),
+            first_buy_id=str(row["first_buy_id"]) if row["first_buy_id"] else None,
+        )
+
+
+def get_position(db: Connection, user_id: str, account_id: str | None, symbol_id: str) -> Position | None:
+    """
+    Retrieves the position of a user in a symbol for an account, `None` if there were never transactions for it.
+    """
+    sql = """
+        SELECT user_id, account_id, symbol_id, quantity, cost, first_buy_id
+        FROM positions
+        WHERE user_id = %s::uuid
+            AND COALESCE(account_id, '00000000-0000-0000-0000-000000000000'::uuid)
+                = COALESCE(%s::uuid, '00000000-0000-0000-0000-000000000000'::uuid)
+            AND symbol_id = %s::uuid
+    """
+
+    row = fetchone(db, sql, (user_id, account_id, symbol_id), cursor_factory=RealDictCursor)
+    return Position.from_row(row) if row else None
+
+
+def get_positions(db: Connection, user_id: str, account_id: str | None) -> list[Position]:
+    """
+    Retrieves every position of a user in an account, a `None` account holds the transactions without one.
+    """
+    sql = """
+        SELECT user_id, account_id, symbol_id, quantity, cost, first_buy_id
+        FROM positions
+        WHERE user_id = %s::uuid
+            AND COALESCE(account_id, '00000000-0000-0000-0000-000000000000'::uuid)
+                = COALESCE(%s::uuid, '00000000-0000-0000-0000-000000000000'::uuid)
+    """
+
+    return [Position.from_row(row) for row in fetchall(db, sql, (user_id, account_id), cursor_factory=RealDictCursor)]
+
+
+def get_available_quantity(
+    db: Connection,
+    user_id: str,
+    account_id: str | None,
+    symbol_id: str,
+    before_transaction_id: str | None = None,
+) -> float:
+    """
+    Retrieves the quantity held in a position.
+    With `before_transaction_id` only the quantity held before that transaction is returned, subtracting it and
+    every later transaction of the position.
+    """
+    position = get_position(db, user_id, account_id, symbol_id)
+    if not position:
+        return 0.0
+    if not before_transaction_id:
+        return position.quantity
+
+    sql = """
+        SELECT COALESCE(SUM(CASE t.transaction_type WHEN 'SELL' THEN -t.quantity ELSE t.quantity END), 0)
+        FROM transactions t
+        JOIN transactions b ON b.id = %s::uuid
+        WHERE t.user_id = %s::uuid
+            AND t.symbol_id = %s::uuid
+            AND t.account_id IS NOT DISTINCT FROM %s::uuid
+            AND t.transaction_type IN ('BUY', 'SELL', 'DIVIDEND')
+            AND (COALESCE(t.date, 'infinity'), t.created_at) >= (COALESCE(b.date, 'infinity'), b.created_at)
+    """
+
+    row = fetchone(db, sql, (before_transaction_id, user_id, symbol_id, account_id))
+    return position.quantity - float(row[0] if row else 0)
+
+
+def refresh_positions(db: Connection, user_id: str, keys: Iterable[tuple[str | None, str]]) -> None:
+    """
+    Recomputes the positions of the given (account_id, symbol_id) keys from their transactions.
+    Runs inside the caller's database transaction and doesn't commit, so positions change together with the writes.
+    """
+    rows = list(dict.fromkeys((user_id, str(a) if a else None, str(s)) for a, s in keys))
+    if not rows:
+        return
+
+    sql = """
+        INSERT INTO positions (user_id, account_id, symbol_id, quantity, cost, first_buy_id, updated_at)
+        SELECT
+            k.user_id,
+            k.account_id,
+            k.symbol_id,
+            COALESCE(SUM(
+                CASE t.transaction_type WHEN 'SELL' THEN -t.quantity WHEN 'DIVIDEND-CASH' THEN 0 ELSE t.quantity END
+            ), 0),
+            COALESCE(SUM(t.quantity * t.price + t.commission) FILTER (WHERE t.transaction_type = 'BUY'), 0),
+            (ARRAY_AGG(t.id ORDER BY t.date, t.created_at) FILTER (WHERE t.transaction_type = 'BUY'))[1],
+            CURRENT_TIMESTAMP
+        FROM (VALUES %s) AS k (user_id, account_id, symbol_id)
+        LEFT JOIN transactions t
+            ON t.user_id = k.user_id
+            AND t.symbol_id = k.symbol_id
+            AND t.account_id IS NOT DISTINCT FROM k.account_id
+        GROUP BY k.user_id, k.account_id, k.symbol_id
+        ON CONFLICT (user_id, COALESCE(account_id, '00000000-0000-0000-0000-000000000000'::uuid), symbol_id)
+        DO UPDATE SET
+            quantity = EXCLUDED.quantity,
+            cost = EXCLUDED.cost,
+            first_buy_id = EXCLUDED.first_buy_id,
+            updated_at = EXCLUDED.updated_at
+    """
+
+    with db.cursor() as cursor:
+        execute_values(cursor, sql, rows, template="(%s::uuid, %s::uuid, %s::uuid)", page_size=len(rows))
@@ -1,20 +1,25 @@
 from dataclasses import dataclass
 
+from cache import cacheable
+from db import fetchall, run_in_db
 from fastapi import HTTPException
 from psycopg2.extensions import connection as Connection
-from psycopg2.extras import RealDictCursor, RealDictRow
+from psycopg2.extras import RealDictCursor, RealDictRow, execute_values
 
-from models.rates import convert_to_currency
+from models.rates import RateTable
 from models.session import Session
 from models.symbol import get_symbol_by_ticker
 
 
+@cacheable
 @dataclass
 class StockQuote:
     ticker: str
     current: float | None = None
     currency: str | None = None
     previous_close: float | None = None
+    is_stale: bool = False
+    fx_missing: bool = False  # no rate for its currency, the prices are left in it
 
     @classmethod
     def from_row(cls, row: RealDictRow) -> "StockQuote":
@@ -23,6 +28,7 @@ class StockQuote:
             current=row["current"],
             previous_close=row.get("previous_close"),
             currency=row.get("currency"),
+            is_stale=row.get("is_stale", False),
         )
 
     def merge(self, other: "StockQuote") -> "StockQuote":
@@ -31,6 +37,7 @@ class StockQuote:
             current=self.current or other.current,
             currency=self.currency or other.currency,
             previous_close=self.previous_close or other.previous_close,
+            is_stale=self.is_stale and other.is_stale,
         )
 
     def to_dict(self) -> dict:
@@ -40,39 +47,35 @@ class StockQuote:
             "current": self.current,
             "previous_close": self.previous_close,
             "currency": self.currency,
+            "is_stale": self.is_stale,
+            "fx_missing": self.fx_missing,
         }
 
 
 async def get_quote_point(db: Connection, session: Session, tickers: list[str]) -> list[StockQuote]:
     sql = """
-        SELECT s.ticker, qp.price, qp.previous_close, qp.currency
+        SELECT s.ticker, qp.price, qp.previous_close, qp.currency,
+            COALESCE(qp.updated_at::date < CURRENT_DATE, TRUE) AS is_stale
         FROM symbols s
-        LEFT JOIN LATERAL (
-            SELECT price, previous_close, currency
-            FROM quote_history
-            WHERE symbol_id = s.id
-              AND created_at::date = CURRENT_DATE
-            ORDER BY created_at DESC
-            LIMIT 1
-        ) qp ON TRUE
+        LEFT JOIN latest_quote qp ON qp.symbol_id = s.id
         WHERE s.ticker = ANY(%s)
     """
 
-    with db.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(sql, (tickers,))
-        results = cursor.fetchall()
+    results = await run_in_db(fetchall, db, sql, (tickers,), cursor_factory=RealDictCursor)
+
+    currencies = [result["currency"] for result in results]
+    rates = await RateTable.load(session, currencies)
+    prices = rates.convert_column([result["price"] for result in results], currencies)
+    previous_closes = rates.convert_column([result["previous_close"] for result in results], currencies)
 
     quotes = []
-    for result in results:
-        quote = StockQuote(
-            ticker=result["ticker"],
-            current=result["price"],
-            currency=result["currency"],
-            previous_close=result["previous_close"],
-        )
-        quote.current, _ = await convert_to_currency(session, quote.current, quote.currency)
-        quote.previous_close, quote.currency = await convert_to_currency(session, quote.previous_close, quote.currency)
-        quote.currency = session.currency
+    for result, currency, price, previous_close in zip(results, currencies, prices, previous_closes, strict=True):
+        quote = StockQuote(ticker=result["ticker"], currency=session.currency, is_stale=result["is_stale"])
+        if rates.has_rate(currency):
+            quote.current, quote.previous_close = price, previous_close
+        else:
+            quote.current, quote.previous_close = result["price"], result["previous_close"]
+            quote.currency, quote.fx_missing = currency, True
         quotes.append(quote)
     return quotes
 
@@ -83,17 +86,75 @@ def create_quote_history_point(db: Connection, quote: StockQuote) -> None:
     if not quote.current or quote.current <= 0:
         raise HTTPException(status_code=400, detail="invalid price")
 
-    symbol = get_symbol_by_ticker(db, quote.ticker)
+    get_symbol_by_ticker(db, quote.ticker)  # raises 404 for unknown symbols
+    if not create_quote_history_points(db, [quote]):
+        raise HTTPException(status_code=500, detail="failed to create quote point")
+
+
+def create_quote_history_points(db: Connection, quotes: list[StockQuote]) -> int:
+    """
+    Stores today's quote for many symbols in a single statement and commit, keeping `latest_quote` in sync.
+    Quotes without a valid price or a matching symbol are skipped, returns the number of points written.
+    """
+    values = {q.ticker.upper(): q for q in quotes if q.ticker and q.current and q.current > 0}
+    if not values:
+        return 0
 
     sql = """
-    INSERT INTO quote_history (symbol_id, price, previous_close, currency)
-    VALUES (%s, %s, %s, %s)
-    RETURNING id
+    WITH point AS (
+        INSERT INTO quote_history (symbol_id, price, previous_close, currency)
+        SELECT DISTINCT ON (s.id) s.id, v.price, v.previous_close, v.currency
+        FROM (VALUES %s) AS v (ticker, price, previous_close, currency)
+        JOIN symbols s ON UPPER(s.ticker) = v.ticker AND s.created_by IS NULL
+        ON CONFLICT (symbol_id, (created_at::date)) DO UPDATE
+        SET price = EXCLUDED.price,
+            previous_close = EXCLUDED.previous_close,
+            currency = EXCLUDED.currency,
+            created_at = EXCLUDED.created_at
+        RETURNING id, symbol_id, price, previous_close, currency, created_at
+    ), latest AS (
+        INSERT INTO latest_quote (symbol_id, price, previous_close, currency, updated_at)
+        SELECT symbol_id, price, previous_close, currency, created_at FROM point
+        ON CONFLICT (symbol_id) DO UPDATE
+        SET price = EXCLUDED.price,
+            previous_close = EXCLUDED.previous_close,
+            currency = EXCLUDED.currency,
+            updated_at = EXCLUDED.updated_at
+        WHERE latest_quote.updated_at <= EXCLUDED.updated_at
+    )
+    SELECT id FROM point
     """
 
+    rows = [(ticker, q.current, q.previous_close, q.currency) for ticker, q in values.items()]
     with db.cursor() as cursor:
-        cursor.execute(sql, (symbol.id, quote.current, quote.previous_close, quote.currency))
-        row = cursor.fetchone()
-    if not row:
-        raise HTTPException(status_code=500, detail="failed to create quote point")
+        written = execute_values(
+            cursor,
+            sql,
+            rows,
+            template="(%s, %s::numeric, %s::numeric, %s)",
+            page_size=len(rows),
+            fetch=True,
+        )
     db.commit()
+    return len(written)
+
+
+def get_watched_tickers(db: Connection, max_age: float) -> list[str]:
+    """
+    Retrieves the distinct tickers in any watchlist whose latest quote is older than `max_age` seconds.
+    Symbols only tracked with a manual price are skipped.
+    """
+    sql = """
+        SELECT DISTINCT s.ticker
+        FROM watchlist w
+        JOIN symbols s ON w.symbol_id = s.id
+        LEFT JOIN latest_quote lq ON lq.symbol_id = s.id
+        WHERE w.manual_price IS NULL
+          AND (lq.updated_at IS NULL OR lq.updated_at < CURRENT_TIMESTAMP - make_interval(secs => %s))
+        ORDER BY s.ticker
+    """
+
+    with db.cursor() as cursor:
+        cursor.execute(sql, (max_age,))
+        rows = cursor.fetchall()
+    return [row[0] for row in rows]
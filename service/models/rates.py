@@ -1,38 +1,302 @@
+import asyncio
 import os
+import time
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime
 from decimal import Decimal
+from enum import Enum
 from json import JSONDecodeError
 
 import httpx
-from async_lru import alru_cache
+import psycopg2
+from db import async_db_connection, fetchall, run_in_db
+from fastapi import HTTPException
+from http_client import http_clients
 from log import logger
+from psycopg2.extensions import connection as Connection
+from psycopg2.extras import execute_values
 
 from models.session import Session
 
 EXCHANGERATE_API_KEY = os.getenv("EXCHANGERATE_API_KEY")
+FX_BASE_CURRENCY = os.getenv("FX_BASE_CURRENCY", "USD")  # every pair is triangulated from this base's table
+FX_RETRY_INTERVAL = float(os.getenv("FX_RETRY_INTERVAL", "300"))  # seconds between fetch attempts after a failure
 
 
-def _normalize_currency_args(func):
-    async def wrapper(from_currency: str, to_currency: str):
-        return await func(from_currency.upper(), to_currency.upper())
+class FxMode(Enum):
+    LATEST = "latest"
+    TRADE_DATE = "trade_date"
 
-    return wrapper
 
+@dataclass
+class RateSnapshot:
+    base: str
+    date: date
+    rates: dict[str, float]  # units of each currency per unit of base
 
-@_normalize_currency_args
-@alru_cache(maxsize=128, ttl=43200)  # cache results for 12 hours
-async def _get_exchange_rate(from_currency: str, to_currency: str):
-    url = f"{'https://v6.exchangerate-api.com/v6'}/{EXCHANGERATE_API_KEY}/pair/{from_currency}/{to_currency}"
-    async with httpx.AsyncClient(timeout=3) as client:
-        response = await client.get(url)
+    def rate(self, from_currency: str, to_currency: str) -> float | None:
+        if from_currency == to_currency:
+            return 1.0
+        from_rate = 1.0 if from_currency == self.base else self.rates.get(from_currency)
+        to_rate = 1.0 if to_currency == self.base else self.rates.get(to_currency)
+        if not from_rate or not to_rate:
+            return None
+        return to_rate / from_rate
+
+
+class RateHistory:
+    """
+    Date-indexed rates of every currency against the base, kept as sorted arrays so each lookup is a binary search.
+
+    A date without a table uses the closest earlier one. Dates before the first table have no rate: a later table is
+    never used, it would be today's rate passed off as a historical one. `python -m tasks.rates` backfills the tables
+    of past trade dates.
+    """
+
+    def __init__(self, base: str):
+        self.base = base
+        self.latest: date | None = None
+        self._days: dict[str, array] = {}  # date ordinals, ascending
+        self._rates: dict[str, array] = {}
+
+    def add(self, snapshot: RateSnapshot) -> None:
+        for currency, rate in snapshot.rates.items():
+            self.insert(currency, snapshot.date, rate)
+
+    def insert(self, currency: str, day: date, rate: float) -> None:
+        days = self._days.setdefault(currency, array("l"))
+        rates = self._rates.setdefault(currency, array("d"))
+        ordinal = day.toordinal()
+        i = bisect_right(days, ordinal)
+        if i and days[i - 1] == ordinal:
+            rates[i - 1] = rate
+        else:
+            days.insert(i, ordinal)
+            rates.insert(i, rate)
+        if self.latest is None or day > self.latest:
+            self.latest = day
+
+    def rate_at(self, currency: str, day: date) -> float | None:
+        """
+        Units of `currency` per unit of base on the given day.
+        """
+        if currency == self.base:
+            return 1.0
+        days = self._days.get(currency)
+        if not days:
+            return None
+        i = bisect_right(days, day.toordinal()) - 1
+        return self._rates[currency][i] if i >= 0 else None
+
+    def rate(self, from_currency: str, to_currency: str, day: date) -> float | None:
+        if from_currency == to_currency:
+            return 1.0
+        from_rate = self.rate_at(from_currency, day)
+        to_rate = self.rate_at(to_currency, day)
+        if not from_rate or not to_rate:
+            return None
+        return to_rate / from_rate
+
+    def convert_column(
+        self,
+        amounts: Sequence[Decimal | float | None],
+        currencies: Sequence[str | None],
+        dates: Sequence[date | datetime | None],
+        to_currency: str,
+    ) -> list[float | None]:
+        """
+        Converts a column of (amount, currency, date) triples at each date's rate, missing dates use the latest rate.
+        Amounts without a rate on or before their date are None, callers leave those unconverted.
+        """
+        today = date.today()
+        memo: dict[tuple[str, date], float | None] = {}
+        converted = []
+        for amount, currency, day in zip(amounts, currencies, dates, strict=True):
+            if amount is None or not currency:
+                converted.append(None if amount is None else float(amount))
+                continue
+
+            if isinstance(day, datetime):
+                day = day.date()
+            key = (currency.upper(), day or today)
+            if key not in memo:
+                rate = self.rate(key[0], to_currency, key[1])
+                if rate is None:
+                    logger.error(f"no exchange rate for {key[0]}->{to_currency} at {key[1]}")
+                memo[key] = rate
+            rate = memo[key]
+            converted.append(None if rate is None else float(amount) * rate)
+        return converted
+
+
+def get_rate_history(db: Connection, base: str) -> RateHistory:
+    """
+    Retrieves every stored rates table for the given base currency.
+    """
+    sql = """
+        SELECT currency, date, rate
+        FROM fx_rates
+        WHERE base = %s
+        ORDER BY currency, date
+    """
+
+    history = RateHistory(base)
+    for currency, day, rate in fetchall(db, sql, (base,)):
+        history.insert(currency, day, float(rate))
+    return history
+
+
+def get_latest_rates(db: Connection, base: str) -> RateSnapshot | None:
+    """
+    Retrieves the most recent rates table stored for the given base currency.
+    """
+    sql = """
+        SELECT date, currency, rate
+        FROM fx_rates
+        WHERE base = %s AND date = (SELECT MAX(date) FROM fx_rates WHERE base = %s)
+    """
+
+    rows = fetchall(db, sql, (base, base))
+    if not rows:
+        return None
+    return RateSnapshot(base=base, date=rows[0][0], rates={currency: float(rate) for _, currency, rate in rows})
+
+
+def create_rates(db: Connection, snapshot: RateSnapshot) -> None:
+    """
+    Stores a rates table, replacing the one for the same base and date if any.
+    """
+    sql = """
+        INSERT INTO fx_rates (base, currency, date, rate)
+        VALUES %s
+        ON CONFLICT (base, date, currency) DO UPDATE
+        SET rate = EXCLUDED.rate
+    """
+
+    rows = [(snapshot.base, currency, snapshot.date, rate) for currency, rate in snapshot.rates.items()]
+    with db.cursor() as cursor:
+        execute_values(cursor, sql, rows, page_size=len(rows))
+    db.commit()
+
+
+def get_unrated_trade_dates(db: Connection, base: str) -> list[date]:
+    """
+    Retrieves the trade dates of every foreign currency transaction that has no rates table stored for its exact day.
+    """
+    sql = """
+        SELECT DISTINCT t.date::date AS day
+        FROM transactions t
+        WHERE t.date IS NOT NULL AND upper(t.currency) <> %s
+            AND NOT EXISTS (SELECT 1 FROM fx_rates r WHERE r.base = %s AND r.date = t.date::date)
+        ORDER BY day
+    """
+
+    return [row[0] for row in fetchall(db, sql, (base, base))]
+
+
+async def fetch_rates(base: str, day: date | None = None) -> dict[str, float] | None:
+    """
+    Fetches the latest rates table, or the one of a past day from the historical endpoint.
+    """
+    endpoint = f"history/{base}/{day.year}/{day.month}/{day.day}" if day else f"latest/{base}"
+    url = f"{'https://v6.exchangerate-api.com/v6'}/{EXCHANGERATE_API_KEY}/{endpoint}"
+    try:
+        response = await http_clients.get(url, timeout=3)
+    except httpx.HTTPError as e:
+        logger.error(f"failed to fetch exchange rates: {e}")
+        return None
     if response.status_code != 200:
-        logger.error(f"failed to fetch exchange rate: {response.status_code}:{response.text}")
-        return 1.0
+        logger.error(f"failed to fetch exchange rates: {response.status_code}:{response.text}")
+        return None
 
     try:
-        return float(response.json()["conversion_rate"])
-    except (JSONDecodeError, KeyError, ValueError):
+        return {currency.upper(): float(rate) for currency, rate in response.json()["conversion_rates"].items()}
+    except (JSONDecodeError, KeyError, ValueError, AttributeError):
         logger.error(f"invalid exchange rate data: {response.text}")
-    return 1.0
+    return None
+
+
+_snapshot: RateSnapshot | None = None
+_snapshot_lock = asyncio.Lock()
+_retry_at = 0.0
+
+
+async def get_rate_snapshot() -> RateSnapshot | None:
+    """
+    Returns today's rates table, reading it from `fx_rates` or fetching it once a day for every worker.
+    When the API is unavailable the last known good table is served instead.
+    """
+    global _snapshot, _retry_at
+    today = date.today()
+    if _snapshot and _snapshot.date >= today:
+        return _snapshot
+
+    async with _snapshot_lock:
+        if (_snapshot and _snapshot.date >= today) or time.monotonic() < _retry_at:
+            return _snapshot
+
+        try:
+            async with async_db_connection() as db:
+                stored = await run_in_db(get_latest_rates, db, FX_BASE_CURRENCY)
+        except (HTTPException, psycopg2.Error) as e:
+            logger.error(f"failed to load exchange rates: {e}")
+            stored = None
+        if stored and (not _snapshot or stored.date >= _snapshot.date):
+            _snapshot = stored
+        if _snapshot and _snapshot.date >= today:
+            return _snapshot
+
+        rates = await fetch_rates(FX_BASE_CURRENCY)
+        if not rates:
+            logger.warning(f"serving exchange rates from {_snapshot.date if _snapshot else 'nowhere'}")
+            _retry_at = time.monotonic() + FX_RETRY_INTERVAL
+            return _snapshot
+
+        _snapshot = RateSnapshot(base=FX_BASE_CURRENCY, date=today, rates=rates)
+        try:
+            async with async_db_connection() as db:
+                await run_in_db(create_rates, db, _snapshot)
+        except (HTTPException, psycopg2.Error) as e:
+            logger.error(f"failed to store exchange rates: {e}")
+    return _snapshot
+
+
+_history: RateHistory | None = None
+_history_lock = asyncio.Lock()
+
+
+async def load_rate_history() -> RateHistory:
+    """
+    Returns the in-memory rate history, loaded from `fx_rates` once per process and extended with each new snapshot.
+    """
+    global _history
+    async with _history_lock:
+        if _history is None:
+            try:
+                async with async_db_connection() as db:
+                    _history = await run_in_db(get_rate_history, db, FX_BASE_CURRENCY)
+            except (HTTPException, psycopg2.Error) as e:
+                logger.error(f"failed to load exchange rate history: {e}")
+                return RateHistory(FX_BASE_CURRENCY)  # try again on the next call
+
+    snapshot = await get_rate_snapshot()
+    if snapshot and (_history.latest is None or snapshot.date > _history.latest):
+        _history.add(snapshot)
+    return _history
+
+
+def _triangulate(snapshot: RateSnapshot | None, from_currency: str, to_currency: str) -> float | None:
+    rate = snapshot.rate(from_currency, to_currency) if snapshot else None
+    if rate is None:
+        logger.error(f"no exchange rate for {from_currency}->{to_currency}")
+    return rate
+
+
+async def _get_exchange_rate(from_currency: str, to_currency: str) -> float | None:
+    return _triangulate(await get_rate_snapshot(), from_currency.upper(), to_currency.upper())
 
 
 async def convert_to_currency(
@@ -40,9 +304,62 @@ async def convert_to_currency(
     amount: Decimal | float | None,
     from_currency: str | None,
 ) -> tuple[float | None, str]:
+    """
+    Converts an amount to the session currency, returning it along with the currency it ends up in: its own one when
+    there is no rate for it.
+    """
     if isinstance(amount, Decimal):
         amount = float(amount)
     if not amount or not from_currency or from_currency.upper() == session.currency:
         return amount, session.currency
     rate = await _get_exchange_rate(from_currency, session.currency)
+    if rate is None:
+        return amount, from_currency.upper()
     return amount * rate, session.currency
+
+
+class RateTable:
+    """
+    Exchange rates into the session currency resolved once for a whole result set.
+
+    Use `RateTable.load` with every source currency in the rows, then convert whole columns with `convert_column`.
+    Currencies without a rate convert to None, callers leave those amounts in their own currency flagged `fx_missing`.
+    """
+
+    def __init__(self, currency: str, rates: dict[str, float | None]):
+        self.currency = currency
+        self.rates = rates
+
+    @classmethod
+    async def load(cls, session: Session, currencies: Iterable[str | None]) -> "RateTable":
+        """
+        Resolves the rate of every distinct source currency from a single rates snapshot.
+        """
+        needed = {c.upper() for c in currencies if c and c.upper() != session.currency}
+        if not needed:
+            return cls(session.currency, {})
+        snapshot = await get_rate_snapshot()
+        return cls(session.currency, {c: _triangulate(snapshot, c, session.currency) for c in needed})
+
+    def has_rate(self, currency: str | None) -> bool:
+        """
+        Whether amounts in the given currency can be converted, amounts without a currency are taken as is.
+        """
+        return not currency or currency.upper() == self.currency or self.rates.get(currency.upper()) is not None
+
+    def convert(self, amount: Decimal | float | None, from_currency: str | None) -> float | None:
+        return self.convert_column([amount], [from_currency])[0]
+
+    def convert_column(
+        self,
+        amounts: Sequence[Decimal | float | None],
+        currencies: Sequence[str | None],
+    ) -> list[float | None]:
+        """
+        Converts a column of amounts given the source currency of each one, None when there is no rate for it.
+        """
+        converted = []
+        for amount, currency in zip(amounts, currencies, strict=True):
+            rate = self.rates.get(currency.upper()) if currency and currency.upper() != self.currency else 1.0
+            converted.append(None if amount is None or rate is None else float(amount) * rate)
+        return converted
@@ -0,0 +1,89 @@
+import asyncio
+import os
+from collections.abc import AsyncGenerator, Awaitable, Callable
+
+import psycopg2
+from db import run_in_db
+from fastapi import HTTPException
+from log import logger
+from psycopg2.extensions import connection as Connection
+
+from models.symbol import SEARCH_LIMIT, Symbol, save_symbols, search_symbol
+
+SEARCH_REMOTE_DEADLINE = float(os.getenv("SEARCH_REMOTE_DEADLINE", "0.8"))  # seconds remote results may delay the reply
+
+RemoteSearch = Callable[[str], Awaitable[list[Symbol]]]
+
+# remote searches finish, filling their client's cache, even if the client went away
+_remote_searches: set[asyncio.Task] = set()
+
+
+async def store_remote(db: Connection, q: str, symbols: list[Symbol]) -> list[Symbol]:
+    """
+    Writes remote symbols through into the catalog, so the next search finds them locally.
+    Results keep the remote prices, a failed write only costs the ids.
+    """
+    if not symbols:
+        return symbols
+    try:
+        stored = await run_in_db(save_symbols, db, symbols)
+    except (HTTPException, psycopg2.Error) as e:
+        logger.error(f"search: failed to store remote symbols for {q!r}: {e}")
+        return symbols
+
+    by_ticker = {s.ticker.upper(): s for s in stored}
+    return [by_ticker[s.ticker.upper()].merge(s) if s.ticker.upper() in by_ticker else s for s in symbols]
+
+
+def _new_symbols(symbols: list[Symbol], seen: set[str]) -> list[Symbol]:
+    new = []
+    for symbol in symbols:
+        if symbol.ticker.upper() not in seen:
+            seen.add(symbol.ticker.upper())
+            new.append(symbol)
+    return new
+
+
+async def hybrid_search(
+    db: Connection,
+    q: str,
+    remote: RemoteSearch,
+    limit: int = SEARCH_LIMIT,
+    deadline: float = SEARCH_REMOTE_DEADLINE,
+) -> AsyncGenerator[dict]:
+    """
+    Searches the catalog and a remote source concurrently.
+    The first batch holds the local results and whatever remote results arrived within `deadline` seconds, the
+    remaining remote results follow in a second batch. Every batch only holds symbols not sent before and tells
+    whether more are `pending`. Remote results are written through on `db` once the local query is done with it.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    task = asyncio.create_task(remote(q))
+    _remote_searches.add(task)
+    task.add_done_callback(_remote_searches.discard)
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())  # nobody may be waiting on it
+
+    local = await run_in_db(search_symbol, db, q, limit)
+    await asyncio.wait({task}, timeout=max(0.0, started + deadline - loop.time()))
+
+    seen: set[str] = set()
+    results = _new_symbols(local, seen)
+    if not task.done():
+        yield {"count": len(results), "results": [s.to_dict() for s in results], "pending": True, "errors": []}
+        results = []
+        await asyncio.wait({task})
+
+    errors = []
+    try:
+        remote_results = task.result()
+    except HTTPException as e:
+        errors.append(e.detail)
+        remote_results = []
+    except Exception as e:  # the stream is already sent, a failed remote must end it cleanly
+        logger.error(f"search: remote search failed for {q!r}: {type(e).__name__} {e}")
+        errors.append("remote search is unavailable")
+        remote_results = []
+    results.extend(_new_symbols(await store_remote(db, q, remote_results), seen))
+
+    yield {"count": len(results), "results": [s.to_dict() for s in results], "pending": False, "errors": errors}
@@ -1,16 +1,28 @@
+import json
+import os
 import re
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, replace
 
+from cache import cacheable
 from fastapi import HTTPException
 from log.errors import required_msg
 from psycopg2.errors import UniqueViolation
 from psycopg2.extensions import connection as Connection
-from psycopg2.extras import RealDictCursor, RealDictRow
+from psycopg2.extras import RealDictCursor, RealDictRow, execute_values
 
 from models.session import Session
 from models.user import User
 
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "20"))  # symbols returned by a search unless asked otherwise
+SEARCH_MIN_CONTAINS = 3  # trigram indexes can't serve shorter substrings, those only match prefixes
 
+SYMBOL_CHANGES_CHANNEL = "symbol_changes"  # notified by a trigger on every write to symbols
+
+_ISIN = re.compile(r"^[A-Z]{2}[A-Z0-9]{9}[0-9]$")
+
+
+@cacheable
 @dataclass
 class Symbol:
     ticker: str
@@ -26,6 +38,7 @@ class Symbol:
     is_manual_price: bool = False
     is_favorite: bool = False
     created_by: str | None = None
+    fx_missing: bool = False  # no rate for its quote currency, the price is left in it
 
     @property
     def is_user_created(self) -> bool:
@@ -92,6 +105,7 @@ class Symbol:
             "is_user_created": self.is_user_created,
             "is_manual_price": self.is_manual_price,
             "is_favorite": self.is_favorite,
+            "fx_missing": self.fx_missing,
         }
 
 
@@ -111,32 +125,188 @@ def is_supported_ticker(ticker: str) -> bool:
     return is_supported
 
 
-def search_symbol(db: Connection, query: str) -> list[Symbol]:
-    like_query = f"%{query}%"
-    sql = """
+class SymbolCatalog:
+    """
+    Read-through in-memory catalog of symbols by id, upper-cased ticker and ISIN.
+
+    Only system symbols are kept by ticker and ISIN, like the lookups it serves. It only caches while enabled, i.e.
+    while `tasks.symbols` listens for changes so every worker drops the symbols written by any other one.
+    Symbols are mutable, lookups return copies.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._by_id: dict[str, Symbol] = {}
+        self._by_ticker: dict[str, Symbol] = {}
+        self._by_isin: dict[str, tuple[Symbol, ...]] = {}
+        self._generation = 0  # bumped on invalidation so symbols read before it aren't stored
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def enable(self) -> None:
+        with self._lock:
+            self._clear()
+            self.enabled = True
+
+    def disable(self) -> None:
+        with self._lock:
+            self.enabled = False
+            self._clear()
+
+    def by_id(self, id: str) -> Symbol | None:
+        symbol = self._by_id.get(str(id))
+        return replace(symbol) if symbol else None
+
+    def by_ticker(self, ticker: str) -> Symbol | None:
+        symbol = self._by_ticker.get(ticker.upper())
+        return replace(symbol) if symbol else None
+
+    def by_isin(self, isin: str) -> list[Symbol] | None:
+        symbols = self._by_isin.get(isin.upper())
+        return [replace(s) for s in symbols] if symbols is not None else None
+
+    def add(self, symbol: Symbol, generation: int) -> None:
+        with self._lock:
+            if not self.enabled or generation != self._generation:
+                return
+            symbol = replace(symbol)
+            self._by_id[str(symbol.id)] = symbol
+            if not symbol.is_user_created:
+                self._by_ticker[symbol.ticker.upper()] = symbol
+
+    def add_isin(self, isin: str, symbols: list[Symbol], generation: int) -> None:
+        with self._lock:
+            if self.enabled and generation == self._generation:
+                self._by_isin[isin.upper()] = tuple(replace(s) for s in symbols)
+
+    def invalidate(self, id: str | None = None, ticker: str | None = None, isin: str | None = None) -> None:
+        with self._lock:
+            self._generation += 1
+            symbol = self._by_id.pop(str(id), None) if id else None
+            for t in {ticker, symbol and symbol.ticker} - {None}:
+                self._by_ticker.pop(t.upper(), None)  # type: ignore[union-attr]
+            for i in {isin, symbol and symbol.isin} - {None}:
+                self._by_isin.pop(i.upper(), None)  # type: ignore[union-attr]
+
+    def notify(self, payload: str) -> None:
+        """
+        Applies a change notified on `SYMBOL_CHANGES_CHANNEL`, anything unreadable drops the whole catalog.
+        """
+        try:
+            change = json.loads(payload)
+            self.invalidate(change["id"], change.get("ticker"), change.get("isin"))
+        except (ValueError, KeyError, TypeError):
+            with self._lock:
+                self._clear()
+
+    def _clear(self) -> None:
+        self._generation += 1
+        self._by_id.clear()
+        self._by_ticker.clear()
+        self._by_isin.clear()
+
+
+symbol_catalog = SymbolCatalog()
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_symbol(db: Connection, query: str, limit: int = SEARCH_LIMIT, typeahead: bool = False) -> list[Symbol]:
+    """
+    Searches the system symbols by ticker, name or ISIN prefix, exact tickers first, then ticker and name prefixes,
+    then the closest names. A full ISIN is looked up directly.
+    In `typeahead` mode, and for queries shorter than `SEARCH_MIN_CONTAINS`, only prefixes match.
+    """
+    query = query.strip()
+    if not query or limit <= 0:
+        return []
+
+    upper = query.upper()
+    if _ISIN.match(upper):
+        symbols = get_symbols_by_isin(db, upper)
+        if symbols:
+            return symbols[:limit]
+
+    prefix = _like_escape(upper) + "%"
+    name_prefix = _like_escape(query.lower()) + "%"
+    if typeahead or len(query) < SEARCH_MIN_CONTAINS:
+        where = "upper(ticker) LIKE %s OR lower(name) LIKE %s OR upper(isin) LIKE %s"
+        where_params = (prefix, name_prefix, prefix)
+    else:
+        contains = f"%{_like_escape(query)}%"
+        where = "upper(ticker) LIKE %s OR name ILIKE %s OR upper(isin) LIKE %s"
+        where_params = (contains.upper(), contains, prefix)
+
+    sql = f"""
         SELECT id, ticker, display_name, name, source, isin, currency, picture, created_by
         FROM symbols
-        WHERE created_by IS NULL AND (
-            ticker ILIKE %s OR
-            name ILIKE %s OR
-            isin ILIKE %s
-        )
+        WHERE created_by IS NULL AND ({where})
+        ORDER BY
+            upper(ticker) = %s DESC,
+            upper(ticker) LIKE %s DESC,
+            lower(name) LIKE %s DESC,
+            similarity(name, %s) DESC,
+            length(ticker),
+            ticker
+        LIMIT %s
     """
 
     with db.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(sql, (like_query,) * 3)
+        cursor.execute(sql, (*where_params, upper, prefix, name_prefix, query, limit))
         rows = cursor.fetchall()
 
     return [Symbol.from_row(row) for row in rows]
 
 
+def get_symbols_by_isin(db: Connection, isin: str) -> list[Symbol]:
+    """
+    Gets the system symbols listed under an ISIN, one per exchange ticker.
+    """
+    isin = isin.strip().upper()
+    if not isin:
+        raise HTTPException(status_code=400, detail=required_msg("isin"))
+    if (symbols := symbol_catalog.by_isin(isin)) is not None:
+        return symbols
+
+    sql = """
+        SELECT id, ticker, display_name, name, source, isin, currency, picture, created_by
+        FROM symbols
+        WHERE created_by IS NULL AND upper(isin) = %s
+        ORDER BY ticker
+    """
+
+    generation = symbol_catalog.generation
+    with db.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(sql, (isin,))
+        rows = cursor.fetchall()
+
+    symbols = [Symbol.from_row(row) for row in rows]
+    if symbols:
+        symbol_catalog.add_isin(isin, symbols, generation)
+    return symbols
+
+
 def get_symbol_by_id(db: Connection, id: str) -> Symbol:
     """
-    Gets a symbol by its id from the database.
+    Gets a symbol by its id from the catalog or the database.
     """
     if not id:
         raise HTTPException(status_code=400, detail=required_msg("id"))
+    if symbol := symbol_catalog.by_id(id):
+        return symbol
 
+    generation = symbol_catalog.generation
+    symbol = _select_symbol_by_id(db, id)
+    symbol_catalog.add(symbol, generation)
+    return symbol
+
+
+def _select_symbol_by_id(db: Connection, id: str) -> Symbol:
     sql = """
         SELECT id, ticker, display_name, name, source, isin, currency, picture, created_by
         FROM symbols
@@ -155,25 +325,30 @@ def get_symbol_by_id(db: Connection, id: str) -> Symbol:
 
 def get_symbol_by_ticker(db: Connection, ticker: str) -> Symbol:
     """
-    Gets a symbol by its ticker from the database.
+    Gets a system symbol by its case-insensitive ticker from the catalog or the database.
     """
     if not ticker:
         raise HTTPException(status_code=400, detail=required_msg("ticker"))
+    if symbol := symbol_catalog.by_ticker(ticker):
+        return symbol
 
     sql = """
         SELECT id, ticker, display_name, name, source, isin, currency, picture, created_by
         FROM symbols
-        WHERE created_by IS NULL AND ticker ILIKE %s
+        WHERE created_by IS NULL AND upper(ticker) = %s
     """
 
+    generation = symbol_catalog.generation
     with db.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(sql, (ticker,))
+        cursor.execute(sql, (ticker.upper(),))
         result = cursor.fetchone()
 
     if not result:
         raise HTTPException(status_code=404, detail=f"Symbol {ticker} not found")
 
-    return Symbol.from_row(result)
+    symbol = Symbol.from_row(result)
+    symbol_catalog.add(symbol, generation)
+    return symbol
 
 
 def create_symbol(db: Connection, session: Session, symbol: Symbol, no_commit: bool = False) -> Symbol:
@@ -223,9 +398,61 @@ def create_symbol(db: Connection, session: Session, symbol: Symbol, no_commit: b
     if not row:
         raise HTTPException(status_code=500, detail="Failed to create symbol")
 
+    symbol_catalog.invalidate(isin=symbol.isin)
     if not no_commit:
         db.commit()
-    return get_symbol_by_id(db, row[0])
+    return _select_symbol_by_id(db, row[0])  # may not be committed yet, it's cached on the next lookup
+
+
+def save_symbols(db: Connection, symbols: list[Symbol]) -> list[Symbol]:
+    """
+    Writes symbols found by a remote search through as system symbols, known tickers are left as they are.
+    Rows clashing with an existing ticker or ISIN, user-created ones included, are skipped instead of failing the
+    batch. Returns the stored system symbol of every supported ticker, in a single statement and commit.
+    """
+    rows: dict[str, tuple] = {}
+    isins: set[str] = set()
+    for s in symbols:
+        if not (is_supported_ticker(s.ticker) and s.name and s.currency and s.source) or s.ticker.upper() in rows:
+            continue
+        isin = s.isin.upper() if s.isin and s.isin.upper() not in isins else None  # ISINs are unique too
+        if isin:
+            isins.add(isin)
+        rows[s.ticker.upper()] = (s.ticker, s.name, s.display_name or s.name, s.currency, s.source, isin, s.picture)
+    if not rows:
+        return []
+
+    # uk_ticker and uk_isin make concurrent write-throughs safe, the NOT EXISTS only adds case-insensitivity
+    sql = """
+        WITH v (ticker, name, display_name, currency, source, isin, picture) AS (VALUES %s),
+        inserted AS (
+            INSERT INTO symbols (ticker, name, display_name, currency, source, isin, picture, security_type)
+            SELECT v.ticker, v.name, v.display_name, v.currency, v.source, v.isin, v.picture, 'STOCK'
+            FROM v
+            WHERE NOT EXISTS (SELECT 1 FROM symbols s WHERE upper(s.ticker) = upper(v.ticker))
+            ON CONFLICT DO NOTHING
+            RETURNING id, ticker, display_name, name, source, isin, currency, picture, created_by
+        )
+        SELECT * FROM inserted
+        UNION ALL
+        SELECT s.id, s.ticker, s.display_name, s.name, s.source, s.isin, s.currency, s.picture, s.created_by
+        FROM symbols s
+        JOIN v ON upper(s.ticker) = upper(v.ticker)
+        WHERE s.created_by IS NULL
+    """
+
+    with db.cursor(cursor_factory=RealDictCursor) as cursor:
+        stored = execute_values(
+            cursor,
+            sql,
+            list(rows.values()),
+            template="(%s, %s, %s, %s, %s, %s, %s)",
+            page_size=len(rows),
+            fetch=True,
+        )
+    db.commit()
+
+    return [Symbol.from_row(row) for row in stored]
 
 
 def remove_symbol_by_id(db: Connection, session: Session, symbol_id: str) -> None:
@@ -253,6 +480,7 @@ def remove_symbol_by_id(db: Connection, session: Session, symbol_id: str) -> Non
     with db.cursor() as cursor:
         cursor.execute(sql, (symbol_id, user_id))
     db.commit()
+    symbol_catalog.invalidate(symbol.id, symbol.ticker, symbol.isin)  # the notification reaches the other workers
 
 
 def _exists_transactions_by_symbol(db: Connection, symbol_id: str) -> bool:
@@ -0,0 +1,102 @@
+from db import fetchall, fetchone, run_in_db
+from etag import make_etag
+from psycopg2.extensions import connection as Connection
+
+from models.account import get_accounts_since
+from models.rates import FxMode, get_rate_snapshot
+from models.session import Session
+from models.transactions import get_transactions_since
+from models.watchlist import get_watchlist_since
+
+SYNC_ENTITIES = ("transactions", "watchlist", "accounts")
+
+
+def get_user_version(db: Connection, user_id: str) -> int:
+    """
+    Retrieves the latest change version of a user, 0 when nothing was ever written.
+    """
+    row = fetchone(db, "SELECT version FROM user_versions WHERE user_id = %s::uuid", (user_id,))
+    return int(row[0]) if row else 0
+
+
+def get_user_stamp(db: Connection, user_id: str, quotes: bool = False) -> str:
+    """
+    Identifies the state of a user's data: its change version and, with `quotes`, the last refresh of a watched quote.
+    """
+    if not quotes:
+        return str(get_user_version(db, user_id))
+
+    sql = """
+        SELECT
+            COALESCE((SELECT version FROM user_versions WHERE user_id = %s::uuid), 0),
+            (
+                SELECT MAX(qp.updated_at)
+                FROM watchlist w
+                JOIN latest_quote qp ON qp.symbol_id = w.symbol_id
+                WHERE w.user_id = %s::uuid
+            )
+    """
+
+    row = fetchone(db, sql, (user_id, user_id))
+    return f"{row[0]}:{row[1]}" if row else "0:None"
+
+
+async def get_etag(db: Connection, session: Session, *parts: object, quotes: bool = False) -> str:
+    """
+    Builds the ETag of a user's resource without loading it, `parts` being whatever else the response depends on.
+    Converted amounts depend on the session currency and on the rates snapshot, so both are part of it.
+    """
+    snapshot = await get_rate_snapshot()
+    stamp = await run_in_db(get_user_stamp, db, session.user_id, quotes)
+    return make_etag(stamp, session.currency, snapshot.date if snapshot else None, *parts)
+
+
+def touch_user_version(db: Connection, user_id: str) -> None:
+    """
+    Bumps the version of a user for changes that live outside of the database, e.g. in Stripe.
+    """
+    with db.cursor() as cursor:
+        cursor.execute("SELECT next_user_version(%s::uuid)", (user_id,))
+    db.commit()
+
+
+def get_tombstones(db: Connection, user_id: str, version: int) -> dict[str, list[str]]:
+    """
+    Retrieves the ids of the entities deleted after a version grouped by entity.
+    """
+    sql = """
+        SELECT entity, entity_id
+        FROM tombstones
+        WHERE user_id = %s::uuid AND version > %s
+    """
+
+    deleted: dict[str, list[str]] = {entity: [] for entity in SYNC_ENTITIES}
+    for entity, entity_id in fetchall(db, sql, (user_id, version)):
+        deleted.setdefault(entity, []).append(str(entity_id))
+    return deleted
+
+
+async def get_changes(db: Connection, session: Session, since: int, fx: FxMode = FxMode.LATEST) -> dict:
+    """
+    Collects what changed for a user after the `since` version.
+    The version is read first, so a write committed meanwhile is returned again by the next sync instead of being
+    skipped. Clients apply the deletions before the updates, an entity can be deleted and then created again.
+    `since=0` returns everything.
+    """
+    version = await run_in_db(get_user_version, db, session.user_id)
+    if since > version:  # the client's version isn't from this database, start over
+        since = 0
+    if version == since:
+        return {"version": version, **{entity: {"updated": [], "deleted": []} for entity in SYNC_ENTITIES}}
+
+    deleted = await run_in_db(get_tombstones, db, session.user_id, since)
+    transactions = await get_transactions_since(db, session, since, fx)
+    watchlist = await get_watchlist_since(db, session, since)
+    accounts = await get_accounts_since(db, session, since)
+
+    return {
+        "version": version,
+        "transactions": {"updated": [t.to_dict() for t in transactions], "deleted": deleted["transactions"]},
+        "watchlist": {"updated": [s.to_dict() for s in watchlist], "deleted": deleted["watchlist"]},
+        "accounts": {"updated": [a.to_dict() for a in accounts], "deleted": deleted["accounts"]},
+    }
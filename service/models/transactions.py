@@ -1,14 +1,21 @@
+import base64
+import binascii
+import json
+import uuid
+from collections.abc import AsyncGenerator
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
+from db import fetchall, fetchone, run_in_db, stream
 from fastapi import HTTPException
 from log.errors import required_msg
 from psycopg2.extensions import connection as Connection
 from psycopg2.extras import RealDictCursor, RealDictRow
 
 from models.account import Account, get_accounts_by_user
-from models.rates import convert_to_currency
+from models.positions import get_available_quantity, get_position, refresh_positions
+from models.rates import FxMode, RateTable, load_rate_history
 from models.session import Session
 from models.symbol import Symbol
 from models.user import User
@@ -37,6 +44,7 @@ class Transaction:
     symbol_id: str | None = None
     symbol: Symbol | None = None
     created_at: str | None = None
+    fx_missing: bool = False  # no rate on or before the trade date, left in its own currency
 
     @classmethod
     def from_row(cls, row: RealDictRow) -> "Transaction":
@@ -85,9 +93,42 @@ class Transaction:
             "transaction_type": self.transaction_type.value,
             "date": self.date,
             "created_at": self.created_at,
+            "fx_missing": self.fx_missing,
         }
 
 
+@dataclass
+class TransactionFilter:
+    account_id: str | None = None
+    symbol_id: str | None = None
+    transaction_type: TransactionType | None = None
+    date_from: date | None = None
+    date_to: date | None = None  # inclusive
+
+
+def encode_cursor(transaction: Transaction) -> str:
+    """
+    Builds the opaque keyset cursor pointing right after the given transaction.
+    """
+    day = transaction.date.isoformat() if isinstance(transaction.date, datetime) else transaction.date
+    return base64.urlsafe_b64encode(json.dumps([day, str(transaction.id)]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """
+    Parses a cursor built by `encode_cursor`, anything else is rejected before it reaches the query.
+    """
+    try:
+        day, transaction_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        day = day or "infinity"  # undated transactions sort first
+        if day != "infinity":
+            day = datetime.fromisoformat(day).isoformat()
+        transaction_id = str(uuid.UUID(transaction_id))
+    except (binascii.Error, ValueError, TypeError, AttributeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor") from None
+    return day, transaction_id
+
+
 _TRANSACTION_SELECT = """
 t.id, t.user_id, t.account_id, t.quantity, t.price, t.commission, t.currency, t.transaction_type, t.date, t.created_at,
 s.id AS symbol_id, s.name, s.ticker, s.display_name, s.currency AS symbol_currency, s.source, s.isin, s.picture,
@@ -97,6 +138,66 @@ qp.price as symbol_price, qp.previous_close, qp.currency as symbol_currency
 """
 
 
+_TRANSACTIONS_BY_USER = f"""
+    SELECT {_TRANSACTION_SELECT}
+    FROM transactions t
+    JOIN symbols s ON t.symbol_id = s.id
+    JOIN watchlist w ON t.symbol_id = w.symbol_id AND t.user_id = w.user_id
+    LEFT JOIN accounts a ON t.account_id = a.id
+    LEFT JOIN latest_quote qp ON qp.symbol_id = s.id
+    WHERE t.user_id = %s::uuid
+    ORDER BY t.date DESC
+"""
+
+
+async def _transactions_from_rows(
+    session: Session,
+    rows: list[RealDictRow],
+    fx: FxMode = FxMode.LATEST,
+) -> list[Transaction]:
+    """
+    Builds the transactions converting the quote prices of non-manual symbols to the session currency in one pass,
+    quotes in a currency without a rate keep it flagged with `fx_missing`.
+    With `FxMode.TRADE_DATE` the price and commission of each transaction are converted at its trade date's rate,
+    transactions older than the rate history stay in their own currency flagged with `fx_missing`.
+    """
+    currencies = [row.get("symbol_currency", None) for row in rows]
+    rates = await RateTable.load(session, currencies)
+    prices = rates.convert_column([row.get("symbol_price", None) for row in rows], currencies)
+    open_prices = rates.convert_column([row.get("previous_close", None) for row in rows], currencies)
+
+    transactions = []
+    for row, currency, price, open_price in zip(rows, currencies, prices, open_prices, strict=True):
+        transaction = Transaction.from_row(row)
+        symbol = transaction.symbol
+        assert symbol is not None
+        if not symbol.is_manual_price and rates.has_rate(currency):
+            symbol.price = price
+            symbol.open_price = open_price
+            symbol.currency = session.currency
+        elif not symbol.is_manual_price:
+            symbol.price = row.get("symbol_price", None)
+            symbol.open_price = row.get("previous_close", None)
+            symbol.currency = currency
+            symbol.fx_missing = True
+        transactions.append(transaction)
+
+    if fx == FxMode.TRADE_DATE:
+        history = await load_rate_history()
+        currencies = [t.currency for t in transactions]
+        dates = [t.date for t in transactions]
+        prices = history.convert_column([t.price for t in transactions], currencies, dates, session.currency)
+        commissions = history.convert_column([t.commission for t in transactions], currencies, dates, session.currency)
+        for transaction, price, commission in zip(transactions, prices, commissions, strict=True):
+            if (price is None and transaction.price is not None) or (
+                commission is None and transaction.commission is not None
+            ):
+                transaction.fx_missing = True
+                continue
+            transaction.price, transaction.commission, transaction.currency = price, commission, session.currency
+    return transactions
+
+
 async def get_transaction_by_id(db: Connection, session: Session, transaction_id: str) -> Transaction:
     if not transaction_id:
         raise HTTPException(status_code=400, detail=required_msg("transaction_id"))
@@ -107,85 +208,119 @@ async def get_transaction_by_id(db: Connection, session: Session, transaction_id
         JOIN symbols s ON t.symbol_id = s.id
         JOIN watchlist w ON t.symbol_id = w.symbol_id AND t.user_id = w.user_id
         LEFT JOIN accounts a ON t.account_id = a.id
-        LEFT JOIN LATERAL (
-            SELECT price, previous_close, currency
-            FROM quote_history
-            WHERE symbol_id = s.id
-              AND created_at::date = CURRENT_DATE
-            ORDER BY created_at DESC
-            LIMIT 1
-        ) qp ON TRUE
+        LEFT JOIN latest_quote qp ON qp.symbol_id = s.id
         WHERE t.id = %s::uuid AND t.user_id = %s::uuid
     """
 
-    with db.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(sql, (transaction_id, session.user_id))
-        row = cursor.fetchone()
+    row = await run_in_db(fetchone, db, sql, (transaction_id, session.user_id), cursor_factory=RealDictCursor)
 
     if not row:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    transaction = Transaction.from_row(row)
-    assert transaction.symbol is not None
-    if not transaction.symbol.is_manual_price:
-        transaction.symbol.price, _ = await convert_to_currency(
-            session,
-            row.get("symbol_price", None),
-            row.get("symbol_currency", None),
-        )
-        transaction.symbol.open_price, _ = await convert_to_currency(
-            session,
-            row.get("previous_close", None),
-            row.get("symbol_currency", None),
-        )
-        transaction.symbol.currency = session.currency
-    return transaction
+    return (await _transactions_from_rows(session, [row]))[0]
 
 
-async def get_transactions_by_user(db: Connection, session: Session) -> list[Transaction]:
+async def get_transactions_by_user(
+    db: Connection,
+    session: Session,
+    fx: FxMode = FxMode.LATEST,
+) -> list[Transaction]:
     """
     Get all transactions for a user.
     """
+    rows = await run_in_db(fetchall, db, _TRANSACTIONS_BY_USER, (session.user_id,), cursor_factory=RealDictCursor)
+
+    return await _transactions_from_rows(session, rows, fx)
+
+
+async def stream_transactions_by_user(
+    db: Connection,
+    session: Session,
+    fx: FxMode = FxMode.LATEST,
+) -> AsyncGenerator[list[Transaction]]:
+    """
+    Same as `get_transactions_by_user` but yields the transactions in batches read from a server-side cursor.
+    """
+    async for rows in stream(db, _TRANSACTIONS_BY_USER, (session.user_id,), cursor_factory=RealDictCursor):
+        yield await _transactions_from_rows(session, rows, fx)
+
+
+async def get_transactions_since(
+    db: Connection,
+    session: Session,
+    version: int,
+    fx: FxMode = FxMode.LATEST,
+) -> list[Transaction]:
+    """
+    Get the transactions of a user created or updated after a sync version.
+    """
     sql = f"""
         SELECT {_TRANSACTION_SELECT}
         FROM transactions t
         JOIN symbols s ON t.symbol_id = s.id
         JOIN watchlist w ON t.symbol_id = w.symbol_id AND t.user_id = w.user_id
         LEFT JOIN accounts a ON t.account_id = a.id
-        LEFT JOIN LATERAL (
-            SELECT price, previous_close, currency
-            FROM quote_history
-            WHERE symbol_id = s.id
-              AND created_at::date = CURRENT_DATE
-            ORDER BY created_at DESC
-            LIMIT 1
-        ) qp ON TRUE
-        WHERE t.user_id = %s::uuid
+        LEFT JOIN latest_quote qp ON qp.symbol_id = s.id
+        WHERE t.user_id = %s::uuid AND t.version > %s
         ORDER BY t.date DESC
     """
 
-    with db.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(sql, (session.user_id,))
-        rows = cursor.fetchall()
+    rows = await run_in_db(fetchall, db, sql, (session.user_id, version), cursor_factory=RealDictCursor)
 
-    transactions = []
-    for row in rows:
-        transaction = Transaction.from_row(row)
-        assert transaction.symbol is not None
-        if not transaction.symbol.is_manual_price:
-            transaction.symbol.price, _ = await convert_to_currency(
-                session,
-                row.get("symbol_price", None),
-                row.get("symbol_currency", None),
-            )
-            transaction.symbol.open_price, _ = await convert_to_currency(
-                session,
-                row.get("previous_close", None),
-                row.get("symbol_currency", None),
-            )
-            transaction.symbol.currency = session.currency
-        transactions.append(transaction)
-    return transactions
+    return await _transactions_from_rows(session, rows, fx)
+
+
+async def get_transactions_page(
+    db: Connection,
+    session: Session,
+    filters: TransactionFilter,
+    limit: int,
+    cursor: str | None = None,
+    fx: FxMode = FxMode.LATEST,
+) -> tuple[list[Transaction], str | None]:
+    """
+    Get a page of a user's transactions, newest first, using keyset pagination on (date, id).
+    Returns the page and the cursor of the next one, `None` on the last page.
+    """
+    where = ["t.user_id = %s::uuid"]
+    params: list = [session.user_id]
+    if filters.account_id:
+        where.append("t.account_id = %s::uuid")
+        params.append(filters.account_id)
+    if filters.symbol_id:
+        where.append("t.symbol_id = %s::uuid")
+        params.append(filters.symbol_id)
+    if filters.transaction_type:
+        where.append("t.transaction_type = %s")
+        params.append(filters.transaction_type.value)
+    if filters.date_from:
+        where.append("t.date >= %s::date")
+        params.append(filters.date_from)
+    if filters.date_to:
+        where.append("t.date < %s::date + 1")
+        params.append(filters.date_to)
+    if cursor:
+        where.append("(COALESCE(t.date, 'infinity'::timestamp), t.id) < (%s::timestamp, %s::uuid)")
+        params.extend(decode_cursor(cursor))
+
+    sql = f"""
+        SELECT {_TRANSACTION_SELECT}
+        FROM transactions t
+        JOIN symbols s ON t.symbol_id = s.id
+        JOIN watchlist w ON t.symbol_id = w.symbol_id AND t.user_id = w.user_id
+        LEFT JOIN accounts a ON t.account_id = a.id
+        LEFT JOIN latest_quote qp ON qp.symbol_id = s.id
+        WHERE {" AND ".join(where)}
+        ORDER BY COALESCE(t.date, 'infinity'::timestamp) DESC, t.id DESC
+        LIMIT %s
+    """
+
+    params.append(limit + 1)  # one extra row tells whether there is a next page
+    rows = await run_in_db(fetchall, db, sql, tuple(params), cursor_factory=RealDictCursor)
+
+    transactions = await _transactions_from_rows(session, rows[:limit], fx)
+    next_cursor = encode_cursor(transactions[-1]) if len(rows) > limit else None
+    return transactions, next_cursor
 
 
 async def get_transactions_by_user_and_symbol_and_account(
@@ -203,42 +338,17 @@ async def get_transactions_by_user_and_symbol_and_account(
         JOIN symbols s ON t.symbol_id = s.id
         JOIN watchlist w ON t.symbol_id = w.symbol_id AND t.user_id = w.user_id
         LEFT JOIN accounts a ON t.account_id = a.id
-        LEFT JOIN LATERAL (
-            SELECT price, previous_close, currency
-            FROM quote_history
-            WHERE symbol_id = s.id
-              AND created_at::date = CURRENT_DATE
-            ORDER BY created_at DESC
-            LIMIT 1
-        ) qp ON TRUE
+        LEFT JOIN latest_quote qp ON qp.symbol_id = s.id
         WHERE t.user_id = %s::uuid
             AND t.symbol_id = %s
             AND t.account_id IS NOT DISTINCT FROM %s::uuid
         ORDER BY t.date DESC
     """
 
-    with db.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(sql, (session.user_id, symbol_id, account_id))
-        rows = cursor.fetchall()
+    params = (session.user_id, symbol_id, account_id)
+    rows = await run_in_db(fetchall, db, sql, params, cursor_factory=RealDictCursor)
 
-    transactions = []
-    for row in rows:
-        transaction = Transaction.from_row(row)
-        assert transaction.symbol is not None
-        if not transaction.symbol.is_manual_price:
-            transaction.symbol.price, _ = await convert_to_currency(
-                session,
-                row.get("symbol_price", None),
-                row.get("symbol_currency", None),
-            )
-            transaction.symbol.open_price, _ = await convert_to_currency(
-                session,
-                row.get("previous_close", None),
-                row.get("symbol_currency", None),
-            )
-            transaction.symbol.currency = session.currency
-        transactions.append(transaction)
-    return transactions
+    return await _transactions_from_rows(session, rows)
 
 
 async def create_transaction(db: Connection, session: Session, transaction: Transaction) -> Transaction:
@@ -265,28 +375,25 @@ async def create_transaction(db: Connection, session: Session, transaction: Tran
         RETURNING id
     """
 
-    with db.cursor() as cursor:
-        cursor.execute(
-            sql,
-            (
-                session.user_id,
-                transaction.symbol_id,
-                transaction.account_id,
-                transaction.quantity,
-                transaction.price,
-                transaction.commission,
-                transaction.currency,
-                transaction.transaction_type.value,
-                transaction.date,
-            ),
-        )
-        row = cursor.fetchone()
+    params = (
+        session.user_id,
+        transaction.symbol_id,
+        transaction.account_id,
+        transaction.quantity,
+        transaction.price,
+        transaction.commission,
+        transaction.currency,
+        transaction.transaction_type.value,
+        transaction.date,
+    )
+    row = await run_in_db(fetchone, db, sql, params)
 
     if not row:
         raise HTTPException(status_code=500, detail="Failed to create transaction")
 
     transaction.id = row[0]
-    db.commit()
+    await run_in_db(refresh_positions, db, session.user_id, [(transaction.account_id, transaction.symbol_id)])
+    await run_in_db(db.commit)
     return transaction
 
 
@@ -301,7 +408,7 @@ async def update_transaction(db: Connection, session: Session, transaction: Tran
     await _validate_sell_transaction(db, session, transaction)
 
     sql = """
-        UPDATE transactions
+        UPDATE transactions t
         SET quantity = %s, price = %s, commission = %s,
             account_id = CASE
                 WHEN %s IS NULL THEN NULL
@@ -310,30 +417,28 @@ async def update_transaction(db: Connection, session: Session, transaction: Tran
                     WHERE id = %s::uuid AND user_id = %s::uuid
                 )
         END
-        WHERE id = %s::uuid AND user_id = %s::uuid
-        RETURNING id
+        FROM transactions old
+        WHERE t.id = %s::uuid AND t.user_id = %s::uuid AND old.id = t.id
+        RETURNING t.id, t.symbol_id, t.account_id, old.account_id
     """
 
-    with db.cursor() as cursor:
-        cursor.execute(
-            sql,
-            (
-                transaction.quantity,
-                transaction.price,
-                transaction.commission,
-                transaction.account_id,
-                transaction.account_id,
-                session.user_id,
-                transaction.id,
-                session.user_id,
-            ),
-        )
-        row = cursor.fetchone()
+    params = (
+        transaction.quantity,
+        transaction.price,
+        transaction.commission,
+        transaction.account_id,
+        transaction.account_id,
+        session.user_id,
+        transaction.id,
+        session.user_id,
+    )
+    row = await run_in_db(fetchone, db, sql, params)
 
     if not row:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
-    db.commit()
+    await run_in_db(refresh_positions, db, session.user_id, [(row[2], row[1]), (row[3], row[1])])  # new and old keys
+    await run_in_db(db.commit)
     return await get_transaction_by_id(db, session, row[0])
 
 
@@ -363,26 +468,27 @@ async def update_stock_account(
         if not any(a.id == to_account_id for a in valid_accounts):
             raise HTTPException(status_code=400, detail=f"Account '{to_account_id}' not found for user '{user_id}'")
 
-    account_sql = "account_id = %s::uuid AND" if from_account_id is not None else ""
+    account_sql = "t.account_id = %s::uuid AND" if from_account_id is not None else ""
     sql = f"""
         UPDATE transactions t
         SET account_id = %s::uuid
-        WHERE user_id = %s::uuid AND
+        FROM transactions old
+        WHERE old.id = t.id AND t.user_id = %s::uuid AND
             {account_sql}
             (SELECT ticker FROM symbols WHERE id = t.symbol_id) = %s
-        RETURNING id
+        RETURNING t.id, t.symbol_id, old.account_id
     """
 
-    with db.cursor() as cursor:
-        params = (
-            (to_account_id, user_id, from_account_id, ticker)
-            if from_account_id is not None
-            else (to_account_id, user_id, ticker)
-        )
-        cursor.execute(sql, params)
-        rows = cursor.fetchall()
+    params = (
+        (to_account_id, user_id, from_account_id, ticker)
+        if from_account_id is not None
+        else (to_account_id, user_id, ticker)
+    )
+    rows = await run_in_db(fetchall, db, sql, params)
 
-    db.commit()
+    keys = [k for _, symbol_id, account_id in rows for k in ((account_id, symbol_id), (to_account_id, symbol_id))]
+    await run_in_db(refresh_positions, db, user_id, keys)
+    await run_in_db(db.commit)
     return [row[0] for row in rows]
 
 
@@ -401,10 +507,13 @@ def remove_transaction_by_id(db: Connection, session: Session, transaction_id: s
             """
             DELETE FROM transactions
             WHERE user_id = %s::uuid AND id = %s::uuid
+            RETURNING account_id, symbol_id
             """,
             (user_id, transaction_id),
         )
-        db.commit()
+        deleted = cursor.fetchall()
+    refresh_positions(db, user_id, deleted)
+    db.commit()
 
 
 async def _validate_transaction_by_type(db: Connection, session: Session, transaction: Transaction) -> None:
@@ -423,14 +532,14 @@ async def _validate_transaction_by_type(db: Connection, session: Session, transa
 
     # check for at least one BUY transaction for the given symbol
     if transaction.transaction_type in {TransactionType.DIVIDEND, TransactionType.DIVIDEND_CASH}:
-        transactions = await get_transactions_by_user(db, session)
-        _has_buy_transaction = any(
-            t.transaction_type == TransactionType.BUY
-            and getattr(t.account, "id", None) == transaction.account_id
-            and getattr(t.symbol, "id", None) == transaction.symbol_id
-            for t in transactions
+        position = await run_in_db(
+            get_position,
+            db,
+            session.user_id,
+            transaction.account_id,
+            transaction.symbol_id,
         )
-        if not _has_buy_transaction:
+        if not position or not position.has_buy:
             ticker = transaction.symbol.ticker if transaction.symbol else transaction.symbol_id
             raise HTTPException(status_code=400, detail=f"No BUY transaction found for symbol {ticker}")
 
@@ -440,19 +549,14 @@ async def _validate_sell_transaction(db: Connection, session: Session, transacti
         return
 
     assert transaction.symbol_id is not None
-    transactions = await get_transactions_by_user_and_symbol_and_account(
+    remaining = await run_in_db(
+        get_available_quantity,
         db,
-        session,
-        symbol_id=transaction.symbol_id,
-        account_id=transaction.account_id,
+        session.user_id,
+        transaction.account_id,
+        transaction.symbol_id,
+        before_transaction_id=transaction.id or None,  # if we are updating an existing transaction, exclude it
     )
-    hoard_transactions = {TransactionType.BUY, TransactionType.SELL, TransactionType.DIVIDEND}
-    transactions = [t for t in transactions if t.transaction_type in hoard_transactions]
-    transactions.reverse()
-    if transaction.id:  # if we are updating an existing transaction, exclude it from the check
-        idx = next(i for i, t in enumerate(transactions) if t.id == transaction.id)
-        transactions = transactions[:idx]
-    remaining = sum(-t.quantity if t.transaction_type == TransactionType.SELL else t.quantity for t in transactions)
-    if float(remaining) < transaction.quantity:
+    if remaining < transaction.quantity:
         msg = f"Not enough shares to sell. Available: {remaining}, Trying to sell: {transaction.quantity}"
         raise HTTPException(status_code=400, detail=msg)
@@ -1,9 +1,14 @@
+import math
+import uuid
+from collections.abc import AsyncGenerator
+
+from db import fetchall, fetchone, run_in_db, stream
 from fastapi import HTTPException
 from log.errors import required_msg
 from psycopg2.extensions import connection as Connection
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, RealDictRow, execute_values
 
-from models.rates import convert_to_currency
+from models.rates import RateTable
 from models.session import Session
 from models.user import User
 
@@ -15,6 +20,42 @@ w.manual_price AS manual_price, s.created_by, TRUE AS is_favorite, qp.price, qp.
 """
 
 
+_WATCHLIST_BY_USER = f"""
+    SELECT {_WATCHLIST_SELECT}
+    FROM watchlist w
+    JOIN symbols s ON w.symbol_id = s.id
+    LEFT JOIN latest_quote qp ON qp.symbol_id = s.id
+    WHERE w.user_id = %s::uuid
+    ORDER BY s.display_name
+"""
+
+
+async def _symbols_from_rows(session: Session, rows: list[RealDictRow]) -> list[Symbol]:
+    """
+    Builds the watchlist symbols converting the quote prices of non-manual ones to the session currency in one pass.
+    Quotes in a currency without a rate keep it, flagged with `fx_missing`.
+    """
+    currencies = [row.get("currency", None) for row in rows]
+    rates = await RateTable.load(session, currencies)
+    prices = rates.convert_column([row.get("price", None) for row in rows], currencies)
+    open_prices = rates.convert_column([row.get("previous_close", None) for row in rows], currencies)
+
+    symbols = []
+    for row, currency, price, open_price in zip(rows, currencies, prices, open_prices, strict=True):
+        symbol = Symbol.from_row(row)
+        if not symbol.is_manual_price and rates.has_rate(currency):
+            symbol.price = price
+            symbol.open_price = open_price
+            symbol.currency = session.currency
+        elif not symbol.is_manual_price:
+            symbol.price = row.get("price", None)
+            symbol.open_price = row.get("previous_close", None)
+            symbol.currency = currency
+            symbol.fx_missing = True
+        symbols.append(symbol)
+    return symbols
+
+
 async def get_symbol_by_watchlist_id(
     db: Connection,
     session: Session,
@@ -33,34 +74,16 @@ async def get_symbol_by_watchlist_id(
         SELECT {_WATCHLIST_SELECT}
         FROM watchlist w
         JOIN symbols s ON w.symbol_id = s.id
-        LEFT JOIN LATERAL (
-            SELECT price, previous_close, currency
-            FROM quote_history
-            WHERE symbol_id = s.id
-              AND created_at::date = CURRENT_DATE
-            ORDER BY created_at DESC
-            LIMIT 1
-        ) qp ON TRUE
+        LEFT JOIN latest_quote qp ON qp.symbol_id = s.id
         WHERE w.user_id = %s::uuid AND w.id = %s::uuid
     """
 
-    with db.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(sql, (user_id, watchlist_item_id))
-        row = cursor.fetchone()
+    row = await run_in_db(fetchone, db, sql, (user_id, watchlist_item_id), cursor_factory=RealDictCursor)
 
     if not row:
         raise HTTPException(status_code=404, detail="Watchlist item not found")
 
-    symbol = Symbol.from_row(row)
-    if not symbol.is_manual_price:
-        symbol.price, _ = await convert_to_currency(session, row.get("price", None), row.get("currency", None))
-        symbol.open_price, _ = await convert_to_currency(
-            session,
-            row.get("previous_close", None),
-            row.get("currency", None),
-        )
-        symbol.currency = session.currency
-    return symbol
+    return (await _symbols_from_rows(session, [row]))[0]
 
 
 async def get_watchlist_by_user(db: Connection, session: Session) -> list[Symbol]:
@@ -71,42 +94,45 @@ async def get_watchlist_by_user(db: Connection, session: Session) -> list[Symbol
     if not user_id:
         raise HTTPException(status_code=400, detail=required_msg("user_id"))
 
+    rows = await run_in_db(fetchall, db, _WATCHLIST_BY_USER, (user_id,), cursor_factory=RealDictCursor)
+
+    if not rows:
+        return []
+
+    return await _symbols_from_rows(session, rows)
+
+
+async def stream_watchlist_by_user(db: Connection, session: Session) -> AsyncGenerator[list[Symbol]]:
+    """
+    Same as `get_watchlist_by_user` but yields the symbols in batches read from a server-side cursor.
+    """
+    user_id = session.user.id if isinstance(session.user, User) else session.user
+    if not user_id:
+        raise HTTPException(status_code=400, detail=required_msg("user_id"))
+
+    async for rows in stream(db, _WATCHLIST_BY_USER, (user_id,), cursor_factory=RealDictCursor):
+        yield await _symbols_from_rows(session, rows)
+
+
+async def get_watchlist_since(db: Connection, session: Session, version: int) -> list[Symbol]:
+    """
+    Retrieves the watchlist symbols added or updated after a sync version.
+    """
     sql = f"""
         SELECT {_WATCHLIST_SELECT}
         FROM watchlist w
         JOIN symbols s ON w.symbol_id = s.id
-        LEFT JOIN LATERAL (
-            SELECT price, previous_close, currency
-            FROM quote_history
-            WHERE symbol_id = s.id
-              AND created_at::date = CURRENT_DATE
-            ORDER BY created_at DESC
-            LIMIT 1
-        ) qp ON TRUE
-        WHERE w.user_id = %s::uuid
+        LEFT JOIN latest_quote qp ON qp.symbol_id = s.id
+        WHERE w.user_id = %s::uuid AND w.version > %s
         ORDER BY s.display_name
     """
 
-    with db.cursor(cursor_factory=RealDictCursor) as cursor:
-        cursor.execute(sql, (user_id,))
-        rows = cursor.fetchall()
+    rows = await run_in_db(fetchall, db, sql, (session.user_id, version), cursor_factory=RealDictCursor)
 
     if not rows:
         return []
 
-    symbols = []
-    for row in rows:
-        symbol = Symbol.from_row(row)
-        if not symbol.is_manual_price:
-            symbol.price, _ = await convert_to_currency(session, row.get("price", None), row.get("currency", None))
-            symbol.open_price, _ = await convert_to_currency(
-                session,
-                row.get("previous_close", None),
-                row.get("currency", None),
-            )
-            symbol.currency = session.currency
-        symbols.append(symbol)
-    return symbols
+    return await _symbols_from_rows(session, rows)
 
 
 def create_watchlist_item(db: Connection, session: Session, symbol: Symbol, no_commit: bool = False) -> Symbol:
@@ -171,17 +197,84 @@ async def update_watchlist_item(
         RETURNING w.id
     """
 
-    with db.cursor() as cursor:
-        cursor.execute(sql, (new_price, user_id, symbol_id))
-        result = cursor.fetchone()
+    result = await run_in_db(fetchone, db, sql, (new_price, user_id, symbol_id))
 
     if not result:
         raise HTTPException(status_code=500, detail="Failed to update watchlist item")
 
-    db.commit()
+    await run_in_db(db.commit)
     return await get_symbol_by_watchlist_id(db, session, result[0])
 
 
+def _parse_price_updates(items: list) -> dict[str, float | None]:
+    """
+    Validates `[{symbol_id, price}]` items before anything reaches the database, the last item of a symbol wins.
+    """
+    prices: dict[str, float | None] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise HTTPException(status_code=400, detail="Each price must be an object with symbol_id and price")
+        symbol_id, price = item.get("symbol_id"), item.get("price", None)
+        if not symbol_id:
+            raise HTTPException(status_code=400, detail=required_msg("symbol_id"))
+        try:
+            symbol_id = str(uuid.UUID(str(symbol_id)))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid symbol_id {symbol_id}") from None
+        if price is not None:
+            if isinstance(price, bool) or not isinstance(price, int | float) or not math.isfinite(price):
+                raise HTTPException(status_code=400, detail=f"Price for symbol {symbol_id} must be a number or null")
+            if price < 0:
+                raise HTTPException(status_code=400, detail=f"Price for symbol {symbol_id} cannot be negative")
+            price = float(price)
+        prices[symbol_id] = price
+    return prices
+
+
+async def update_watchlist_prices(db: Connection, session: Session, items: list) -> list[Symbol]:
+    """
+    Updates the manual prices of many watchlist items at once, all of them or none.
+    The update and the read of the updated symbols are a single statement.
+    """
+    user_id = session.user.id if isinstance(session.user, User) else session.user
+    if not user_id:
+        raise HTTPException(status_code=400, detail=required_msg("user_id"))
+    prices = _parse_price_updates(items)
+    if not prices:
+        return []
+
+    sql = f"""
+        WITH updated AS (
+            UPDATE watchlist w
+            SET manual_price = v.price
+            FROM (VALUES %s) AS v (user_id, symbol_id, price)
+            WHERE w.user_id = v.user_id AND w.symbol_id = v.symbol_id
+            RETURNING w.user_id, w.symbol_id, w.manual_price
+        )
+        SELECT {_WATCHLIST_SELECT}
+        FROM updated w
+        JOIN symbols s ON w.symbol_id = s.id
+        LEFT JOIN latest_quote qp ON qp.symbol_id = s.id
+        ORDER BY s.display_name
+    """
+
+    rows = [(user_id, symbol_id, price) for symbol_id, price in prices.items()]
+
+    def _update() -> list[RealDictRow]:
+        with db.cursor(cursor_factory=RealDictCursor) as cursor:
+            template = "(%s::uuid, %s::uuid, %s::numeric)"
+            return execute_values(cursor, sql, rows, template=template, page_size=len(rows), fetch=True)
+
+    updated = await run_in_db(_update)
+    missing = {symbol_id.lower() for symbol_id in prices} - {str(row["symbol_id"]).lower() for row in updated}
+    if missing:
+        await run_in_db(db.rollback)
+        raise HTTPException(status_code=404, detail=f"Symbols not found in the watchlist: {', '.join(sorted(missing))}")
+
+    await run_in_db(db.commit)
+    return await _symbols_from_rows(session, updated)
+
+
 def remove_watchlist_item(db: Connection, session: Session, symbol_id: str) -> None:
     """
     Removes a symbol from the watchlist in the database.
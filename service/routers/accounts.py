@@ -1,5 +1,6 @@
-from db import get_db
-from fastapi import APIRouter, Body, Depends
+from db import get_db, run_in_db
+from etag import etag_headers, is_not_modified, not_modified
+from fastapi import APIRouter, Body, Depends, Request, Response
 from models._limits import LimitAction, enforce_limit
 from models.account import (
     Account,
@@ -9,6 +10,7 @@ from models.account import (
     remove_account_by_id,
     update_account,
 )
+from models.sync import get_etag
 
 from routers.auth import get_session
 
@@ -17,10 +19,17 @@ router = APIRouter()
 
 @router.get("/")
 async def api_get_accounts(
+    request: Request,
+    response: Response,
     db=Depends(get_db),
     session=Depends(get_session),
 ):
+    etag = await get_etag(db, session, "accounts")
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
     accounts = await get_accounts_by_user(db, session)
+    response.headers.update(etag_headers(etag))
     return [a.to_dict() for a in accounts]
 
 
@@ -57,7 +66,7 @@ async def api_remove_account(
     db=Depends(get_db),
     session=Depends(get_session),
 ):
-    remove_account_by_id(db, session, account_id, forced=forced)
+    await run_in_db(remove_account_by_id, db, session, account_id, forced=forced)
 
 
 @router.delete("/{account_id}/balances/{balance_id}")
@@ -67,4 +76,5 @@ async def api_remove_account_balance(
     db=Depends(get_db),
     session=Depends(get_session),
 ):
-    return remove_account_balance_by_id(db, session, account_id, balance_id)
+    account = await remove_account_balance_by_id(db, session, account_id, balance_id)
+    return account.to_dict()
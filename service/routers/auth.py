@@ -4,12 +4,12 @@ import secrets
 from datetime import datetime, timedelta, timezone
 from urllib.parse import urljoin
 
-import httpx
-from db import get_db
+from cache import cached
+from db import get_db, run_in_db
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse, RedirectResponse
-from google.auth.transport import requests as google_requests
-from google.oauth2 import id_token
+from google.auth import jwt
+from http_client import http_clients
 from models.session import Session, get_session_by_id, update_session
 from models.user import User, create_user_if_not_exists
 
@@ -23,13 +23,16 @@ GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 FRONTEND_BASE_URL = os.getenv("FRONTEND_BASE_URL", "http://localhost:5173/")
 FRONTEND_AUTH_URL = urljoin(FRONTEND_BASE_URL.rstrip("/") + "/", "auth/callback")
 
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
 
 async def get_session(request: Request, db=Depends(get_db)) -> Session:
     session_id = request.cookies.get("session_id")
     if not session_id:
         raise HTTPException(status_code=401, detail="No authentication session found")
 
-    session = get_session_by_id(db, session_id)
+    session = await run_in_db(get_session_by_id, db, session_id)
     if not session or not session.user:
         raise HTTPException(status_code=401, detail="Invalid session or user not found")
 
@@ -44,10 +47,10 @@ async def get_session(request: Request, db=Depends(get_db)) -> Session:
             if not id_token_str:
                 raise HTTPException(status_code=400, detail="No ID token returned")
 
-            payload = _verify_id_token(id_token_str)
+            payload = await _verify_id_token(id_token_str)
             session.tokens.update(new_tokens)
             session.expires = payload.get("exp", 0)
-            update_session(db, session)
+            await run_in_db(update_session, db, session)
 
         assert isinstance(session.user, User), "user must be an instance of User"
         return session
@@ -94,53 +97,53 @@ async def auth_callback(code: str, state: str, request: Request, db=Depends(get_
     if IS_PROD and (not state_cookie or state_cookie != state):
         raise HTTPException(status_code=400, detail="Invalid state parameter")
 
-    async with httpx.AsyncClient() as client:
-        token_res = await client.post(
-            "https://oauth2.googleapis.com/token",
-            data={
-                "code": code,
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "redirect_uri": f"{FRONTEND_AUTH_URL}",
-                "grant_type": "authorization_code",
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
-        token_res.raise_for_status()
-
-        tokens = token_res.json()
-        id_token_str = tokens.get("id_token")
-        if not id_token_str:
-            raise HTTPException(status_code=400, detail="No ID token returned")
-
-        payload = _verify_id_token(id_token_str)
-        user = create_user_if_not_exists(db, User.from_dict(**payload))
-        assert user.id, "User ID cannot be None"
-
-        session_id = secrets.token_urlsafe(32)
-        update_session(
-            db,
-            Session(
-                session_id=session_id,
-                user=user.id,
-                tokens=tokens,
-                expires=payload.get("exp", 0),
-                currency="unused",
-            ),
-        )
-
-        response = JSONResponse({"redirect_url": FRONTEND_BASE_URL})
-        response.delete_cookie("oauth_state", path="/")
-        response.set_cookie(
-            key="session_id",
-            value=session_id,
-            httponly=True,
-            secure=IS_PROD,
-            samesite="none" if IS_PROD else "lax",
-            max_age=604800 if IS_PROD else 3200,
-            expires=datetime.now(timezone.utc) + (timedelta(seconds=604800) if IS_PROD else timedelta(seconds=3200)),
-        )
-        return response
+    token_res = await http_clients.post(
+        "https://oauth2.googleapis.com/token",
+        data={
+            "code": code,
+            "client_id": GOOGLE_CLIENT_ID,
+            "client_secret": GOOGLE_CLIENT_SECRET,
+            "redirect_uri": f"{FRONTEND_AUTH_URL}",
+            "grant_type": "authorization_code",
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    token_res.raise_for_status()
+
+    tokens = token_res.json()
+    id_token_str = tokens.get("id_token")
+    if not id_token_str:
+        raise HTTPException(status_code=400, detail="No ID token returned")
+
+    payload = await _verify_id_token(id_token_str)
+    user = await run_in_db(create_user_if_not_exists, db, User.from_dict(**payload))
+    assert user.id, "User ID cannot be None"
+
+    session_id = secrets.token_urlsafe(32)
+    await run_in_db(
+        update_session,
+        db,
+        Session(
+            session_id=session_id,
+            user=user.id,
+            tokens=tokens,
+            expires=payload.get("exp", 0),
+            currency="unused",
+        ),
+    )
+
+    response = JSONResponse({"redirect_url": FRONTEND_BASE_URL})
+    response.delete_cookie("oauth_state", path="/")
+    response.set_cookie(
+        key="session_id",
+        value=session_id,
+        httponly=True,
+        secure=IS_PROD,
+        samesite="none" if IS_PROD else "lax",
+        max_age=604800 if IS_PROD else 3200,
+        expires=datetime.now(timezone.utc) + (timedelta(seconds=604800) if IS_PROD else timedelta(seconds=3200)),
+    )
+    return response
 
 
 @router.get("/me")
@@ -149,17 +152,16 @@ async def me(session=Depends(get_session)):
 
 
 async def _refresh_access_token(refresh_token: str) -> dict:
-    async with httpx.AsyncClient() as client:
-        res = await client.post(
-            "https://oauth2.googleapis.com/token",
-            data={
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "refresh_token": refresh_token,
-                "grant_type": "refresh_token",
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
+    res = await http_clients.post(
+        "https://oauth2.googleapis.com/token",
+        data={
+            "client_id": GOOGLE_CLIENT_ID,
+            "client_secret": GOOGLE_CLIENT_SECRET,
+            "refresh_token": refresh_token,
+            "grant_type": "refresh_token",
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
 
     if res.status_code != 200:
         raise HTTPException(status_code=400, detail="Failed to refresh access token")
@@ -167,12 +169,24 @@ async def _refresh_access_token(refresh_token: str) -> dict:
     return res.json()
 
 
-def _verify_id_token(id_token_str: str) -> dict:
+@cached("google.certs", ttl=3600)  # Google rotates its signing keys about once a day
+async def _google_certs() -> dict[str, str]:
+    res = await http_clients.get(GOOGLE_CERTS_URL)
+    if res.status_code != 200:
+        raise HTTPException(status_code=503, detail="Failed to fetch Google certificates")
+    return res.json()
+
+
+async def _verify_id_token(id_token_str: str) -> dict:
+    """
+    Verifies a Google ID token like `google.oauth2.id_token.verify_oauth2_token`, fetching the certificates through
+    the shared HTTP clients instead of a blocking `requests` call.
+    """
+    certs = await _google_certs()
     try:
-        return id_token.verify_oauth2_token(
-            id_token_str,
-            google_requests.Request(),
-            GOOGLE_CLIENT_ID,
-        )
+        payload = jwt.decode(id_token_str, certs=certs, audience=GOOGLE_CLIENT_ID)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Token verification failed: {e}")
+    if payload.get("iss") not in GOOGLE_ISSUERS:
+        raise HTTPException(status_code=400, detail="Token verification failed: wrong issuer")
+    return payload
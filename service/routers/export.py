@@ -0,0 +1,44 @@
+from datetime import date
+from enum import Enum
+
+from db import get_db
+from fastapi import APIRouter, Depends, Query
+from models.export import ExportDataset, export_columns, stream_export
+from streaming import csv_lines, ndjson_lines, streaming_download, zip_files
+
+from routers.auth import get_session
+
+router = APIRouter()
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+    ZIP = "zip"
+
+
+@router.get("/")
+async def api_export(
+    format: ExportFormat = Query(ExportFormat.CSV),
+    dataset: ExportDataset = Query(ExportDataset.TRANSACTIONS, description="Ignored for zip, it holds all of them"),
+    db=Depends(get_db),
+    session=Depends(get_session),
+):
+    """
+    Downloads the user's full history, a zip bundles every dataset as a CSV file.
+    """
+    prefix = f"richjet-{date.today().isoformat()}"
+
+    if format == ExportFormat.ZIP:
+        files = [
+            (f"{d.value}.csv", csv_lines(export_columns(d), stream_export(db, session.user_id, d)))
+            for d in ExportDataset
+        ]
+        return streaming_download(zip_files(files), "application/zip", f"{prefix}.zip")
+
+    batches = stream_export(db, session.user_id, dataset)
+    if format == ExportFormat.NDJSON:
+        chunks = ndjson_lines(export_columns(dataset), batches)
+        return streaming_download(chunks, "application/x-ndjson", f"{prefix}-{dataset.value}.ndjson")
+    chunks = csv_lines(export_columns(dataset), batches)
+    return streaming_download(chunks, "text/csv", f"{prefix}-{dataset.value}.csv")
@@ -0,0 +1,24 @@
+from db import get_db
+from fastapi import APIRouter, Depends, HTTPException
+from models.portfolio import get_portfolio
+
+from routers.auth import get_session
+
+router = APIRouter()
+
+
+@router.get("/")
+async def api_get_portfolio(
+    account_id: str | None = None,
+    db=Depends(get_db),
+    session=Depends(get_session),
+):
+    """
+    Returns the FIFO portfolio of every account and their aggregate, or a single account's with `account_id`.
+    """
+    portfolio = await get_portfolio(db, session)
+    if account_id is None:
+        return portfolio
+    if account_id not in portfolio["accounts"]:
+        raise HTTPException(status_code=404, detail="Account not found")
+    return portfolio["accounts"][account_id]
@@ -1,18 +1,22 @@
-import httpx
-from clients.google import GoogleClient
-from db import get_db
+import asyncio
+import os
+
+from clients.quotes import quote_engine
+from db import get_db, run_in_db
 from fastapi import APIRouter, Depends, HTTPException, Query
 from log import logger
-from models.quote import create_quote_history_point, get_quote_point
-from models.rates import convert_to_currency
+from models.quote import StockQuote, create_quote_history_points, get_quote_point
+from models.rates import RateTable
+from tasks.quotes import quote_refresher
 
 from routers.auth import get_session
 
 router = APIRouter()
-client = GoogleClient()
+
+QUOTE_FETCH_CONCURRENCY = int(os.getenv("QUOTE_FETCH_CONCURRENCY", "5"))  # parallel scrapes per request
+QUOTE_FETCH_DEADLINE = float(os.getenv("QUOTE_FETCH_DEADLINE", "3"))  # seconds a request waits for scrapes
 
 
-# TODO: add fallback to https://markets.ft.com/data/funds/tearsheet/historical?s=IE00BD0NCM55:EUR
 @router.get("/")
 async def get_quote(
     tickers: list[str] = Query(..., description="List of stock tickers"),
@@ -27,30 +31,63 @@ async def get_quote(
         raise HTTPException(status_code=400, detail="maximum 10 tickers allowed per request")
 
     quotes = await get_quote_point(db, session, tickers)
+
+    # stale quotes are served right away and refreshed in the background, only unknown prices are fetched in-request
+    quote_refresher.revalidate([q.ticker for q in quotes if q.current and q.current > 0 and q.is_stale])
+    missing = [q.ticker for q in quotes if not q.current or q.current <= 0]
+    fetched = await _fetch_quotes(missing)
+    if fetched:
+        await run_in_db(create_quote_history_points, db, list(fetched.values()))
+
+    quotes = [fetched.get(q.ticker, q) for q in quotes]  # last known price is kept otherwise
+    quotes = [q for q in quotes if q.current]
+    currencies = [q.currency for q in quotes]
+    rates = await RateTable.load(session, currencies)
+    prices = rates.convert_column([q.current for q in quotes], currencies)
+    previous_closes = rates.convert_column([q.previous_close for q in quotes], currencies)
+
     results = []
+    for quote, currency, price, previous_close in zip(quotes, currencies, prices, previous_closes, strict=True):
+        if rates.has_rate(currency):
+            quote.current, quote.previous_close, quote.currency = price, previous_close, session.currency
+        else:
+            quote.fx_missing = True  # left in its own currency
+        results.append(quote.to_dict())
+
+    if not results:
+        raise HTTPException(status_code=404, detail="no quote found for the given tickers")
+    return results
 
-    for quote in quotes:
-        if not quote.current or quote.current <= 0:
+
+async def _fetch_quotes(tickers: list[str]) -> dict[str, StockQuote]:
+    """
+    Scrapes the given tickers concurrently returning the valid quotes that arrived before the deadline.
+    Waits on scrapes that miss it are cancelled and their tickers handed to the quote refresher, which stores them.
+    """
+    if not tickers:
+        return {}
+
+    semaphore = asyncio.Semaphore(QUOTE_FETCH_CONCURRENCY)
+
+    async def _fetch(ticker: str) -> StockQuote | None:
+        async with semaphore:
             try:
-                logger.info(f"fetching new quote for {quote.ticker}")
-                new_quote = await client.get_quote(quote.ticker)
-                if new_quote and new_quote.current and new_quote.current > 0:
-                    create_quote_history_point(db, new_quote)
-                quote = quote.merge(new_quote)
+                logger.info(f"fetching new quote for {ticker}")
+                return await quote_engine.get_quote(ticker)
             except HTTPException as e:
                 logger.error(e.detail)
-            except httpx.TimeoutException:
-                logger.error(f"{client.NAME}: timeout")
-
-        if quote:
-            quote.current, _ = await convert_to_currency(session, quote.current, quote.currency)
-            quote.previous_close, quote.currency = await convert_to_currency(
-                session,
-                quote.previous_close,
-                quote.currency,
-            )
-            results.append(quote.to_dict())
+        return None
 
-    if not results:
-        raise HTTPException(status_code=404, detail="no quote found for the given tickers")
-    return results
+    tasks = {asyncio.create_task(_fetch(t)): t for t in tickers}
+    done, pending = await asyncio.wait(tasks, timeout=QUOTE_FETCH_DEADLINE)
+    for task in pending:
+        logger.warning(f"quote for {tasks[task]} missed the {QUOTE_FETCH_DEADLINE}s deadline")
+        task.cancel()
+    quote_refresher.revalidate([tasks[task] for task in pending])
+
+    quotes = {}
+    for task in done:
+        quote = task.result()
+        if quote and quote.current and quote.current > 0:
+            quotes[tasks[task]] = quote
+    return quotes
@@ -2,8 +2,10 @@ import logging
 import os
 
 import stripe
+from db import get_db, run_in_db
 from fastapi import APIRouter, Depends, HTTPException
 from models.subscriptions import get_subscription_plans, update_subscription_cancellation
+from models.sync import touch_user_version
 
 from routers.auth import get_session
 
@@ -49,20 +51,24 @@ async def checkout(
 
 
 @router.put("/{subscription_id}/enable")
-async def api_enable_subscription(subscription_id: str, _=Depends(get_session)):
+async def api_enable_subscription(subscription_id: str, db=Depends(get_db), session=Depends(get_session)):
     """
     Enables a subscription by its ID.
     """
     if not stripe.api_key:
         raise HTTPException(status_code=500, detail="Stripe API key not configured")
-    return update_subscription_cancellation(subscription_id, cancel=False)
+    subscription = update_subscription_cancellation(subscription_id, cancel=False)
+    await run_in_db(touch_user_version, db, session.user_id)  # settings embed the subscription
+    return subscription
 
 
 @router.put("/{subscription_id}/cancel")
-async def api_cancel_subscription(subscription_id: str, _=Depends(get_session)):
+async def api_cancel_subscription(subscription_id: str, db=Depends(get_db), session=Depends(get_session)):
     """
     Cancels a subscription by its ID.
     """
     if not stripe.api_key:
         raise HTTPException(status_code=500, detail="Stripe API key not configured")
-    return update_subscription_cancellation(subscription_id, cancel=True)
+    subscription = update_subscription_cancellation(subscription_id, cancel=True)
+    await run_in_db(touch_user_version, db, session.user_id)  # settings embed the subscription
+    return subscription
@@ -1,4 +1,4 @@
-from db import get_db
+from db import get_db, run_in_db
 from fastapi import APIRouter, Body, Depends
 from models.symbol import Symbol, create_symbol, remove_symbol_by_id
 from models.user import User
@@ -17,15 +17,19 @@ async def api_create_symbol(
 ):
     user_id = session.user.id if isinstance(session.user, User) else session.user
     symbol = Symbol.from_dict(**symbol_data, created_by=user_id)
-    with db:
-        with db.cursor() as cursor:
-            cursor.execute(f"SAVEPOINT symbol_create_{user_id.replace('-', '_')};")
-            try:
-                symbol = create_symbol(db, session, symbol, no_commit=True)
-                symbol = create_watchlist_item(db, session, symbol)
-            except Exception as e:
-                cursor.execute(f"ROLLBACK TO SAVEPOINT symbol_create_{user_id.replace('-', '_')};")
-                raise e
+
+    def _create_symbol() -> Symbol:
+        with db:
+            with db.cursor() as cursor:
+                cursor.execute(f"SAVEPOINT symbol_create_{user_id.replace('-', '_')};")
+                try:
+                    created = create_symbol(db, session, symbol, no_commit=True)
+                    return create_watchlist_item(db, session, created)
+                except Exception as e:
+                    cursor.execute(f"ROLLBACK TO SAVEPOINT symbol_create_{user_id.replace('-', '_')};")
+                    raise e
+
+    symbol = await run_in_db(_create_symbol)
     return symbol.to_dict()
 
 
@@ -35,4 +39,4 @@ async def api_remove_symbol(
     db=Depends(get_db),
     session=Depends(get_session),
 ):
-    remove_symbol_by_id(db, session, symbol_id)
+    await run_in_db(remove_symbol_by_id, db, session, symbol_id)
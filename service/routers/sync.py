@@ -0,0 +1,22 @@
+from db import get_db
+from fastapi import APIRouter, Depends, Query
+from models.rates import FxMode
+from models.sync import get_changes
+
+from routers.auth import get_session
+
+router = APIRouter()
+
+
+@router.get("/")
+async def api_sync(
+    since: int = Query(0, ge=0, description="Version returned by the previous sync, 0 for everything"),
+    fx: FxMode = Query(FxMode.LATEST, description="Rate used to convert transaction prices and commissions"),
+    db=Depends(get_db),
+    session=Depends(get_session),
+):
+    """
+    Returns the transactions, watchlist symbols and accounts created, updated or deleted after `since` together with
+    the version to send next time.
+    """
+    return await get_changes(db, session, since, fx)
@@ -1,26 +1,84 @@
-from db import get_db
-from fastapi import APIRouter, Body, Depends
-from models._limits import LimitAction, enforce_limit
+import os
+import uuid
+from datetime import date
+
+from db import get_db, run_in_db
+from etag import etag_headers, is_not_modified, not_modified
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from models._limits import LimitAction, UserLimits, enforce_limit
+from models.imports import ImportLayout, import_transactions
+from models.rates import FxMode
+from models.sync import get_etag
 from models.transactions import (
     Transaction,
+    TransactionFilter,
+    TransactionType,
     create_transaction,
-    get_transactions_by_user,
+    get_transactions_page,
     remove_transaction_by_id,
+    stream_transactions_by_user,
     update_stock_account,
     update_transaction,
 )
+from streaming import streaming_json
 
 from routers.auth import get_session
 
 router = APIRouter()
 
+TRANSACTIONS_PAGE_SIZE = int(os.getenv("TRANSACTIONS_PAGE_SIZE", "100"))  # used when no limit is given
+TRANSACTIONS_PAGE_MAX = int(os.getenv("TRANSACTIONS_PAGE_MAX", "1000"))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(5 * 1024 * 1024)))  # size of an uploaded CSV
+
 
 @router.get("/")
 async def api_get_transactions(
+    request: Request,
+    response: Response,
+    fx: FxMode = Query(FxMode.LATEST, description="Rate used to convert prices and commissions"),
+    limit: int | None = Query(None, ge=1, le=TRANSACTIONS_PAGE_MAX),
+    cursor: str | None = Query(None, description="X-Next-Cursor header of the previous page"),
+    full: bool = Query(False, description="Stream every transaction in one response, /export is meant for that"),
+    account_id: uuid.UUID | None = None,
+    symbol_id: uuid.UUID | None = None,
+    transaction_type: TransactionType | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
     db=Depends(get_db),
     session=Depends(get_session),
 ):
-    transactions = await get_transactions_by_user(db, session)
+    """
+    Lists a page of the user's transactions, newest first, the next page's cursor is sent in `X-Next-Cursor`.
+    `full` streams the whole history instead, filters and paging are ignored then.
+    """
+    etag = await get_etag(db, session, "transactions", request.url.query, quotes=True)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    if full:
+        return streaming_json(
+            ([t.to_dict() for t in batch] async for batch in stream_transactions_by_user(db, session, fx)),
+            headers=etag_headers(etag),
+        )
+
+    filters = TransactionFilter(
+        str(account_id) if account_id else None,
+        str(symbol_id) if symbol_id else None,
+        transaction_type,
+        date_from,
+        date_to,
+    )
+    transactions, next_cursor = await get_transactions_page(
+        db,
+        session,
+        filters,
+        limit or TRANSACTIONS_PAGE_SIZE,
+        cursor=cursor,
+        fx=fx,
+    )
+    response.headers.update(etag_headers(etag))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [t.to_dict() for t in transactions]
 
 
@@ -37,6 +95,40 @@ async def api_create_transaction(
     return transaction.to_dict()
 
 
+@router.post("/import")
+async def api_import_transactions(
+    request: Request,
+    layout: ImportLayout = Query(ImportLayout.GENERIC, description="Broker the CSV was exported from"),
+    account_id: str | None = None,
+    _=enforce_limit(LimitAction.CREATE_TRANSACTION),
+    db=Depends(get_db),
+    session=Depends(get_session),
+):
+    """
+    Imports the transactions of a CSV sent as the request body, all of them or none.
+    Invalid rows are reported by line in a 400.
+    """
+    content = await request.body()
+    if len(content) > IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"maximum {IMPORT_MAX_BYTES} bytes allowed per import")
+    try:
+        text = content.decode("utf-8")
+    except UnicodeDecodeError:
+        text = content.decode("latin-1")  # spreadsheet exports are often not UTF-8
+
+    limits = UserLimits(user=session.user)
+    imported = await import_transactions(
+        db,
+        session,
+        text,
+        layout,
+        account_id=account_id,
+        max_transactions=await run_in_db(limits.remaining, db, LimitAction.CREATE_TRANSACTION),
+        max_shares=await run_in_db(limits.remaining, db, LimitAction.ADD_SHARE),
+    )
+    return {"imported": imported}
+
+
 @router.put("/{transaction_id}")
 async def api_update_transaction(
     transaction_id: str,
@@ -60,7 +152,8 @@ async def api_update_transaction_account(
 ):
     from_account = transaction_data.get("from_account", None)
     to_account = transaction_data.get("to_account", None)
-    return await update_stock_account(db, session, ticker, from_account, to_account)
+    updated = await update_stock_account(db, session, ticker, from_account, to_account)
+    return updated
 
 
 @router.delete("/{transaction_id}")
@@ -69,4 +162,4 @@ async def api_remove_transaction(
     db=Depends(get_db),
     session=Depends(get_session),
 ):
-    remove_transaction_by_id(db, session, transaction_id)
+    await run_in_db(remove_transaction_by_id, db, session, transaction_id)
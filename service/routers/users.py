@@ -1,8 +1,12 @@
-from db import get_db
-from fastapi import APIRouter, Depends
+from datetime import date
+
+from db import get_db, run_in_db
+from etag import etag_headers, is_not_modified, not_modified
+from fastapi import APIRouter, Depends, Request, Response
 from models._limits import UserLimits
 from models.settings import UserSettings, get_user_settings, update_user_settings
 from models.subscriptions import get_active_subscription
+from models.sync import get_etag
 
 from routers.auth import get_session
 
@@ -11,12 +15,20 @@ router = APIRouter()
 
 @router.get("/settings")
 async def api_get_settings(
+    request: Request,
+    response: Response,
     db=Depends(get_db),
     session=Depends(get_session),
 ):
-    settings = get_user_settings(db, session.user.id)
+    # the subscription lives in Stripe and renews without writing to the database, so the ETag lasts a day at most
+    etag = await get_etag(db, session, "settings", date.today())
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    settings = await run_in_db(get_user_settings, db, session.user.id)
     settings.subscription = get_active_subscription(session.user.stripe_id)
     settings.limits = UserLimits.get_user_limits(session.user)
+    response.headers.update(etag_headers(etag))
     return settings.to_dict()
 
 
@@ -28,5 +40,5 @@ async def api_update_settings(
 ):
     settings_dict["user_id"] = session.user.id
     settings = UserSettings.from_dict(**settings_dict)
-    update_user_settings(db, settings)
+    await run_in_db(update_user_settings, db, settings)
     return settings.to_dict()
@@ -1,13 +1,17 @@
-from db import get_db
-from fastapi import APIRouter, Body, Depends
+from db import get_db, run_in_db
+from etag import etag_headers, is_not_modified, not_modified
+from fastapi import APIRouter, Body, Depends, Request
 from models._limits import LimitAction, enforce_limit
 from models.symbol import Symbol
+from models.sync import get_etag
 from models.watchlist import (
     create_watchlist_item,
-    get_watchlist_by_user,
     remove_watchlist_item,
+    stream_watchlist_by_user,
     update_watchlist_item,
+    update_watchlist_prices,
 )
+from streaming import streaming_json
 
 from routers.auth import get_session
 
@@ -16,11 +20,18 @@ router = APIRouter()
 
 @router.get("/")
 async def api_get_watchlist(
+    request: Request,
     db=Depends(get_db),
     session=Depends(get_session),
 ):
-    symbols = await get_watchlist_by_user(db, session)
-    return [s.to_dict() for s in symbols]
+    etag = await get_etag(db, session, "watchlist", quotes=True)
+    if is_not_modified(request, etag):
+        return not_modified(etag)
+
+    return streaming_json(
+        ([s.to_dict() for s in batch] async for batch in stream_watchlist_by_user(db, session)),
+        headers=etag_headers(etag),
+    )
 
 
 @router.post("/")
@@ -31,10 +42,20 @@ async def api_create_watchlist_item(
     session=Depends(get_session),
 ):
     symbol = Symbol.from_dict(**symbol_data)
-    watchlist = create_watchlist_item(db, session, symbol)
+    watchlist = await run_in_db(create_watchlist_item, db, session, symbol)
     return watchlist.to_dict()
 
 
+@router.put("/prices")
+async def api_update_watchlist_prices(
+    prices: list[dict] = Body(..., description="[{symbol_id, price}], a null price goes back to the quoted one"),
+    db=Depends(get_db),
+    session=Depends(get_session),
+):
+    symbols = await update_watchlist_prices(db, session, prices)
+    return [s.to_dict() for s in symbols]
+
+
 @router.put("/{symbol_id}")
 async def api_update_watchlist_item(
     symbol_id: str,
@@ -53,4 +74,4 @@ async def api_remove_watchlist_item(
     db=Depends(get_db),
     session=Depends(get_session),
 ):
-    remove_watchlist_item(db, session, symbol_id)
+    await run_in_db(remove_watchlist_item, db, session, symbol_id)
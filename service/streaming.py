@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+import zipfile
+from collections.abc import AsyncGenerator, AsyncIterable, Iterable, Sequence
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+
+async def json_array(batches: AsyncIterable[list[Any]]) -> AsyncGenerator[bytes]:
+    """
+    Encodes batches of items as a single JSON array, one chunk per batch.
+    """
+    yield b"["
+    separator = b""
+    async for batch in batches:
+        if not batch:
+            continue
+        chunk = ",".join(
+            json.dumps(jsonable_encoder(item), ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+            for item in batch
+        )
+        yield separator + chunk.encode()
+        separator = b","
+    yield b"]"
+
+
+def streaming_json(batches: AsyncIterable[list[Any]], headers: dict[str, str] | None = None) -> StreamingResponse:
+    """
+    Streams the items of every batch as a JSON array without building the whole response in memory.
+    """
+    return StreamingResponse(json_array(batches), media_type="application/json", headers=headers)
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime | date):
+        return value.isoformat()
+    return value
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime | date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+async def csv_lines(columns: Sequence[str], batches: AsyncIterable[list[Sequence[Any]]]) -> AsyncGenerator[bytes]:
+    """
+    Encodes batches of rows as CSV with a header line, one chunk per batch.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    async for batch in batches:
+        writer.writerows([_plain(v) for v in row] for row in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # only the header, nothing to export
+        yield buffer.getvalue().encode()
+
+
+async def ndjson_lines(columns: Sequence[str], batches: AsyncIterable[list[Sequence[Any]]]) -> AsyncGenerator[bytes]:
+    """
+    Encodes batches of rows as newline-delimited JSON objects keyed by `columns`, one chunk per batch.
+    """
+    async for batch in batches:
+        if not batch:
+            continue
+        lines = (
+            json.dumps(dict(zip(columns, row, strict=True)), default=_json_default, ensure_ascii=False) for row in batch
+        )
+        yield ("\n".join(lines) + "\n").encode()
+
+
+class _ZipSink(io.RawIOBase):
+    """
+    Unseekable file collecting what `zipfile` writes until it is drained, so archives can be streamed.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer.extend(data)
+        self._written += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._written
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+async def zip_files(files: Iterable[tuple[str, AsyncIterable[bytes]]]) -> AsyncGenerator[bytes]:
+    """
+    Streams a zip archive holding one deflated entry per (name, chunks) pair, entries are written one after another.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in files:
+            with archive.open(name, "w", force_zip64=True) as entry:
+                async for chunk in chunks:
+                    entry.write(chunk)
+                    if data := sink.drain():
+                        yield data
+            if data := sink.drain():  # the entry's data descriptor
+                yield data
+    yield sink.drain()  # central directory
+
+
+def streaming_download(chunks: AsyncIterable[bytes], media_type: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
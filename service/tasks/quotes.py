@@ -0,0 +1,125 @@
+import asyncio
+import os
+import random
+import zlib
+
+import psycopg2
+from clients.quotes import QuoteProvider, quote_engine
+from db import async_db_connection, fetchone, run_in_db
+from fastapi import HTTPException
+from log import logger
+from models.quote import create_quote_history_point, get_watched_tickers
+
+QUOTE_REFRESH_ENABLED = os.getenv("QUOTE_REFRESH_ENABLED", "True") == "True"
+QUOTE_REFRESH_INTERVAL = float(os.getenv("QUOTE_REFRESH_INTERVAL", "900"))  # seconds between refresh cycles
+QUOTE_REFRESH_CONCURRENCY = int(os.getenv("QUOTE_REFRESH_CONCURRENCY", "4"))  # parallel scrapes per cycle
+QUOTE_REFRESH_JITTER = float(os.getenv("QUOTE_REFRESH_JITTER", "60"))  # max random seconds added to each cycle
+
+# held for the whole cycle, scraping included, so a worker never picks tickers another one is still refreshing
+_ADVISORY_LOCK_KEY = zlib.crc32(b"richjet.quote_refresher")
+
+
+class QuoteRefresher:
+    """
+    Periodically refreshes the quotes of every watched symbol so requests can be served from the database.
+    """
+
+    def __init__(
+        self,
+        client: QuoteProvider,
+        interval: float = QUOTE_REFRESH_INTERVAL,
+        concurrency: int = QUOTE_REFRESH_CONCURRENCY,
+        jitter: float = QUOTE_REFRESH_JITTER,
+    ):
+        self.client = client
+        self.interval = interval
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self._task: asyncio.Task | None = None
+        self._revalidating: dict[str, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="quote-refresher")
+
+    async def stop(self) -> None:
+        tasks = [*self._revalidating.values(), *([self._task] if self._task else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    def revalidate(self, tickers: list[str]) -> None:
+        """
+        Refreshes the given tickers in the background, tickers already being refreshed are skipped.
+        """
+        for ticker in tickers:
+            if ticker in self._revalidating:
+                continue
+            task = asyncio.create_task(self._revalidate(ticker))
+            self._revalidating[ticker] = task
+            task.add_done_callback(lambda _, t=ticker: self._revalidating.pop(t, None))
+
+    async def _revalidate(self, ticker: str) -> bool:
+        async with self._semaphore:
+            return await self._refresh_ticker(ticker)
+
+    async def refresh(self) -> int:
+        """
+        Runs a single refresh cycle returning the number of quotes written, 0 when another worker is running one.
+        The lock's connection stays checked out, idle, until every ticker of the cycle is stored.
+        """
+        async with async_db_connection() as db:
+            locked = await run_in_db(fetchone, db, "SELECT pg_try_advisory_lock(%s)", (_ADVISORY_LOCK_KEY,))
+            await run_in_db(db.rollback)  # session-level lock, no need to sit idle in a transaction while scraping
+            if not locked or not locked[0]:
+                return 0
+            try:
+                tickers = await run_in_db(get_watched_tickers, db, self.interval)
+                await run_in_db(db.rollback)
+                semaphore = asyncio.Semaphore(self.concurrency)
+
+                async def _refresh(ticker: str) -> bool:
+                    async with semaphore:
+                        return await self._refresh_ticker(ticker)
+
+                results = await asyncio.gather(*(_refresh(t) for t in tickers))
+            finally:
+                await run_in_db(fetchone, db, "SELECT pg_advisory_unlock(%s)", (_ADVISORY_LOCK_KEY,))
+
+        refreshed = sum(results)
+        logger.info(f"quote refresher: {refreshed}/{len(tickers)} quotes refreshed")
+        return refreshed
+
+    async def _refresh_ticker(self, ticker: str) -> bool:
+        try:
+            quote = await self.client.fetch_quote(ticker)
+        except HTTPException as e:
+            logger.error(e.detail)
+            return False
+
+        if not quote.current or quote.current <= 0:
+            return False
+
+        try:
+            async with async_db_connection() as db:
+                await run_in_db(create_quote_history_point, db, quote)
+        except (HTTPException, psycopg2.Error) as e:
+            logger.error(f"quote refresher: failed to store quote for {ticker}: {e}")
+            return False
+        return True
+
+    async def _run(self) -> None:
+        await asyncio.sleep(random.uniform(0, self.jitter))  # avoid every worker waking up at the same time
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"quote refresher: {e}")
+            await asyncio.sleep(self.interval + random.uniform(0, self.jitter))
+
+
+quote_refresher = QuoteRefresher(quote_engine)
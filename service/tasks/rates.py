@@ -0,0 +1,59 @@
+"""
+One-off backfill of the rates tables of past trade dates, the daily snapshot only covers trades made after deployment.
+
+Fetches the table of every trade date in a foreign currency that has none from the provider's historical endpoint.
+Running workers load the rate history once, restart them afterwards.
+
+    PYTHONPATH=. python -m tasks.rates
+"""
+
+import argparse
+import asyncio
+
+import psycopg2
+from db import async_db_connection, close_pool, run_in_db
+from fastapi import HTTPException
+from http_client import http_clients
+from log import logger
+from models.rates import FX_BASE_CURRENCY, RateSnapshot, create_rates, fetch_rates, get_unrated_trade_dates
+
+
+async def backfill_rates(base: str = FX_BASE_CURRENCY, dry_run: bool = False) -> int:
+    """
+    Stores the missing rates tables of past trade dates returning how many were stored.
+    """
+    async with async_db_connection() as db:
+        days = await run_in_db(get_unrated_trade_dates, db, base)
+    logger.info(f"rates backfill: {len(days)} trade dates without rates")
+    if dry_run:
+        return 0
+
+    stored = 0
+    for day in days:
+        rates = await fetch_rates(base, day)
+        if not rates:
+            continue
+        try:
+            async with async_db_connection() as db:
+                await run_in_db(create_rates, db, RateSnapshot(base=base, date=day, rates=rates))
+        except (HTTPException, psycopg2.Error) as e:
+            logger.error(f"rates backfill: failed to store rates for {day}: {e}")
+            continue
+        stored += 1
+    logger.info(f"rates backfill: {stored}/{len(days)} rates tables stored")
+    return stored
+
+
+async def _main(dry_run: bool) -> None:
+    try:
+        await backfill_rates(dry_run=dry_run)
+    finally:
+        await http_clients.aclose()
+        close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="only count the trade dates without rates")
+    args = parser.parse_args()
+    asyncio.run(_main(args.dry_run))
@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+import psycopg2
+from db import get_db_url
+from log import logger
+from models.symbol import SYMBOL_CHANGES_CHANNEL, SymbolCatalog, symbol_catalog
+from psycopg2.extensions import connection as Connection
+
+SYMBOL_CATALOG_ENABLED = os.getenv("SYMBOL_CATALOG_ENABLED", "True") == "True"
+SYMBOL_CATALOG_RETRY_INTERVAL = float(os.getenv("SYMBOL_CATALOG_RETRY_INTERVAL", "10"))  # seconds between reconnects
+
+
+class SymbolCatalogListener:
+    """
+    Keeps the in-memory symbol catalog of this worker in sync through Postgres LISTEN/NOTIFY.
+
+    The catalog only caches while the listener is connected: notifications sent while it isn't are lost, so it's
+    cleared on every (re)connection.
+    """
+
+    def __init__(self, catalog: SymbolCatalog, retry_interval: float = SYMBOL_CATALOG_RETRY_INTERVAL):
+        self.catalog = catalog
+        self.retry_interval = retry_interval
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="symbol-catalog-listener")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self.catalog.disable()
+
+    @staticmethod
+    def _connect() -> Connection:
+        # keepalives turn a silently dropped connection into a read error instead of a catalog that's never invalidated
+        conn = psycopg2.connect(get_db_url(), keepalives=1, keepalives_idle=30, keepalives_interval=10)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {SYMBOL_CHANGES_CHANNEL}")
+        return conn
+
+    def _drain(self, conn: Connection) -> None:
+        conn.poll()
+        while conn.notifies:
+            self.catalog.notify(conn.notifies.pop(0).payload)
+
+    async def listen(self) -> None:
+        """
+        Listens until the connection is lost.
+        """
+        conn = await asyncio.to_thread(self._connect)
+        loop = asyncio.get_running_loop()
+        lost = loop.create_future()
+
+        def _on_readable() -> None:
+            try:
+                self._drain(conn)
+            except psycopg2.Error as e:
+                if not lost.done():
+                    lost.set_exception(e)
+
+        try:
+            self.catalog.enable()
+            loop.add_reader(conn.fileno(), _on_readable)
+            try:
+                await lost
+            finally:
+                loop.remove_reader(conn.fileno())
+        finally:
+            self.catalog.disable()
+            conn.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"symbol catalog listener: {e}")
+            await asyncio.sleep(self.retry_interval)
+
+
+symbol_catalog_listener = SymbolCatalogListener(symbol_catalog)
@@ -0,0 +1,50 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+from models._limits import require_admin
+from models.user import User
+from routers.auth import _verify_id_token
+
+
+@pytest.mark.asyncio
+async def test_id_token_is_checked_against_the_fetched_certificates():
+    certs = {"kid-1": "-----BEGIN CERTIFICATE-----"}
+    payload = {"iss": "https://accounts.google.com", "sub": "1"}
+
+    with (
+        patch("routers.auth._google_certs", new=AsyncMock(return_value=certs)),
+        patch("routers.auth.jwt.decode", return_value=payload) as mock_decode,
+    ):
+        assert await _verify_id_token("token") == payload
+
+    assert mock_decode.call_args.kwargs["certs"] == certs
+
+
+@pytest.mark.asyncio
+async def test_id_token_from_another_issuer_is_rejected():
+    with (
+        patch("routers.auth._google_certs", new=AsyncMock(return_value={})),
+        patch("routers.auth.jwt.decode", return_value={"iss": "evil.example.com"}),
+    ):
+        with pytest.raises(HTTPException) as e:
+            await _verify_id_token("token")
+
+    assert e.value.status_code == 400
+
+
+def _session(plan: str) -> MagicMock:
+    return MagicMock(user=User(email="a@example.com", given_name=None, family_name=None, picture=None, plan=plan))
+
+
+def test_admin_only_routes_reject_other_plans():
+    with pytest.raises(HTTPException) as e:
+        require_admin(_session("MAX"))
+
+    assert e.value.status_code == 403
+
+
+def test_admin_only_routes_accept_admins():
+    session = _session("ADMIN")
+
+    assert require_admin(session) is session
@@ -0,0 +1,200 @@
+import asyncio
+import pickle
+import sqlite3
+from unittest.mock import MagicMock, patch
+
+import pytest
+from cache import _MISSING, MemoryCache, PostgresCache, SqliteCache, cached, set_cache_backend
+from models.quote import StockQuote
+from models.symbol import Symbol
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    backend = MemoryCache() if request.param == "memory" else SqliteCache(str(tmp_path / "cache.sqlite3"))
+    set_cache_backend(backend)
+    yield backend
+    set_cache_backend(MemoryCache())
+
+
+@pytest.mark.asyncio
+async def test_cached_hits_and_misses(backend):
+    calls = []
+
+    @cached("test.hits", ttl=60)
+    async def double(x: int) -> int:
+        calls.append(x)
+        return x * 2
+
+    assert await double(2) == 4
+    assert await double(2) == 4
+    assert await double(3) == 6
+    assert calls == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_cached_expires(backend):
+    calls = []
+
+    @cached("test.ttl", ttl=0)
+    async def identity(x: int) -> int:
+        calls.append(x)
+        return x
+
+    await identity(1)
+    await identity(1)
+    assert calls == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_cached_maxsize(backend):
+    calls = []
+
+    @cached("test.maxsize", ttl=60, maxsize=2)
+    async def identity(x: int) -> int:
+        calls.append(x)
+        return x
+
+    for x in (1, 2, 3, 1):
+        await identity(x)
+    assert calls == [1, 2, 3, 1]
+
+
+@pytest.mark.asyncio
+async def test_cached_shares_inflight_calls(backend):
+    calls = []
+
+    @cached("test.inflight", ttl=60, key=lambda _, x: x)
+    async def slow(_, x: int) -> int:
+        calls.append(x)
+        await asyncio.sleep(0.01)
+        return x
+
+    assert await asyncio.gather(slow(None, 1), slow(None, 1)) == [1, 1]
+    assert calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_cancelling_a_caller_keeps_the_shared_call_running(backend):
+    calls = []
+
+    @cached("test.cancel", ttl=60)
+    async def slow(x: int) -> int:
+        calls.append(x)
+        await asyncio.sleep(0.02)
+        return x
+
+    first = asyncio.create_task(slow(1))
+    second = asyncio.create_task(slow(1))
+    await asyncio.sleep(0.005)
+    first.cancel()
+
+    assert await second == 1
+    assert first.cancelled()
+    assert await slow(1) == 1
+    assert calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_cached_does_not_cache_errors(backend):
+    calls = []
+
+    @cached("test.errors", ttl=60)
+    async def failing(x: int) -> int:
+        calls.append(x)
+        raise ValueError(x)
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            await failing(1)
+    assert calls == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_cached_invalidate(backend):
+    calls = []
+
+    @cached("test.invalidate", ttl=60, key=lambda x: x)
+    async def identity(x: int) -> int:
+        calls.append(x)
+        return x
+
+    await identity(1)
+    await identity(2)
+    await identity.cache_invalidate(1)
+    await identity(1)
+    await identity(2)
+    assert calls == [1, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_cached_invalidate_while_inflight(backend):
+    calls = []
+    started, release = asyncio.Event(), asyncio.Event()
+
+    @cached("test.invalidate_inflight", ttl=60)
+    async def slow(x: int) -> int:
+        calls.append(x)
+        started.set()
+        await release.wait()
+        return x
+
+    task = asyncio.create_task(slow(1))
+    await started.wait()
+    await slow.cache_invalidate(1)
+    release.set()
+    await task
+
+    await slow(1)  # the result computed before the invalidation was not stored
+    assert calls == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_shared_backends_store_json_not_pickles(tmp_path):
+    backend = SqliteCache(str(tmp_path / "cache.sqlite3"))
+    symbol = Symbol(ticker="AAPL", display_name="Apple", name="Apple", source="google", currency="USD", price=1.5)
+    value = {"symbols": [symbol], "quote": StockQuote(ticker="AAPL", current=1.5, currency="USD"), "n": None}
+
+    await backend.set("ns", "key", value, 60, 10)
+    with sqlite3.connect(backend.path) as conn:
+        (stored,) = conn.execute("SELECT value FROM cache_entries").fetchone()
+
+    assert stored.startswith(b"{")
+    cached_value = await backend.get("ns", "key")
+    assert cached_value == value and cached_value["symbols"][0].price == 1.5
+    assert isinstance(cached_value["quote"], StockQuote)
+
+    with pytest.raises(TypeError):
+        await backend.set("ns", "other", object(), 60, 10)
+
+
+@pytest.mark.asyncio
+async def test_shared_backends_never_unpickle(tmp_path):
+    backend = SqliteCache(str(tmp_path / "cache.sqlite3"))
+    await backend.set("ns", "key", 1, 60, 10)
+    with sqlite3.connect(backend.path) as conn:
+        conn.execute("UPDATE cache_entries SET value = ?", (pickle.dumps(Symbol),))
+
+    with pytest.raises(ValueError):
+        await backend.get("ns", "key")
+
+
+@pytest.mark.asyncio
+async def test_postgres_cache_uses_its_own_pool():
+    backend = PostgresCache(pool_size=2)
+    conn = MagicMock()
+    conn.cursor.return_value.__enter__.return_value.fetchone.return_value = None
+
+    with (
+        patch("cache.ConnectionPool") as mock_pool,
+        patch("db.get_pool", side_effect=AssertionError("the request pool must not be used")),
+    ):
+        mock_pool.return_value.getconn.return_value = conn
+        assert await backend.get("ns", "key") is _MISSING
+        await backend.delete("ns", "key")
+        backend.close()
+
+    mock_pool.assert_called_once()
+    assert mock_pool.call_args.kwargs["max_size"] == 2
+    assert mock_pool.return_value.putconn.call_count == 2
+    mock_pool.return_value.close.assert_called_once()
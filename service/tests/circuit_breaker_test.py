@@ -0,0 +1,78 @@
+import httpx
+import pytest
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from fastapi import HTTPException
+
+
+class Remote:
+    def __init__(self):
+        self.calls = 0
+        self.error: Exception | None = None
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return "ok"
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_consecutive_failures():
+    remote, breaker = Remote(), CircuitBreaker("test.open", failure_threshold=2, reset_timeout=60)
+    remote.error = httpx.ConnectTimeout("timeout")
+
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectTimeout):
+            await breaker.call(remote)
+    assert breaker.state == OPEN
+
+    with pytest.raises(HTTPException) as e:
+        await breaker.call(remote)
+    assert e.value.status_code == 503
+    assert remote.calls == 2
+    assert breaker.to_dict()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_ignores_client_errors():
+    remote, breaker = Remote(), CircuitBreaker("test.client_errors", failure_threshold=1)
+    remote.error = HTTPException(status_code=404, detail="not found")
+
+    with pytest.raises(HTTPException):
+        await breaker.call(remote)
+    assert breaker.state == CLOSED
+
+    remote.error = HTTPException(status_code=503, detail="unavailable")
+    with pytest.raises(HTTPException):
+        await breaker.call(remote)
+    assert breaker.state == OPEN
+
+
+@pytest.mark.asyncio
+async def test_circuit_probe_closes_or_reopens():
+    remote, breaker = Remote(), CircuitBreaker("test.probe", failure_threshold=1, reset_timeout=0)
+    remote.error = httpx.ConnectError("refused")
+
+    with pytest.raises(httpx.ConnectError):
+        await breaker.call(remote)
+    assert breaker.state == OPEN
+
+    with pytest.raises(httpx.ConnectError):  # the probe fails and the circuit opens again
+        await breaker.call(remote)
+    assert breaker.state == OPEN
+
+    remote.error = None
+    assert await breaker.call(remote) == "ok"
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_circuit_lets_a_single_probe_through():
+    breaker = CircuitBreaker("test.single_probe", failure_threshold=1, reset_timeout=0)
+    breaker._record_failure()
+    breaker._acquire()
+    assert breaker.state == HALF_OPEN
+
+    with pytest.raises(HTTPException):
+        breaker._acquire()
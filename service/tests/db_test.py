@@ -0,0 +1,44 @@
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+from db import ConnectionPool
+from fastapi import HTTPException
+
+
+def _connection() -> MagicMock:
+    conn = MagicMock(closed=0)
+    conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    return conn
+
+
+def test_lifetime_counts_from_when_a_connection_is_opened():
+    with (
+        patch("psycopg2.pool.psycopg2.connect", side_effect=lambda *a, **k: _connection()),
+        patch("db.time.monotonic", return_value=0.0) as monotonic,
+    ):
+        pool = ConnectionPool("postgresql://db", min_size=1, max_size=1, max_lifetime=10)
+        preopened = pool._pool._pool[0]
+
+        monotonic.return_value = 11.0  # checked out for the first time after its lifetime
+        conn = pool.getconn()
+
+    assert conn is not preopened
+    preopened.close.assert_called_once()
+
+
+def test_unreachable_database_is_a_503():
+    error = psycopg2.OperationalError("could not connect to server")
+    with patch("psycopg2.pool.psycopg2.connect", side_effect=error):
+        with pytest.raises(HTTPException) as e:
+            ConnectionPool("postgresql://db", min_size=1, max_size=1)
+        assert e.value.status_code == 503
+
+        pool = ConnectionPool("postgresql://db", min_size=0, max_size=1, timeout=0.01)
+        with pytest.raises(HTTPException) as e:
+            pool.getconn()
+        assert e.value.status_code == 503
+
+        with pytest.raises(HTTPException) as e:
+            pool.getconn()  # the slot of the failed attempt was released
+        assert e.value.status_code == 503 and e.value.detail == "database is unavailable, try again later"
@@ -0,0 +1,69 @@
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from etag import is_not_modified, make_etag, not_modified
+from models.rates import RateSnapshot
+from models.session import Session
+from models.sync import get_etag
+
+session = Session(session_id="sess-1", user="u1", currency="EUR", tokens={}, expires=1700000000.0)
+
+
+def _request(if_none_match: str | None):
+    request = MagicMock()
+    request.headers = {"if-none-match": if_none_match} if if_none_match is not None else {}
+    return request
+
+
+def test_make_etag_is_strong_and_stable():
+    etag = make_etag(12, "EUR", None)
+
+    assert etag == make_etag(12, "EUR", None)
+    assert etag != make_etag(13, "EUR", None)
+    assert etag.startswith('"') and etag.endswith('"')
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"xyz", "abc"', True),
+        ('"xyz"', False),
+        ("*", True),
+    ],
+)
+def test_is_not_modified(header, expected):
+    assert is_not_modified(_request(header), '"abc"') is expected
+
+
+def test_not_modified_has_no_body():
+    response = not_modified('"abc"')
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == '"abc"'
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+@pytest.mark.asyncio
+async def test_etag_changes_with_version_rates_and_parts():
+    snapshot = RateSnapshot(base="USD", date=date(2024, 1, 2), rates={})
+    with (
+        patch("models.sync.get_rate_snapshot", new=AsyncMock(return_value=snapshot)),
+        patch("models.sync.get_user_stamp", return_value="7:None") as mock_stamp,
+    ):
+        etag = await get_etag(MagicMock(), session, "transactions", "fx=latest", quotes=True)
+        assert etag == await get_etag(MagicMock(), session, "transactions", "fx=latest", quotes=True)
+        assert etag != await get_etag(MagicMock(), session, "transactions", "fx=trade_date", quotes=True)
+
+        mock_stamp.return_value = "8:None"
+        assert etag != await get_etag(MagicMock(), session, "transactions", "fx=latest", quotes=True)
+
+        mock_stamp.return_value = "7:None"
+        snapshot.date = date(2024, 1, 3)
+        assert etag != await get_etag(MagicMock(), session, "transactions", "fx=latest", quotes=True)
+
+    assert mock_stamp.call_args.args[1:] == ("u1", True)
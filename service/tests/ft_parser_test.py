@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import pytest
+from clients.ft import FTClient
+from clients.ft_parser import QuoteResult, parse_quote_page
+
+FIXTURES = Path(__file__).parent / "fixtures" / "ft"
+
+
+def _load(name: str) -> bytes:
+    return (FIXTURES / name).read_bytes()
+
+
+@pytest.mark.parametrize(
+    "page, expected",
+    [
+        ("quote_aapl.html", QuoteResult(price_label="Price (USD)", price="189.84", previous_close="187.50")),
+        ("quote_vod.html", QuoteResult(price_label="Price (GBX)", price="1,072.40", previous_close="1,076.00")),
+        ("quote_not_found.html", QuoteResult(price_label="", price="", previous_close="")),
+    ],
+)
+def test_parse_quote_page(page, expected):
+    assert parse_quote_page(_load(page)) == expected
+
+
+@pytest.mark.parametrize(
+    "symbol, expected",
+    [
+        ("AAPL:NASDAQ", "https://markets.ft.com/data/equities/tearsheet/summary?s=AAPL:NSQ"),
+        ("vod:lon", "https://markets.ft.com/data/equities/tearsheet/summary?s=VOD:LSE"),
+        ("IE00BD0NCM55:EUR", "https://markets.ft.com/data/funds/tearsheet/summary?s=IE00BD0NCM55:EUR"),
+        ("AAPL", None),
+        ("AAPL:BMV", None),
+    ],
+)
+def test_tearsheet_url(symbol, expected):
+    assert FTClient.tearsheet_url(symbol) == expected
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import pytest
+from clients.google_parser import QuoteResult, SearchResult, parse_quote_page, parse_search_page
+
+FIXTURES = Path(__file__).parent / "fixtures" / "google"
+
+UP = "M4 12l1.41 1.41L11 7.83V20h2V7.83l5.58 5.59L20 12l-8-8-8 8z"
+DOWN = "M20 12l-1.41-1.41L13 16.17V4h-2v12.17l-5.58-5.59L4 12l8 8 8-8z"
+
+
+def _load(name: str) -> bytes:
+    return (FIXTURES / name).read_bytes()
+
+
+@pytest.mark.parametrize(
+    "page, expected",
+    [
+        (
+            "search_apple.html",
+            [
+                SearchResult("./quote/AAPL:NASDAQ", "Apple Inc", "$189.84", "1.25%", UP),
+                SearchResult("./quote/APC:ETR", "Apple Inc", "€175.20", "0.48%", DOWN),
+                SearchResult("./quote/AAPL:BMV", "Apple Inc", "MX$3,250.00", "0.10%", UP),
+            ],
+        ),
+        (
+            "search_isin.html",
+            [
+                SearchResult(
+                    "./quote/IWDA:LON",
+                    "iShares Core MSCI World UCITS ETF USD (Acc)",
+                    "£88.41",
+                    "0.32%",
+                    DOWN,
+                ),
+            ],
+        ),
+        ("search_empty.html", []),
+    ],
+)
+def test_parse_search_page(page, expected):
+    results = parse_search_page(_load(page))
+    assert results == expected
+    assert [r.ticker for r in results] == [e.href.split("/")[-1] for e in expected]
+
+
+@pytest.mark.parametrize(
+    "page, expected",
+    [
+        ("quote_aapl.html", QuoteResult(price="$189.84", previous_close="$187.50")),
+        ("quote_sap.html", QuoteResult(price="€231.15", previous_close="€229.90")),
+        ("quote_consent.html", QuoteResult(price="", previous_close="")),
+    ],
+)
+def test_parse_quote_page(page, expected):
+    assert parse_quote_page(_load(page)) == expected
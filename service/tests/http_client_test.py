@@ -0,0 +1,63 @@
+import httpx
+import pytest
+from http_client import HttpClients
+
+URL = "https://example.com/quote"
+
+
+def _clients(*outcomes, **kwargs) -> tuple[HttpClients, list[httpx.Request]]:
+    """
+    Registry whose example.com client answers with each outcome in turn, a status code or an exception to raise.
+    """
+    sent = []
+    outcomes_left = list(outcomes)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        outcome = outcomes_left.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome)
+
+    clients = HttpClients(retry_backoff=0, **kwargs)
+    clients._clients["example.com"] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return clients, sent
+
+
+@pytest.mark.asyncio
+async def test_retries_gateway_errors_and_connection_errors():
+    clients, sent = _clients(503, httpx.ConnectError("refused"), 200)
+
+    response = await clients.get(URL)
+
+    assert response.status_code == 200
+    assert len(sent) == 3
+    assert clients.metrics()["example.com"]["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_never_retries_timeouts_or_throttling():
+    clients, sent = _clients(httpx.ReadTimeout("slow"))
+    with pytest.raises(httpx.TimeoutException):
+        await clients.get(URL)
+    assert len(sent) == 1
+
+    clients, sent = _clients(429)
+    assert (await clients.get(URL)).status_code == 429
+    assert len(sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_retries_can_be_disabled_per_call():
+    clients, sent = _clients(503)
+
+    assert (await clients.get(URL, retries=0)).status_code == 503
+    assert len(sent) == 1
+
+
+@pytest.mark.asyncio
+async def test_retries_stop_at_the_request_deadline():
+    clients, sent = _clients(503, 503, 200, max_request_time=0)
+
+    assert (await clients.get(URL)).status_code == 503
+    assert len(sent) == 1
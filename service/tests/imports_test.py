@@ -0,0 +1,176 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+from models.imports import ImportLayout, _copy_transactions, import_transactions, parse_csv
+from models.positions import Position
+from models.session import Session
+from models.transactions import TransactionType
+
+session = Session(session_id="sess-1", user="u1", currency="EUR", tokens={}, expires=1700000000.0)
+
+GENERIC = """date,type,ticker,isin,quantity,price,commission,currency
+2024-01-02,buy,AAPL,,10,150.5,1,USD
+2024-02-01,SELL,,US0378331005,"1.234,5",160,,usd
+2024-03-01,dividend_cash,AAPL,,0,12.3,0,USD
+"""
+
+DEGIRO = """Date,Time,Product,ISIN,Reference exchange,Venue,Quantity,Price,,Local value,,Value,,Exchange rate,\
+Transaction and/or third party fees,,Total,,Order ID
+15-03-2024,10:31,APPLE INC,US0378331005,NDQ,XNAS,-5,"172,50",USD,"-862,50",USD,"795,00",EUR,"1,0850","-2,00",EUR,\
+"793,00",EUR,abc
+"""
+
+IBKR = """Symbol,ISIN,CurrencyPrimary,TradeDate,Quantity,TradePrice,IBCommission,Buy/Sell
+MSFT,US5949181045,USD,20240105,3,370.1,-1.0,BUY
+"""
+
+
+def test_parse_generic():
+    rows, errors = parse_csv(GENERIC)
+
+    assert errors == []
+    assert [r.line for r in rows] == [2, 3, 4]
+    assert rows[0].transaction_type == TransactionType.BUY
+    assert (rows[0].ticker, rows[0].quantity, rows[0].price, rows[0].commission) == ("AAPL", 10, 150.5, 1)
+    assert rows[1].isin == "US0378331005"
+    assert (rows[1].quantity, rows[1].commission, rows[1].currency) == (1234.5, 0.0, "USD")
+    assert rows[2].transaction_type == TransactionType.DIVIDEND_CASH
+
+
+def test_parse_degiro():
+    rows, errors = parse_csv(DEGIRO, ImportLayout.DEGIRO)
+
+    assert errors == []
+    row = rows[0]
+    assert row.transaction_type == TransactionType.SELL
+    assert (row.quantity, row.price, row.currency) == (5, 172.5, "USD")
+    assert row.commission == pytest.approx(2.17)
+    assert row.date == datetime(2024, 3, 15, 10, 31)
+
+
+def test_parse_ibkr():
+    rows, errors = parse_csv(IBKR, ImportLayout.IBKR)
+
+    assert errors == []
+    assert (rows[0].ticker, rows[0].quantity, rows[0].commission) == ("MSFT", 3, 1.0)
+    assert rows[0].date == datetime(2024, 1, 5)
+
+
+def test_parse_reports_errors_by_line():
+    content = """date,type,ticker,quantity,price,currency
+2024-01-02,BUY,AAPL,10,150,USD
+not-a-date,BUY,AAPL,10,150,USD
+2024-01-02,SWAP,AAPL,10,150,USD
+2024-01-02,BUY,,10,150,USD
+
+2024-01-02,BUY,AAPL,0,150,USD
+2024-01-02,BUY,AAPL,10
+"""
+    rows, errors = parse_csv(content)
+
+    assert [r.line for r in rows] == [2]
+    assert [e["row"] for e in errors] == [3, 4, 5, 7, 8]
+
+
+def test_parse_missing_columns():
+    rows, errors = parse_csv("date,ticker\n2024-01-02,AAPL\n")
+
+    assert rows == []
+    assert errors == [{"row": 1, "error": "missing columns for the generic layout: type, quantity, price, currency"}]
+
+
+async def _inline(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+def _fake_db(symbols: dict, positions: list[Position]):
+    async def run_in_db(func, *args, **kwargs):
+        if func.__name__ == "_resolve_symbols":
+            return symbols
+        if func.__name__ == "get_positions":
+            return positions
+        return None
+
+    return run_in_db
+
+
+@pytest.mark.asyncio
+async def test_import_replays_positions_in_trade_order():
+    content = """date,type,ticker,quantity,price,currency
+2024-02-01,SELL,AAPL,12,160,USD
+2024-01-01,BUY,AAPL,10,150,USD
+"""
+    positions = [Position(user_id="u1", symbol_id="sym-1", quantity=5, first_buy_id="tx-1")]
+    with (
+        patch("models.imports.run_in_process", new=_inline),
+        patch("models.imports.run_in_db") as mock_run,
+    ):
+        mock_run.side_effect = _fake_db({"AAPL": ("sym-1", True)}, positions)
+        imported = await import_transactions(MagicMock(), session, content)
+
+    assert imported == 2
+    copy = mock_run.call_args_list[-1]
+    assert copy.args[0] is _copy_transactions
+    assert [r.line for r in copy.args[4]] == [3, 2]
+    assert copy.args[5] == set()
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_the_whole_batch():
+    content = """date,type,ticker,quantity,price,currency
+2024-01-01,BUY,AAPL,10,150,USD
+2024-02-01,SELL,AAPL,12,160,USD
+2024-02-01,DIVIDEND-CASH,MSFT,0,10,USD
+2024-02-01,BUY,NOPE,1,10,USD
+"""
+    with (
+        patch("models.imports.run_in_process", new=_inline),
+        patch("models.imports.run_in_db") as mock_run,
+    ):
+        mock_run.side_effect = _fake_db({"AAPL": ("sym-1", True), "MSFT": ("sym-2", False)}, [])
+        with pytest.raises(HTTPException) as e:
+            await import_transactions(MagicMock(), session, content)
+
+    assert e.value.status_code == 400
+    assert [err["row"] for err in e.value.detail] == [3, 4, 5]
+    assert all(call.args[0] is not _copy_transactions for call in mock_run.call_args_list)
+
+
+@pytest.mark.asyncio
+async def test_import_enforces_plan_limits():
+    content = """date,type,ticker,quantity,price,currency
+2024-01-01,BUY,AAPL,10,150,USD
+2024-01-02,BUY,MSFT,10,150,USD
+"""
+    with (
+        patch("models.imports.run_in_process", new=_inline),
+        patch("models.imports.run_in_db") as mock_run,
+    ):
+        mock_run.side_effect = _fake_db({"AAPL": ("sym-1", True), "MSFT": ("sym-2", False)}, [])
+        with pytest.raises(HTTPException) as e:
+            await import_transactions(MagicMock(), session, content, max_transactions=5, max_shares=0)
+
+    assert [err["error"] for err in e.value.detail] == ["Add share limit reached. Upgrade your plan."]
+
+
+def test_copy_transactions_loads_through_staging():
+    rows, _ = parse_csv(GENERIC)
+    for row in rows:
+        row.symbol_id = "sym-1"
+    db = MagicMock()
+    cursor = db.cursor.return_value.__enter__.return_value
+
+    with patch("models.imports.refresh_positions") as mock_refresh:
+        _copy_transactions(db, "u1", None, rows, {"sym-1"})
+
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert statements[0].startswith("CREATE TEMP TABLE transactions_import")
+    assert statements[1].startswith("INSERT INTO transactions")
+    assert statements[2].startswith("INSERT INTO watchlist")
+    copied = cursor.copy_expert.call_args.args[1].getvalue().splitlines()
+    assert len(copied) == 3
+    assert copied[0].startswith("u1,sym-1,,10.0,150.5,1.0,USD,BUY,2024-01-02")
+    mock_refresh.assert_called_once_with(db, "u1", {(None, "sym-1")})
+    db.commit.assert_called_once()
@@ -0,0 +1,93 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from models.portfolio import LotQueue, _get_portfolio, build_portfolio, get_portfolio
+from models.session import Session
+from models.symbol import Symbol
+from models.transactions import Transaction, TransactionType
+
+
+def _symbol(symbol_id: str, price: float) -> Symbol:
+    return Symbol(
+        id=symbol_id,
+        ticker=symbol_id.upper(),
+        name=symbol_id,
+        display_name=symbol_id,
+        currency="USD",
+        source="manual",
+        price=price,
+    )
+
+
+def _transaction(symbol: Symbol, ttype: TransactionType, quantity: float, price: float, commission: float = 0):
+    return Transaction(
+        user_id="u1",
+        symbol_id=symbol.id,
+        symbol=symbol,
+        quantity=quantity,
+        price=price,
+        commission=commission,
+        currency="USD",
+        transaction_type=ttype,
+        date="2024-01-01",
+    )
+
+
+def test_lot_queue_fifo():
+    queue = LotQueue()
+    queue.push(2, 10)
+    queue.push(3, 20)
+
+    assert queue.consume(3) == (40, 0)  # 2 @ 10 + 1 @ 20
+    assert queue.consume(5) == (40, 3)  # 2 @ 20, 3 unmatched
+    assert queue.head == 2
+
+
+def test_build_portfolio():
+    aaa, bbb = _symbol("aaa", 30), _symbol("bbb", 5)
+    transactions = [  # newest first, as returned by get_transactions_by_user
+        _transaction(bbb, TransactionType.DIVIDEND_CASH, 0, 4),
+        _transaction(bbb, TransactionType.SELL, 1, 6),
+        _transaction(bbb, TransactionType.BUY, 1, 5),
+        _transaction(aaa, TransactionType.DIVIDEND, 1, 0),
+        _transaction(aaa, TransactionType.SELL, 3, 25, commission=1),
+        _transaction(aaa, TransactionType.BUY, 3, 20),
+        _transaction(aaa, TransactionType.BUY, 2, 10, commission=1),
+    ]
+
+    portfolio = build_portfolio(transactions)
+    item_a, item_b = portfolio.items
+
+    assert item_a.symbol.id == "aaa"
+    assert item_a.quantity == 3
+    assert item_a.current_invested == pytest.approx(40)  # 2 @ 20 left plus a free dividend share
+    assert item_a.total_invested == pytest.approx(80)
+    assert item_a.realized == pytest.approx(35)  # sold 3 @ 25 with a cost basis of 2 @ 10 + 1 @ 20
+    assert item_a.unrealized == pytest.approx(50)
+    assert item_a.commission == 2
+
+    assert item_b.quantity == 0  # closed positions go last
+    assert item_b.realized == pytest.approx(1)
+
+    assert portfolio.cash_dividends == 4
+    assert portfolio.total_invested == pytest.approx(42)
+    assert portfolio.current_value == pytest.approx(90)
+    assert portfolio.closed_positions == pytest.approx(34)
+    assert portfolio.rentability == pytest.approx((90 + 34 + 4 - 42) / 42 * 100)
+
+
+@pytest.mark.asyncio
+async def test_portfolio_cache_is_keyed_on_the_user_version():
+    session = Session(session_id="sess-1", user="u1", currency="EUR", tokens={}, expires=1700000000.0)
+    await _get_portfolio.cache_clear()
+
+    with (
+        patch("models.portfolio.get_user_version", side_effect=[1, 1, 2]),
+        patch("models.portfolio.get_transactions_by_user", new=AsyncMock(return_value=[])) as mock_transactions,
+    ):
+        for _ in range(3):
+            await get_portfolio(MagicMock(), session)
+
+    # a write on another worker bumps the version, so its stale entry is never served
+    assert mock_transactions.await_count == 2
+    await _get_portfolio.cache_clear()
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from clients.quotes import QuoteEngine
+from fastapi import HTTPException
+from models.quote import StockQuote
+
+
+class StubProvider:
+    def __init__(self, name: str, price: float | None = 10.0, delay: float = 0.0, error: Exception | None = None):
+        self.NAME = name
+        self.price = price
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.retries = []
+
+    async def fetch_quote(self, symbol: str, retries: int | None = None) -> StockQuote:
+        self.calls += 1
+        self.retries.append(retries)
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return StockQuote(ticker=symbol, current=self.price, currency="USD")
+
+
+@pytest.mark.asyncio
+async def test_engine_returns_primary_quote():
+    primary, secondary = StubProvider("primary", price=1.0), StubProvider("secondary", price=2.0)
+    engine = QuoteEngine([primary, secondary], default_delay=0.5)
+
+    quote = await engine.fetch_quote("TST")
+    assert quote.current == 1.0
+    assert (primary.calls, secondary.calls) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_engine_hedges_slow_primary():
+    primary, secondary = StubProvider("primary", price=1.0, delay=1), StubProvider("secondary", price=2.0)
+    engine = QuoteEngine([primary, secondary], default_delay=0.01)
+
+    quote = await engine.fetch_quote("TST")
+    assert quote.current == 2.0
+    assert (primary.calls, secondary.calls) == (1, 1)
+    assert secondary.retries == [0]  # the slow request is still running, the hedge doesn't retry on top of it
+
+
+@pytest.mark.asyncio
+async def test_engine_never_hedges_a_provider_against_itself():
+    provider = StubProvider("only", delay=0.05)
+    engine = QuoteEngine([provider], default_delay=0.01)
+
+    await engine.fetch_quote("TST")
+    assert provider.calls == 1
+
+    provider.error = HTTPException(status_code=500, detail="down")
+    with pytest.raises(HTTPException):
+        await engine.fetch_quote("TST")
+    assert provider.calls == 2
+
+    with pytest.raises(ValueError):
+        engine.register(StubProvider("only"))
+
+
+@pytest.mark.asyncio
+async def test_engine_falls_back_on_failure():
+    failing = StubProvider("failing", error=HTTPException(status_code=500, detail="down"))
+    invalid = StubProvider("invalid", price=0.0)
+    working = StubProvider("working", price=3.0)
+    engine = QuoteEngine([failing, invalid, working], default_delay=1)
+
+    quote = await engine.fetch_quote("TST")
+    assert quote.current == 3.0
+
+    health = engine.health()
+    assert health["failing"]["failures"] == 1
+    assert health["invalid"]["failures"] == 1
+    assert health["working"]["successes"] == 1
+    assert [p.NAME for p in engine.ranked()] == ["working", "failing", "invalid"]
+
+
+@pytest.mark.asyncio
+async def test_engine_raises_when_every_provider_fails():
+    engine = QuoteEngine([StubProvider("a", error=RuntimeError("boom")), StubProvider("b", price=None)])
+
+    with pytest.raises(HTTPException):
+        await engine.fetch_quote("TST")
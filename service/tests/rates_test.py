@@ -0,0 +1,188 @@
+import contextlib
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from models import rates
+from models.rates import RateHistory, RateSnapshot, RateTable, get_rate_snapshot
+from models.session import Session
+from tasks.rates import backfill_rates
+
+session = Session(session_id="sess-1", user="u1", currency="EUR", tokens={}, expires=1700000000.0)
+
+
+@pytest.fixture(autouse=True)
+def reset_snapshot():
+    rates._snapshot = None
+    rates._retry_at = 0.0
+    yield
+    rates._snapshot = None
+    rates._retry_at = 0.0
+
+
+@pytest.fixture
+def db():
+    @contextlib.asynccontextmanager
+    async def connection():
+        yield MagicMock()
+
+    with patch("models.rates.async_db_connection", new=connection):
+        yield
+
+
+def test_snapshot_triangulates_from_base():
+    snapshot = RateSnapshot(base="USD", date=date.today(), rates={"EUR": 0.5, "GBP": 0.25})
+
+    assert snapshot.rate("USD", "EUR") == 0.5
+    assert snapshot.rate("EUR", "USD") == 2.0
+    assert snapshot.rate("GBP", "EUR") == 2.0
+    assert snapshot.rate("EUR", "EUR") == 1.0
+    assert snapshot.rate("JPY", "EUR") is None
+
+
+@pytest.mark.asyncio
+async def test_rate_table_uses_a_single_snapshot():
+    snapshot = RateSnapshot(base="USD", date=date.today(), rates={"EUR": 0.5, "GBP": 0.25})
+    with patch("models.rates.get_rate_snapshot", new=AsyncMock(return_value=snapshot)) as m:
+        table = await RateTable.load(session, ["USD", "usd", "GBP", "EUR", None, "JPY"])
+
+    assert m.await_count == 1
+    assert table.rates == {"USD": 0.5, "GBP": 2.0, "JPY": None}
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_fetched_and_stored_once_a_day(db):
+    fetch = AsyncMock(return_value={"EUR": 0.5})
+    with (
+        patch("models.rates.get_latest_rates", return_value=None),
+        patch("models.rates.create_rates") as create,
+        patch("models.rates.fetch_rates", new=fetch),
+    ):
+        first = await get_rate_snapshot()
+        second = await get_rate_snapshot()
+
+    assert first is second
+    assert first.date == date.today()
+    assert fetch.await_count == 1
+    create.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_snapshot_served_from_store_without_fetching(db):
+    stored = RateSnapshot(base="USD", date=date.today(), rates={"EUR": 0.5})
+    fetch = AsyncMock()
+    with patch("models.rates.get_latest_rates", return_value=stored), patch("models.rates.fetch_rates", new=fetch):
+        assert await get_rate_snapshot() is stored
+    fetch.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_last_known_good_snapshot_on_failure(db):
+    stored = RateSnapshot(base="USD", date=date.today() - timedelta(days=3), rates={"EUR": 0.5})
+    fetch = AsyncMock(return_value=None)
+    with patch("models.rates.get_latest_rates", return_value=stored), patch("models.rates.fetch_rates", new=fetch):
+        assert await get_rate_snapshot() is stored
+        assert await get_rate_snapshot() is stored  # no retry until FX_RETRY_INTERVAL has elapsed
+    assert fetch.await_count == 1
+
+
+def test_rate_table_convert_column():
+    table = RateTable("EUR", {"USD": 0.5})
+
+    converted = table.convert_column(
+        [10, Decimal("4"), None, 0, 3, 7],
+        ["USD", "usd", "USD", "USD", "EUR", None],
+    )
+    assert converted == [5.0, 2.0, None, 0.0, 3.0, 7.0]
+    assert table.convert(8, "USD") == 4.0
+
+
+def test_rate_table_never_converts_a_currency_missing_from_the_snapshot():
+    table = RateTable("EUR", {"USD": 0.5, "JPY": None})
+
+    assert table.convert_column([10, 10, 10], ["USD", "JPY", "CHF"]) == [5.0, None, None]
+    assert table.has_rate("USD") and table.has_rate("EUR") and table.has_rate(None)
+    assert not table.has_rate("jpy") and not table.has_rate("CHF")
+
+
+@pytest.mark.asyncio
+async def test_convert_to_currency_keeps_the_source_currency_without_a_rate():
+    snapshot = RateSnapshot(base="USD", date=date.today(), rates={"EUR": 0.5})
+    with patch("models.rates.get_rate_snapshot", new=AsyncMock(return_value=snapshot)):
+        assert await rates.convert_to_currency(session, 10, "USD") == (5.0, "EUR")
+        assert await rates.convert_to_currency(session, 10, "jpy") == (10, "JPY")
+
+    with patch("models.rates.get_rate_snapshot", new=AsyncMock(return_value=None)):
+        assert await rates.convert_to_currency(session, 10, "USD") == (10, "USD")
+
+
+def test_rate_table_convert_column_length_mismatch():
+    with pytest.raises(ValueError):
+        RateTable("EUR", {}).convert_column([1, 2], ["USD"])
+
+
+@pytest.fixture
+def history():
+    history = RateHistory("USD")
+    history.add(RateSnapshot(base="USD", date=date(2024, 1, 10), rates={"EUR": 0.5, "GBP": 0.25}))
+    history.add(RateSnapshot(base="USD", date=date(2024, 1, 1), rates={"EUR": 0.4}))
+    history.add(RateSnapshot(base="USD", date=date(2024, 2, 1), rates={"EUR": 0.8}))
+    return history
+
+
+def test_rate_history_binary_search(history):
+    assert history.latest == date(2024, 2, 1)
+    assert history.rate_at("EUR", date(2024, 1, 1)) == 0.4
+    assert history.rate_at("EUR", date(2024, 1, 9)) == 0.4
+    assert history.rate_at("EUR", date(2024, 1, 10)) == 0.5
+    assert history.rate_at("EUR", date(2024, 3, 1)) == 0.8
+    assert history.rate_at("EUR", date(2023, 1, 1)) is None  # before the history, never a later table
+    assert history.rate_at("JPY", date(2024, 1, 1)) is None
+
+
+def test_rate_history_replaces_same_day(history):
+    history.add(RateSnapshot(base="USD", date=date(2024, 1, 10), rates={"EUR": 0.6}))
+    assert history.rate_at("EUR", date(2024, 1, 10)) == 0.6
+    assert history.rate_at("EUR", date(2024, 1, 1)) == 0.4
+
+
+def test_rate_history_convert_column(history):
+    converted = history.convert_column(
+        [10, Decimal("10"), 10, None, 5, 7],
+        ["USD", "usd", "GBP", "USD", "EUR", "JPY"],
+        [date(2024, 1, 5), datetime(2024, 1, 15, 12), date(2024, 1, 15), date(2024, 1, 5), None, date(2024, 1, 5)],
+        "EUR",
+    )
+    assert converted == [4.0, 5.0, 20.0, None, 5.0, None]
+
+
+def test_rate_history_convert_column_before_the_history(history):
+    converted = history.convert_column([10, 10], ["USD", "USD"], [date(2023, 12, 31), date(2024, 1, 1)], "EUR")
+    assert converted == [None, 4.0]
+
+
+@pytest.mark.asyncio
+async def test_backfill_stores_the_tables_of_unrated_trade_dates(db):
+    days = [date(2020, 3, 2), date(2021, 6, 1)]
+    fetch = AsyncMock(side_effect=[{"EUR": 0.9}, None])
+    with (
+        patch("tasks.rates.async_db_connection", new=rates.async_db_connection),
+        patch("tasks.rates.get_unrated_trade_dates", return_value=days),
+        patch("tasks.rates.fetch_rates", new=fetch),
+        patch("tasks.rates.create_rates") as create,
+    ):
+        assert await backfill_rates("USD") == 1
+
+    assert [c.args for c in fetch.await_args_list] == [("USD", days[0]), ("USD", days[1])]
+    assert create.call_args.args[1] == RateSnapshot(base="USD", date=days[0], rates={"EUR": 0.9})
+
+
+@pytest.mark.asyncio
+async def test_fetch_rates_of_a_past_day_uses_the_history_endpoint():
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"conversion_rates": {"eur": "0.9"}}
+    with patch("models.rates.http_clients.get", new=AsyncMock(return_value=response)) as get:
+        assert await rates.fetch_rates("USD", date(2020, 3, 2)) == {"EUR": 0.9}
+
+    assert get.await_args.args[0].endswith("/history/USD/2020/3/2")
@@ -0,0 +1,93 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from models.search import hybrid_search, store_remote
+from models.symbol import Symbol
+
+
+def _symbol(ticker: str, id: str = "", price: float | None = None) -> Symbol:
+    return Symbol(ticker=ticker, display_name=ticker, name=ticker, source="google", currency="USD", id=id, price=price)
+
+
+def _remote(symbols: list[Symbol], delay: float = 0.0, error: Exception | None = None):
+    async def remote(_: str) -> list[Symbol]:
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return symbols
+
+    return remote
+
+
+async def _search(local: list[Symbol], remote, deadline: float, db=None) -> list[dict]:
+    with (
+        patch("models.search.search_symbol", return_value=local),
+        patch(
+            "models.search.save_symbols",
+            side_effect=lambda _, symbols: [_symbol(s.ticker, id=f"id-{s.ticker}") for s in symbols],
+        ),
+    ):
+        return [batch async for batch in hybrid_search(db or MagicMock(), "a", remote, deadline=deadline)]
+
+
+@pytest.mark.asyncio
+async def test_remote_results_within_the_deadline_are_merged():
+    batches = await _search([_symbol("AAPL", id="s1")], _remote([_symbol("aapl"), _symbol("AMZN", price=9.0)]), 1)
+
+    assert len(batches) == 1
+    assert batches[0]["pending"] is False
+    assert [s["ticker"] for s in batches[0]["results"]] == ["AAPL", "AMZN"]
+    assert batches[0]["results"][1]["id"] == "id-AMZN"
+    assert batches[0]["results"][1]["price"] == 9.0
+
+
+@pytest.mark.asyncio
+async def test_late_remote_results_follow_the_local_ones():
+    batches = await _search([_symbol("AAPL", id="s1")], _remote([_symbol("AAPL"), _symbol("AMZN")], delay=0.05), 0.01)
+
+    assert [(b["pending"], [s["ticker"] for s in b["results"]]) for b in batches] == [
+        (True, ["AAPL"]),
+        (False, ["AMZN"]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_remote_errors_keep_the_local_results():
+    error = HTTPException(status_code=503, detail="google is unavailable")
+    batches = await _search([_symbol("AAPL", id="s1")], _remote([], error=error), 1)
+
+    assert [s["ticker"] for s in batches[0]["results"]] == ["AAPL"]
+    assert batches[0]["errors"] == ["google is unavailable"]
+
+
+@pytest.mark.asyncio
+async def test_any_remote_failure_ends_the_stream_cleanly():
+    for error in (httpx.ConnectError("refused"), IndexError("layout changed")):
+        batches = await _search([_symbol("AAPL", id="s1")], _remote([], delay=0.02, error=error), 0.01)
+
+        assert [b["pending"] for b in batches] == [True, False]
+        assert batches[1]["results"] == [] and batches[1]["errors"] == ["remote search is unavailable"]
+
+
+@pytest.mark.asyncio
+async def test_remote_results_are_stored_on_the_request_connection_after_the_local_query():
+    db, calls = MagicMock(), []
+    with (
+        patch("models.search.search_symbol", side_effect=lambda conn, *_: calls.append(("search", conn)) or []),
+        patch("models.search.save_symbols", side_effect=lambda conn, symbols: calls.append(("save", conn)) or []),
+    ):
+        [_ async for _ in hybrid_search(db, "a", _remote([_symbol("AMZN")]), deadline=1)]
+
+    assert calls == [("search", db), ("save", db)]
+
+
+@pytest.mark.asyncio
+async def test_remote_results_are_kept_when_they_cant_be_stored():
+    error = HTTPException(status_code=503, detail="database is busy")
+    with patch("models.search.save_symbols", side_effect=error):
+        symbols = await store_remote(MagicMock(), "a", [_symbol("AMZN", price=9.0)])
+
+    assert [(s.ticker, s.id, s.price) for s in symbols] == [("AMZN", "", 9.0)]
@@ -0,0 +1,113 @@
+import io
+import json
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import pytest
+from db import stream
+from streaming import csv_lines, json_array, ndjson_lines, zip_files
+
+
+async def _batches(*batches):
+    for batch in batches:
+        yield batch
+
+
+async def _render(batches) -> bytes:
+    return b"".join([chunk async for chunk in json_array(batches)])
+
+
+@pytest.mark.asyncio
+async def test_json_array_joins_batches():
+    body = await _render(_batches([{"a": 1}, {"a": 2}], [], [{"a": 3, "at": datetime(2024, 1, 2)}]))
+
+    assert json.loads(body) == [{"a": 1}, {"a": 2}, {"a": 3, "at": "2024-01-02T00:00:00"}]
+
+
+@pytest.mark.asyncio
+async def test_json_array_empty():
+    assert await _render(_batches()) == b"[]"
+    assert await _render(_batches([], [])) == b"[]"
+
+
+@pytest.mark.asyncio
+async def test_json_array_keeps_unicode():
+    body = await _render(_batches([{"name": "Société Générale"}]))
+
+    assert body == '[{"name":"Société Générale"}]'.encode()
+
+
+@pytest.mark.asyncio
+async def test_stream_fetches_batches_from_a_named_cursor():
+    rows = [(1,), (2,), (3,)]
+    cursor = MagicMock()
+    cursor.fetchmany.side_effect = lambda size: [rows.pop(0) for _ in range(min(size, len(rows)))]
+    db = MagicMock()
+    db.cursor.return_value = cursor
+
+    batches = [batch async for batch in stream(db, "SELECT 1", ("p",), itersize=2)]
+
+    assert batches == [[(1,), (2,)], [(3,)]]
+    assert db.cursor.call_args.kwargs["name"].startswith("stream_")
+    assert cursor.itersize == 2
+    cursor.execute.assert_called_once_with("SELECT 1", ("p",))
+    cursor.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_stream_closes_the_cursor_when_abandoned():
+    cursor = MagicMock()
+    cursor.fetchmany.return_value = [(1,)]
+    db = MagicMock()
+    db.cursor.return_value = cursor
+
+    batches = stream(db, "SELECT 1")
+    assert await anext(batches) == [(1,)]
+    await batches.aclose()
+
+    cursor.close.assert_called_once()
+
+
+async def _collect(chunks) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+@pytest.mark.asyncio
+async def test_csv_lines():
+    rows = [("a", Decimal("1.50"), datetime(2024, 1, 2)), ("b,c", None, None)]
+    body = await _collect(csv_lines(("name", "price", "date"), _batches(rows[:1], rows[1:])))
+
+    assert body == b'name,price,date\na,1.50,2024-01-02T00:00:00\n"b,c",,\n'
+
+
+@pytest.mark.asyncio
+async def test_csv_lines_empty_has_header():
+    assert await _collect(csv_lines(("name", "price"), _batches())) == b"name,price\n"
+
+
+@pytest.mark.asyncio
+async def test_ndjson_lines():
+    rows = [("a", Decimal("1.5"), datetime(2024, 1, 2)), ("é", None, None)]
+    body = await _collect(ndjson_lines(("name", "price", "date"), _batches(rows, [])))
+
+    assert [json.loads(line) for line in body.decode().splitlines()] == [
+        {"name": "a", "price": 1.5, "date": "2024-01-02T00:00:00"},
+        {"name": "é", "price": None, "date": None},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_zip_files_streams_a_valid_archive():
+    files = [
+        ("a.csv", _batches(b"x,y\n", b"1,2\n")),
+        ("b.csv", _batches()),
+    ]
+    body = await _collect(zip_files(files))
+
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        assert archive.namelist() == ["a.csv", "b.csv"]
+        assert archive.read("a.csv") == b"x,y\n1,2\n"
+        assert archive.read("b.csv") == b""
+        assert archive.testzip() is None
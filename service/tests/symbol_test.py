@@ -0,0 +1,235 @@
+import asyncio
+import json
+import socket
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+from models.symbol import (
+    Symbol,
+    SymbolCatalog,
+    get_symbol_by_id,
+    get_symbol_by_ticker,
+    save_symbols,
+    search_symbol,
+    symbol_catalog,
+)
+from tasks.symbols import SymbolCatalogListener
+
+ROW = {
+    "id": "s1",
+    "ticker": "AAPL",
+    "display_name": "Apple",
+    "name": "Apple Inc.",
+    "source": "google",
+    "isin": "US0378331005",
+    "currency": "USD",
+    "picture": None,
+    "created_by": None,
+}
+
+
+def _db(*results):
+    cursor = MagicMock()
+    cursor.fetchall.side_effect = list(results)
+    cursor.fetchone.side_effect = list(results)
+    db = MagicMock()
+    db.cursor.return_value.__enter__.return_value = cursor
+    return db, cursor
+
+
+def test_search_ranks_and_limits():
+    db, cursor = _db([ROW])
+
+    symbols = search_symbol(db, " apple ", limit=5)
+
+    assert [s.ticker for s in symbols] == ["AAPL"]
+    sql, params = cursor.execute.call_args.args
+    assert "name ILIKE %s" in sql and "similarity(name, %s)" in sql and "LIMIT %s" in sql
+    assert params == ("%APPLE%", "%apple%", "APPLE%", "APPLE", "APPLE%", "apple%", "apple", 5)
+
+
+def test_short_and_typeahead_queries_only_match_prefixes():
+    db, cursor = _db([], [])
+
+    search_symbol(db, "ap")
+    search_symbol(db, "apple", typeahead=True)
+
+    for call in cursor.execute.call_args_list:
+        sql, params = call.args
+        assert "lower(name) LIKE %s" in sql and "ILIKE" not in sql
+        assert not params[0].startswith("%")
+
+
+def test_search_escapes_like_wildcards():
+    db, cursor = _db([])
+
+    search_symbol(db, "a_b%")
+
+    assert cursor.execute.call_args.args[1][0] == "%A\\_B\\%%"
+
+
+def test_isin_fast_path():
+    db, cursor = _db([ROW])
+
+    symbols = search_symbol(db, "us0378331005")
+
+    assert [s.id for s in symbols] == ["s1"]
+    cursor.execute.assert_called_once()
+    sql, params = cursor.execute.call_args.args
+    assert "upper(isin) = %s" in sql
+    assert params == ("US0378331005",)
+
+
+def test_unknown_isin_falls_back_to_search():
+    db, cursor = _db([], [])
+
+    assert search_symbol(db, "US0000000000") == []
+    assert cursor.execute.call_count == 2
+
+
+def test_empty_query():
+    db, cursor = _db()
+
+    assert search_symbol(db, "  ") == []
+    cursor.execute.assert_not_called()
+
+
+@pytest.fixture
+def catalog():
+    symbol_catalog.enable()
+    yield symbol_catalog
+    symbol_catalog.disable()
+
+
+def test_catalog_serves_repeated_lookups(catalog):
+    db, cursor = _db(ROW)
+
+    first = get_symbol_by_ticker(db, "aapl")
+    second = get_symbol_by_ticker(db, "AAPL")
+    by_id = get_symbol_by_id(db, "s1")
+
+    assert first == second == by_id and by_id.id == "s1"
+    cursor.execute.assert_called_once()
+    assert cursor.execute.call_args.args[1] == ("AAPL",)
+
+
+def test_catalog_returns_copies(catalog):
+    db, _ = _db(ROW)
+
+    get_symbol_by_id(db, "s1").price = 10.0
+
+    assert get_symbol_by_id(db, "s1").price is None
+
+
+def test_catalog_drops_notified_symbols(catalog):
+    db, cursor = _db(ROW, ROW)
+    get_symbol_by_ticker(db, "AAPL")
+
+    catalog.notify(json.dumps({"id": "s1", "ticker": "AAPL", "isin": "US0378331005"}))
+    get_symbol_by_ticker(db, "AAPL")
+
+    assert cursor.execute.call_count == 2
+
+
+def test_catalog_skips_symbols_read_before_an_invalidation():
+    catalog = SymbolCatalog()
+    catalog.enable()
+    generation = catalog.generation
+    catalog.invalidate("s1")
+
+    db, _ = _db(ROW)
+    catalog.add(get_symbol_by_id(db, "s1"), generation)
+
+    assert catalog.by_id("s1") is None
+
+
+def test_disabled_catalog_always_reads_the_database():
+    db, cursor = _db(ROW, ROW)
+
+    get_symbol_by_ticker(db, "AAPL")
+    get_symbol_by_ticker(db, "AAPL")
+
+    assert cursor.execute.call_count == 2
+
+
+class _FakeListenConnection:
+    def __init__(self, sock, payloads):
+        self.sock = sock
+        self.notifies = []
+        self.payloads = payloads
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def poll(self):
+        data = self.sock.recv(1)
+        if not data:
+            raise psycopg2.OperationalError("connection lost")
+        self.notifies.append(MagicMock(payload=self.payloads.pop(0)))
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.mark.asyncio
+async def test_listener_applies_notifications_until_the_connection_is_lost():
+    catalog = SymbolCatalog()
+    catalog.invalidate = MagicMock()
+    ours, theirs = socket.socketpair()
+    conn = _FakeListenConnection(ours, [json.dumps({"id": "s1", "ticker": "AAPL", "isin": None})])
+    listener = SymbolCatalogListener(catalog)
+
+    with patch.object(SymbolCatalogListener, "_connect", return_value=conn):
+        task = asyncio.create_task(listener.listen())
+        await asyncio.sleep(0.01)
+        assert catalog.enabled
+
+        theirs.send(b"x")
+        await asyncio.sleep(0.01)
+        catalog.invalidate.assert_called_once_with("s1", "AAPL", None)
+
+        theirs.close()
+        with pytest.raises(psycopg2.OperationalError):
+            await asyncio.wait_for(task, 1)
+
+    assert not catalog.enabled
+
+
+def test_save_symbols_writes_through_in_one_statement():
+    db, cursor = _db()
+    remote = [
+        Symbol(ticker="AMZN", display_name="Amazon", name="Amazon", source="google", currency="USD"),
+        Symbol(ticker="LS 2X AMZN", display_name="Lev", name="Lev", source="google", currency="USD"),
+    ]
+
+    with patch("models.symbol.execute_values", return_value=[{**ROW, "ticker": "AMZN"}]) as mock_execute:
+        symbols = save_symbols(db, remote)
+
+    assert [s.ticker for s in symbols] == ["AMZN"]
+    cursor.execute.assert_not_called()  # no lock, the unique constraints handle concurrent writers
+    sql, rows = mock_execute.call_args.args[1:3]
+    assert "ON CONFLICT DO NOTHING" in sql
+    assert rows == [("AMZN", "Amazon", "Amazon", "USD", "google", None, None)]
+    db.commit.assert_called_once()
+
+
+def test_save_symbols_skips_conflicting_rows_without_dropping_the_batch():
+    db, _ = _db()
+    isin = "US0231351067"
+    remote = [
+        Symbol(ticker="AMZN", display_name="Amazon", name="Amazon", source="google", currency="USD", isin=isin),
+        Symbol(ticker="AMZ", display_name="Amazon", name="Amazon", source="google", currency="EUR", isin=isin),
+        Symbol(ticker="MINE", display_name="Mine", name="Mine", source="google", currency="USD"),
+    ]
+    # MINE clashes with a user-created symbol, so nothing comes back for it
+    stored = [{**ROW, "id": "s2", "ticker": "AMZN", "isin": isin}, {**ROW, "id": "s3", "ticker": "AMZ", "isin": None}]
+
+    with patch("models.symbol.execute_values", return_value=stored) as mock_execute:
+        symbols = save_symbols(db, remote)
+
+    assert [(s.id, s.ticker) for s in symbols] == [("s2", "AMZN"), ("s3", "AMZ")]
+    rows = mock_execute.call_args.args[2]
+    assert [row[5] for row in rows] == [isin, None, None]  # a shared ISIN is only kept on its first listing
+    db.commit.assert_called_once()
+    db.rollback.assert_not_called()
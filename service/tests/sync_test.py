@@ -0,0 +1,67 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from models.session import Session
+from models.sync import get_changes, get_tombstones
+
+session = Session(session_id="sess-1", user="u1", currency="EUR", tokens={}, expires=1700000000.0)
+
+
+def test_tombstones_are_grouped_by_entity():
+    rows = [("transactions", "t1"), ("watchlist", "s1"), ("transactions", "t2")]
+
+    with patch("models.sync.fetchall", return_value=rows) as mock_fetchall:
+        deleted = get_tombstones(MagicMock(), "u1", 7)
+
+    assert deleted == {"transactions": ["t1", "t2"], "watchlist": ["s1"], "accounts": []}
+    assert mock_fetchall.call_args.args[2] == ("u1", 7)
+
+
+def _patch_models(version: int):
+    transaction, symbol, account = MagicMock(), MagicMock(), MagicMock()
+    transaction.to_dict.return_value = {"id": "t3"}
+    symbol.to_dict.return_value = {"id": "s3"}
+    account.to_dict.return_value = {"id": "a3"}
+    return (
+        patch("models.sync.get_user_version", return_value=version),
+        patch("models.sync.get_tombstones", return_value={"transactions": ["t1"], "watchlist": [], "accounts": []}),
+        patch("models.sync.get_transactions_since", new=AsyncMock(return_value=[transaction])),
+        patch("models.sync.get_watchlist_since", new=AsyncMock(return_value=[symbol])),
+        patch("models.sync.get_accounts_since", new=AsyncMock(return_value=[account])),
+    )
+
+
+@pytest.mark.asyncio
+async def test_changes_since_a_version():
+    version, tombstones, transactions, watchlist, accounts = _patch_models(12)
+    with version, tombstones, transactions as mock_transactions, watchlist, accounts:
+        changes = await get_changes(MagicMock(), session, 10)
+
+    assert changes == {
+        "version": 12,
+        "transactions": {"updated": [{"id": "t3"}], "deleted": ["t1"]},
+        "watchlist": {"updated": [{"id": "s3"}], "deleted": []},
+        "accounts": {"updated": [{"id": "a3"}], "deleted": []},
+    }
+    assert mock_transactions.call_args.args[2] == 10
+
+
+@pytest.mark.asyncio
+async def test_up_to_date_client_gets_an_empty_response():
+    version, tombstones, transactions, watchlist, accounts = _patch_models(12)
+    with version, tombstones as mock_tombstones, transactions as mock_transactions, watchlist, accounts:
+        changes = await get_changes(MagicMock(), session, 12)
+
+    assert changes["version"] == 12
+    assert all(changes[e] == {"updated": [], "deleted": []} for e in ("transactions", "watchlist", "accounts"))
+    mock_tombstones.assert_not_called()
+    mock_transactions.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_version_ahead_of_the_server_resyncs_everything():
+    version, tombstones, transactions, watchlist, accounts = _patch_models(12)
+    with version, tombstones, transactions as mock_transactions, watchlist, accounts:
+        await get_changes(MagicMock(), session, 40)
+
+    assert mock_transactions.call_args.args[2] == 0
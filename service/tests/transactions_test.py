@@ -1,17 +1,28 @@
-from unittest.mock import MagicMock, patch
+import base64
+import json
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi import HTTPException
+from models.positions import Position
+from models.rates import FxMode, RateHistory, RateSnapshot
 from models.session import Session
 from models.symbol import Symbol
 from models.transactions import (
     Transaction,
+    TransactionFilter,
     TransactionType,
+    _transactions_from_rows,
     _validate_sell_transaction,
     _validate_transaction_by_type,
+    decode_cursor,
+    encode_cursor,
+    get_transactions_page,
     update_transaction,
 )
 from models.user import User
+from routers.transactions import TRANSACTIONS_PAGE_SIZE, api_get_transactions
 
 
 @pytest.fixture
@@ -74,26 +85,8 @@ session = Session(
 async def test_validate_transaction_types(ttype, price, qty, expect_error):
     db = MagicMock()
     with patch(
-        "models.transactions.get_transactions_by_user",
-        return_value=[
-            Transaction(
-                user_id="u1",
-                symbol=Symbol(
-                    id="sym-1",
-                    ticker="TST",
-                    name="TEST",
-                    display_name="Test",
-                    currency="USD",
-                    source="manual",
-                ),
-                quantity=1,
-                price=10,
-                commission=0,
-                currency="USD",
-                transaction_type=TransactionType.BUY,
-                date="2024-01-01",
-            )
-        ],
+        "models.transactions.get_position",
+        return_value=Position(user_id="u1", symbol_id="sym-1", quantity=1, cost=10, first_buy_id="tx-buy-1"),
     ):
         tx = Transaction(
             user_id="u1",
@@ -115,28 +108,7 @@ async def test_validate_transaction_types(ttype, price, qty, expect_error):
 @pytest.mark.asyncio
 async def test_validate_sell_transaction_not_enough():
     db = MagicMock()
-    with patch(
-        "models.transactions.get_transactions_by_user_and_symbol_and_account",
-        return_value=[
-            Transaction(
-                user_id="u1",
-                symbol=Symbol(
-                    id="sym-1",
-                    ticker="TST",
-                    name="TEST",
-                    display_name="Test",
-                    currency="USD",
-                    source="manual",
-                ),
-                quantity=5,
-                price=10,
-                commission=0,
-                currency="USD",
-                transaction_type=TransactionType.BUY,
-                date="2024-01-01",
-            )
-        ],
-    ):
+    with patch("models.transactions.get_available_quantity", return_value=5):
         tx = Transaction(
             user_id="u1",
             symbol_id="sym-1",
@@ -175,46 +147,8 @@ async def test_update_sell_transaction_beyond_limits():
     )
 
     with (
-        patch(
-            "models.transactions.get_transactions_by_user_and_symbol_and_account",
-            return_value=[
-                Transaction(
-                    user_id="u1",
-                    symbol=Symbol(
-                        id="sym-1",
-                        ticker="TST",
-                        name="TEST",
-                        display_name="Test",
-                        currency="USD",
-                        source="manual",
-                    ),
-                    quantity=1,
-                    price=10,
-                    commission=0,
-                    currency="USD",
-                    transaction_type=TransactionType.BUY,
-                    date="2024-01-01",
-                ),
-                sell,
-                Transaction(
-                    user_id="u1",
-                    symbol=Symbol(
-                        id="sym-1",
-                        ticker="TST",
-                        name="TEST",
-                        display_name="Test",
-                        currency="USD",
-                        source="manual",
-                    ),
-                    quantity=5,
-                    price=10,
-                    commission=0,
-                    currency="USD",
-                    transaction_type=TransactionType.BUY,
-                    date="2024-01-01",
-                ),
-            ],
-        ),
+        patch("models.transactions.get_available_quantity", return_value=5) as available,  # bought before the sell
+        patch("models.transactions.refresh_positions"),
         patch("models.transactions.get_transaction_by_id", return_value=sell),
     ):
         sell.symbol_id = getattr(sell.symbol, "id", "sym-1")
@@ -224,3 +158,139 @@ async def test_update_sell_transaction_beyond_limits():
         sell.quantity = 6  # invalid update, total sold = 6, total bought before the sell = 5
         with pytest.raises(HTTPException):
             await update_transaction(db, session, sell)
+        assert available.call_args.kwargs["before_transaction_id"] == "tx-sell-1"
+
+
+@pytest.mark.parametrize("position", [None, Position(user_id="u1", symbol_id="sym-1", quantity=0, cost=0)])
+@pytest.mark.asyncio
+async def test_validate_dividend_without_buy(position):
+    db = MagicMock()
+    with patch("models.transactions.get_position", return_value=position):
+        tx = Transaction(
+            user_id="u1",
+            symbol_id="sym-1",
+            quantity=1,
+            price=0,
+            commission=0,
+            currency="USD",
+            transaction_type=TransactionType.DIVIDEND,
+            date="2024-01-01",
+        )
+        with pytest.raises(HTTPException):
+            await _validate_transaction_by_type(db, session, tx)
+
+
+def _tx_id(i: int) -> str:
+    return f"00000000-0000-4000-8000-{i:012d}"
+
+
+def _cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode()
+
+
+def test_cursor_round_trip(sample_row):
+    transaction = Transaction.from_row(sample_row)
+    transaction.id = _tx_id(123)
+    transaction.date = datetime(2024, 1, 1, 10, 30)
+    assert decode_cursor(encode_cursor(transaction)) == ("2024-01-01T10:30:00", _tx_id(123))
+
+    transaction.date = None
+    assert decode_cursor(encode_cursor(transaction)) == ("infinity", _tx_id(123))
+
+    with pytest.raises(HTTPException):
+        decode_cursor("not a cursor")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        _cursor("yesterday", _tx_id(1)),
+        _cursor(20240101, _tx_id(1)),
+        _cursor("2024-01-01", "tx-1"),
+        _cursor("2024-01-01", None),
+        _cursor("2024-01-01"),
+        _cursor({"day": "2024-01-01"}, _tx_id(1)),
+    ],
+)
+def test_cursor_rejects_tampered_values(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_transactions_page(sample_row):
+    rows = [{**sample_row, "transaction_id": _tx_id(i), "date": datetime(2024, 1, 10 - i)} for i in range(3)]
+    filters = TransactionFilter(account_id="acc-1", transaction_type=TransactionType.BUY, date_from=date(2024, 1, 1))
+
+    with patch("models.transactions.fetchall", return_value=rows) as fetchall:
+        transactions, next_cursor = await get_transactions_page(MagicMock(), session, filters, limit=2)
+
+    sql, params = fetchall.call_args.args[1:3]
+    assert "t.account_id = %s::uuid" in sql and "t.transaction_type = %s" in sql and "t.date >= %s::date" in sql
+    assert "t.symbol_id = %s::uuid" not in sql
+    assert params == ("u1", "acc-1", "BUY", date(2024, 1, 1), 3)
+    assert [t.id for t in transactions] == [_tx_id(0), _tx_id(1)]
+    assert decode_cursor(next_cursor) == ("2024-01-09T00:00:00", _tx_id(1))
+
+    with patch("models.transactions.fetchall", return_value=rows[2:]) as fetchall:
+        transactions, next_cursor = await get_transactions_page(
+            MagicMock(),
+            session,
+            TransactionFilter(),
+            limit=2,
+            cursor=next_cursor,
+        )
+
+    sql, params = fetchall.call_args.args[1:3]
+    assert "(COALESCE(t.date, 'infinity'::timestamp), t.id) < (%s::timestamp, %s::uuid)" in sql
+    assert params == ("u1", "2024-01-09T00:00:00", _tx_id(1), 3)
+    assert [t.id for t in transactions] == [_tx_id(2)]
+    assert next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_trade_date_conversion_never_uses_a_later_rate(sample_row):
+    history = RateHistory("USD")
+    history.add(RateSnapshot(base="USD", date=date(2024, 1, 10), rates={"EUR": 0.5}))
+    rows = [
+        {**sample_row, "transaction_id": "old", "transaction_currency": "EUR", "date": datetime(2024, 1, 1)},
+        {**sample_row, "transaction_id": "new", "transaction_currency": "EUR", "date": datetime(2024, 1, 15)},
+    ]
+
+    with patch("models.transactions.load_rate_history", new=AsyncMock(return_value=history)):
+        old, new = await _transactions_from_rows(session, rows, FxMode.TRADE_DATE)
+
+    assert (old.price, old.commission, old.currency, old.fx_missing) == (100, 1, "EUR", True)
+    assert (new.price, new.commission, new.currency, new.fx_missing) == (200.0, 2.0, "USD", False)
+
+
+@pytest.mark.asyncio
+async def test_listing_transactions_pages_by_default():
+    request, response = MagicMock(headers={}), MagicMock(headers={})
+    page = AsyncMock(return_value=([], "next"))
+    with (
+        patch("routers.transactions.get_etag", new=AsyncMock(return_value='"e"')),
+        patch("routers.transactions.get_transactions_page", new=page),
+        patch("routers.transactions.stream_transactions_by_user") as stream,
+    ):
+        result = await api_get_transactions(
+            request,
+            response,
+            fx=FxMode.LATEST,
+            limit=None,
+            cursor=None,
+            full=False,
+            account_id=None,
+            symbol_id=None,
+            transaction_type=None,
+            date_from=None,
+            date_to=None,
+            db=MagicMock(),
+            session=session,
+        )
+
+    assert result == []
+    assert page.await_args.args[3] == TRANSACTIONS_PAGE_SIZE
+    assert response.headers["X-Next-Cursor"] == "next"
+    stream.assert_not_called()
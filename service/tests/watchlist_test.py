@@ -0,0 +1,93 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+from models.rates import RateTable
+from models.session import Session
+from models.watchlist import _symbols_from_rows, update_watchlist_prices
+
+session = Session(session_id="sess-1", user="u1", currency="EUR", tokens={}, expires=1700000000.0)
+S1 = "0b0e7a52-5e5c-4d43-9a3b-1f1f6c9f0a01"
+S2 = "0b0e7a52-5e5c-4d43-9a3b-1f1f6c9f0a02"
+
+
+@pytest.mark.asyncio
+async def test_update_prices_in_a_single_statement():
+    db = MagicMock()
+    updated = [{"symbol_id": S1}, {"symbol_id": S2}]
+
+    with (
+        patch("models.watchlist.execute_values", return_value=updated) as mock_execute,
+        patch("models.watchlist._symbols_from_rows", new=AsyncMock(return_value=["sym1", "sym2"])) as mock_build,
+    ):
+        symbols = await update_watchlist_prices(db, session, [{"symbol_id": S1, "price": 10.5}, {"symbol_id": S2}])
+
+    assert symbols == ["sym1", "sym2"]
+    mock_execute.assert_called_once()
+    sql, rows = mock_execute.call_args.args[1:3]
+    assert "UPDATE watchlist" in sql and "LEFT JOIN latest_quote" in sql
+    assert rows == [("u1", S1, 10.5), ("u1", S2, None)]
+    assert mock_execute.call_args.kwargs["fetch"] is True
+    mock_build.assert_awaited_once_with(session, updated)
+    db.commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_update_prices_is_all_or_nothing():
+    db = MagicMock()
+
+    prices = [{"symbol_id": S1, "price": 10.5}, {"symbol_id": S2, "price": 3}]
+
+    with patch("models.watchlist.execute_values", return_value=[{"symbol_id": S1}]):
+        with pytest.raises(HTTPException) as e:
+            await update_watchlist_prices(db, session, prices)
+
+    assert e.value.status_code == 404
+    assert S2 in e.value.detail
+    db.rollback.assert_called_once()
+    db.commit.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "item",
+    [
+        {"symbol_id": S1, "price": -1},
+        {"symbol_id": S1, "price": "10"},
+        {"symbol_id": S1, "price": True},
+        {"symbol_id": "s1", "price": 10},
+        {"symbol_id": 1, "price": 10},
+        {"price": 10},
+        "s1",
+    ],
+)
+async def test_update_prices_rejects_invalid_items(item):
+    with patch("models.watchlist.execute_values") as mock_execute:
+        with pytest.raises(HTTPException) as e:
+            await update_watchlist_prices(MagicMock(), session, [{"symbol_id": S2, "price": 1}, item])
+
+    assert e.value.status_code == 400
+    mock_execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_quotes_without_a_rate_keep_their_currency():
+    row = {
+        "symbol_id": S1,
+        "ticker": "T",
+        "display_name": "T",
+        "name": "T",
+        "source": "google",
+        "isin": None,
+        "picture": None,
+        "created_by": None,
+        "manual_price": None,
+        "previous_close": 9.0,
+    }
+    rows = [{**row, "currency": "USD", "price": 10.0}, {**row, "symbol_id": S2, "currency": "JPY", "price": 1000.0}]
+
+    with patch("models.watchlist.RateTable.load", new=AsyncMock(return_value=RateTable("EUR", {"USD": 0.5}))):
+        usd, jpy = await _symbols_from_rows(session, rows)
+
+    assert (usd.price, usd.open_price, usd.currency, usd.fx_missing) == (5.0, 4.5, "EUR", False)
+    assert (jpy.price, jpy.open_price, jpy.currency, jpy.fx_missing) == (1000.0, 9.0, "JPY", True)
@@ -0,0 +1,40 @@
+import asyncio
+import functools
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, TypeVar
+
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "2"))  # processes for CPU-bound work, e.g. parsing uploads
+
+T = TypeVar("T")
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=WORKER_PROCESSES)
+    return _pool
+
+
+def close_workers() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+async def run_in_process(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Runs a CPU-bound call in a worker process so it doesn't hold the GIL the event loop needs.
+    `func` and its arguments must be picklable, i.e. module level functions and plain data.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), functools.partial(func, *args, **kwargs))
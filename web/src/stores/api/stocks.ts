@@ -39,6 +39,39 @@ async function symbolSearch(query: string, is_load_more: boolean) {
     return [];
 }
 
+// Streams NDJSON batches: local results first, remote ones as they arrive. Resolves once every batch was received.
+async function hybridSymbolSearch(query: string, onResults: (results: StockSymbol[]) => void) {
+    const url = `${BASE_URL}/search?q=${encodeURIComponent(query)}&hybrid=true`;
+    const error = (trace: object) =>
+        addError({ readable_message: `Error searching for stock symbols: ${query}`, trace: { url, ...trace } });
+
+    try {
+        const res = await fetch(url, { method: 'GET', credentials: 'include' });
+        if (!res.ok || !res.body) {
+            error({ status: res.status, statusText: res.statusText });
+            return;
+        }
+
+        const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        for (;;) {
+            const { value, done } = await reader.read();
+            buffer += value ?? '';
+            const lines = done ? [buffer] : buffer.split('\n');
+            buffer = done ? '' : (lines.pop() ?? '');
+
+            for (const line of lines.filter((l) => l.trim())) {
+                const data = JSON.parse(line);
+                if (data.errors?.length) error({ statusText: data.errors.join(', ') });
+                onResults(data.results as StockSymbol[]);
+            }
+            if (done) return;
+        }
+    } catch (err) {
+        error({ status: err instanceof Error ? err.message : String(err) });
+    }
+}
+
 function getStockQuote(tickers: string[]) {
     const params = new URLSearchParams();
     tickers.forEach((ticker) => params.append('tickers', ticker));
@@ -49,5 +82,5 @@ function getStockQuote(tickers: string[]) {
     return safeFetch<StockQuote[]>(f, 'Failed to fetch stock quote for ' + tickers.join(', '));
 }
 
-const StocksService = { symbolSearch, getStockQuote };
+const StocksService = { symbolSearch, hybridSymbolSearch, getStockQuote };
 export default StocksService;
@@ -3,9 +3,25 @@ import { safeFetch } from './_utils';
 
 const BASE_URL = import.meta.env.VITE_BACKEND_BASE_URL || '/api';
 
-function loadTransactions() {
-    const f = fetch(`${BASE_URL}/transactions`, { method: 'GET', credentials: 'include' });
-    return safeFetch<TransactionItem[]>(f, 'Failed to fetch transactions', []);
+const PAGE_SIZE = 500;
+
+async function loadTransactions() {
+    const transactions: TransactionItem[] = [];
+    let cursor: string | null = null;
+    do {
+        const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+        if (cursor) params.set('cursor', cursor);
+        let next: string | null = null;
+        const f = fetch(`${BASE_URL}/transactions?${params}`, { method: 'GET', credentials: 'include' }).then((res) => {
+            next = res.headers.get('X-Next-Cursor');
+            return res;
+        });
+        const page = await safeFetch<TransactionItem[]>(f, 'Failed to fetch transactions');
+        if (!page) break;
+        transactions.push(...page);
+        cursor = next;
+    } while (cursor);
+    return transactions;
 }
 
 function addTransaction(transaction: TransactionItem) {
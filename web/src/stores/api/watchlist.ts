@@ -39,6 +39,16 @@ async function updateWatchlistSymbolPrice(symbol_id: string, price?: number) {
     return safeFetch<StockSymbol>(f, `Error updating manual price for symbol ${symbol_id}`);
 }
 
+async function updateWatchlistSymbolPrices(prices: { symbol_id: string; price?: number }[]) {
+    const f = fetch(`${BASE_URL}/watchlist/prices`, {
+        method: 'PUT',
+        credentials: 'include',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(prices),
+    });
+    return safeFetch<StockSymbol[]>(f, 'Error updating manual prices');
+}
+
 async function removeFromWatchlist(item: StockSymbol) {
     const f = fetch(`${BASE_URL}/watchlist/${item.id}`, { method: 'DELETE', credentials: 'include' });
     return safeFetch(f, `Error removing ${item.ticker} from watchlist`, false);
@@ -54,6 +64,7 @@ const WatchlistService = {
     addToWatchlist,
     addToWatchlistCreatingSymbol,
     updateWatchlistSymbolPrice,
+    updateWatchlistSymbolPrices,
     removeFromWatchlist,
     removeFromWatchlistAndDeleteSymbol,
 };
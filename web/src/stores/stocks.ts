@@ -10,6 +10,10 @@ export const useStocksStore = defineStore('stocks', () => {
         return StocksService.symbolSearch(query, is_load_more);
     }
 
+    function hybridSymbolSearch(query: string, onResults: (results: StockSymbol[]) => void) {
+        return StocksService.hybridSymbolSearch(query, onResults);
+    }
+
     async function _getStockQuotes(symbols: StockSymbol[]) {
         const eligible = symbols.filter((s) => s.source && !s.is_user_created && !s.is_manual_price);
         const cached = eligible.filter((s) => _quoteCache.has(s.ticker));
@@ -57,5 +61,5 @@ export const useStocksStore = defineStore('stocks', () => {
         return transactions;
     }
 
-    return { symbolSearch, fillSymbolQuotes, fillTransactionQuotes };
+    return { symbolSearch, hybridSymbolSearch, fillSymbolQuotes, fillTransactionQuotes };
 });
@@ -13,7 +13,7 @@ export const useTransactionsStore = defineStore('transactions', () => {
     const { addError } = useErrorsStore();
     const { fillTransactionQuotes } = useStocksStore();
     const { account, accounts } = storeToRefs(settingsStore);
-    const { updateSymbolManualPrice } = useWatchlistStore();
+    const { updateSymbolManualPrice, updateSymbolManualPrices } = useWatchlistStore();
 
     const transactions = ref<Readonly<TransactionItem>[]>([]);
 
@@ -108,8 +108,8 @@ export const useTransactionsStore = defineStore('transactions', () => {
     }
 
     async function bulkUpdateManualPrices(symbols: { symbol_id: string; price: number }[]) {
-        const updates = symbols.map((s) => updateSymbolManualPrice(s.symbol_id, s.price));
-        await Promise.all(updates);
+        const updated = await updateSymbolManualPrices(symbols);
+        if (!updated) return;
 
         transactions.value = transactions.value.map((transaction) => {
             const symbolUpdate = symbols.find((s) => s.symbol_id === transaction.symbol.id);
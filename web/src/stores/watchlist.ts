@@ -52,6 +52,13 @@ export const useWatchlistStore = defineStore('watchlist', () => {
         return WatchlistService.updateWatchlistSymbolPrice(symbol_id, price);
     }
 
+    function updateSymbolManualPrices(prices: { symbol_id: string; price?: number }[]) {
+        if (prices.some((p) => p.price && p.price < 0)) throw new Error('Price cannot be negative');
+        if (prices.some((p) => p.price && isNaN(p.price))) throw new Error('Price must be a number');
+
+        return WatchlistService.updateWatchlistSymbolPrices(prices);
+    }
+
     return {
         init,
         watchlist,
@@ -61,5 +68,6 @@ export const useWatchlistStore = defineStore('watchlist', () => {
         removeFromWatchlist,
         removeFromWatchlistAndDeleteSymbol,
         updateSymbolManualPrice,
+        updateSymbolManualPrices,
     };
 });